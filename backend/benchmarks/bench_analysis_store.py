@@ -0,0 +1,116 @@
+"""
+解析結果全文の保存方式ベンチマーク（項目内Binary vs S3）
+
+解析結果の長さごとに zlib 圧縮後のサイズと、保存（UpdateItem / PutObject）と
+復元（GetItem / GetObject + 展開）のレイテンシを比較する。
+既定は moto によるローカル実行（相対比較用）。--live で実環境のテーブル・バケットを使う。
+
+    python benchmarks/bench_analysis_store.py [--iterations 20] [--live --stage dev]
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import time
+import zlib
+from contextlib import ExitStack, redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/common/python'))
+
+SIZES = [2 * 1024, 8 * 1024, 32 * 1024, 128 * 1024]
+
+VOCABULARY = [
+    '札幌', '時計台', '大通公園', 'すすきの', '味噌ラーメン', '営業時間', '定休日', '観光',
+    'おすすめ', 'メニュー', '価格', '歴史', '建築', '季節', '雪まつり', '徒歩', '駅', '分',
+    '**', '##', '-', '\n', '。', '、', 'です', 'ます', 'Sapporo', 'guide', 'open', '11:00', '¥980'
+]
+
+
+def sample_markdown(size, seed=0):
+    """解析結果に近い語彙で指定バイト数程度のMarkdownを生成（反復による過剰な圧縮を避ける）"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(VOCABULARY)
+        parts.append(word)
+        length += len(word.encode('utf-8'))
+    return ''.join(parts)
+
+
+def setup_local():
+    """motoでテーブル・バケットを作成"""
+    import boto3
+    from moto import mock_dynamodb, mock_s3
+
+    os.environ.update({
+        'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing',
+        'AWS_DEFAULT_REGION': 'ap-northeast-1', 'STAGE': 'bench', 'PROJECT_NAME': 'ai-tourism-poc'
+    })
+    stack = ExitStack()
+    stack.enter_context(mock_dynamodb())
+    stack.enter_context(mock_s3())
+    boto3.client('s3', region_name='ap-northeast-1').create_bucket(
+        Bucket='ai-tourism-poc-images-bench',
+        CreateBucketConfiguration={'LocationConstraint': 'ap-northeast-1'}
+    )
+    boto3.resource('dynamodb', region_name='ap-northeast-1').create_table(
+        TableName='ai-tourism-poc-images-bench',
+        KeySchema=[{'AttributeName': 'image_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'image_id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    return stack
+
+
+def measure(image_store, get_table, text, inline_limit, iterations):
+    """保存・復元の中央値（ms）"""
+    write_ms, read_ms = [], []
+    for i in range(iterations):
+        image_id = f'bench-{inline_limit}-{len(text)}-{i}'
+        get_table('images').put_item(Item={'image_id': image_id, 'user_id': 'bench-user'})
+
+        started = time.perf_counter()
+        image_store.ANALYSIS_INLINE_LIMIT = inline_limit
+        with redirect_stdout(io.StringIO()):
+            image_store.update_image_with_analysis(image_id, text)
+        write_ms.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        item = get_table('images').get_item(Key={'image_id': image_id})['Item']
+        assert image_store.load_analysis_text(item) == text
+        read_ms.append((time.perf_counter() - started) * 1000)
+
+    return statistics.median(write_ms), statistics.median(read_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--live', action='store_true', help='実環境のimagesテーブル・バケットを使用')
+    parser.add_argument('--stage', default='dev')
+    args = parser.parse_args()
+
+    with ExitStack() as stack:
+        if args.live:
+            os.environ['STAGE'] = args.stage
+        else:
+            stack.enter_context(setup_local())
+
+        from common import image_store
+        from common.aws_clients import get_table
+
+        print(f"{'size':>8} {'zlib':>8} {'ratio':>6} {'inline w/r ms':>16} {'s3 w/r ms':>16}")
+        for size in SIZES:
+            text = sample_markdown(size)
+            compressed = len(zlib.compress(text.encode('utf-8'), image_store.ANALYSIS_COMPRESSION_LEVEL))
+            inline = measure(image_store, get_table, text, 350 * 1024, args.iterations)
+            s3 = measure(image_store, get_table, text, 0, args.iterations)
+            print(f"{size:>8} {compressed:>8} {compressed / size:>6.2f} "
+                  f"{inline[0]:>7.2f}/{inline[1]:<7.2f} {s3[0]:>7.2f}/{s3[1]:<7.2f}")
+
+
+if __name__ == '__main__':
+    main()
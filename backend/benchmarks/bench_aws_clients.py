@@ -0,0 +1,62 @@
+"""
+AWSクライアント生成オーバーヘッドのマイクロベンチマーク
+
+従来の「呼び出しごとに boto3.resource('dynamodb') / boto3.client('s3') を生成」と、
+共通レイヤーのプール（get_table / get_client）を比較する。ネットワーク通信は行わない。
+
+    python benchmarks/bench_aws_clients.py [--iterations 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/common/python'))
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+
+import boto3
+
+from common.aws_clients import get_client, get_table
+
+
+def legacy_invocation():
+    """移行前: 1回の解析リクエストでハンドラーが行っていたクライアント生成"""
+    dynamodb = boto3.resource('dynamodb')
+    dynamodb.Table('ai-tourism-poc-users-dev')
+    dynamodb = boto3.resource('dynamodb')
+    dynamodb.Table('ai-tourism-poc-images-dev')
+    boto3.client('s3')
+
+
+def pooled_invocation():
+    """移行後: 同じ処理をプール経由で行う"""
+    get_table('users')
+    get_table('images')
+    get_client('s3')
+
+
+def measure(func, iterations):
+    func()  # 初回（コールドスタート相当）は除外
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    legacy_ms = measure(legacy_invocation, args.iterations)
+    pooled_ms = measure(pooled_invocation, args.iterations)
+
+    print(f"legacy (per-call boto3):   {legacy_ms:8.3f} ms/invocation")
+    print(f"pooled (common layer):     {pooled_ms:8.3f} ms/invocation")
+    print(f"saved per warm invocation: {legacy_ms - pooled_ms:8.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
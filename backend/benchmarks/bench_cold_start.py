@@ -0,0 +1,150 @@
+"""
+ハンドラーごとのコールドスタート（インポート時間・初期化フェーズ）ベンチマーク
+
+serverless.yml の全関数について、新しいPythonプロセスでハンドラーモジュールを
+インポートし、以下を計測する（中央値）。ネットワーク通信は行わない。
+
+    import_ms: ハンドラーモジュールのインポート時間（モジュールレベルの初期化を含む）
+    init_ms:   プロセス起動からハンドラー取得までの時間（Lambda Init フェーズ相当）
+
+cold_start_budget.json の上限を超えた関数、または予算のない関数があれば終了コード1で終了する。
+
+    python benchmarks/bench_cold_start.py [--runs 5] [--update-budget]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import yaml
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+LAYER_DIR = os.path.join(BACKEND_DIR, 'layers/common/python')
+BUDGET_PATH = os.path.join(os.path.dirname(__file__), 'cold_start_budget.json')
+
+# 予算更新時に計測値へ上乗せする余裕（CI環境のばらつき吸収）
+BUDGET_HEADROOM = 2.0
+
+CHILD_SCRIPT = """
+import time
+started = time.perf_counter()
+import importlib, json, sys
+sys.path[:0] = [{layer_dir!r}, {module_dir!r}]
+module = importlib.import_module({module_name!r})
+getattr(module, {attr!r})
+print(json.dumps({{'import_ms': (time.perf_counter() - started) * 1000}}))
+"""
+
+CHILD_ENV = {
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_DEFAULT_REGION': 'ap-northeast-1',
+    'STAGE': 'bench',
+    'PROJECT_NAME': 'ai-tourism-poc',
+    'GOOGLE_GEMINI_API_KEY': 'bench',
+    'STRIPE_SECRET_KEY': 'sk_test_bench',
+}
+
+
+def load_handlers():
+    """serverless.yml から 関数名 -> (moduleディレクトリ, モジュール名, 関数名) を取得"""
+    with open(os.path.join(BACKEND_DIR, 'serverless.yml'), encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+
+    handlers = {}
+    for name, function in (config.get('functions') or {}).items():
+        module_path, attr = function['handler'].rsplit('.', 1)
+        module_dir = function.get('module') or os.path.dirname(module_path)
+        handlers[name] = (
+            os.path.join(BACKEND_DIR, module_dir),
+            os.path.basename(module_path),
+            attr
+        )
+    return handlers
+
+
+def measure_once(module_dir, module_name, attr):
+    """新しいプロセスで1回インポートし (import_ms, init_ms) を返す"""
+    script = CHILD_SCRIPT.format(layer_dir=LAYER_DIR, module_dir=module_dir, module_name=module_name, attr=attr)
+    env = dict(os.environ, **CHILD_ENV)
+
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, env=env, cwd=module_dir)
+    init_ms = (time.perf_counter() - started) * 1000
+
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'import failed')
+    return json.loads(result.stdout.strip().splitlines()[-1])['import_ms'], init_ms
+
+
+def measure(handlers, runs):
+    results = {}
+    for name, (module_dir, module_name, attr) in handlers.items():
+        try:
+            samples = [measure_once(module_dir, module_name, attr) for _ in range(runs)]
+        except RuntimeError as e:
+            results[name] = {'error': str(e)}
+            continue
+        results[name] = {
+            'import_ms': statistics.median(s[0] for s in samples),
+            'init_ms': statistics.median(s[1] for s in samples)
+        }
+    return results
+
+
+def load_budget():
+    if not os.path.exists(BUDGET_PATH):
+        return {}
+    with open(BUDGET_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--update-budget', action='store_true', help='計測値から予算ファイルを再生成')
+    args = parser.parse_args()
+
+    results = measure(load_handlers(), args.runs)
+    budget = load_budget()
+    failures = []
+
+    print(f"{'function':<20} {'import_ms':>10} {'init_ms':>10} {'budget_ms':>10}")
+    for name, result in results.items():
+        if 'error' in result:
+            print(f"{name:<20} ERROR: {result['error']}")
+            failures.append(name)
+            continue
+        limit = budget.get(name, {}).get('import_ms')
+        status = ''
+        if limit is None:
+            # 予算のない関数は回帰を検出できないため失敗扱い（--update-budget で追加）
+            status = '  NO BUDGET'
+            failures.append(name)
+        elif result['import_ms'] > limit:
+            status = '  OVER BUDGET'
+            failures.append(name)
+        print(f"{name:<20} {result['import_ms']:10.1f} {result['init_ms']:10.1f} {limit or '-':>10}{status}")
+
+    if args.update_budget:
+        new_budget = {
+            name: {'import_ms': round(result['import_ms'] * BUDGET_HEADROOM)}
+            for name, result in results.items() if 'error' not in result
+        }
+        with open(BUDGET_PATH, 'w', encoding='utf-8') as f:
+            json.dump(new_budget, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Budget written: {BUDGET_PATH}")
+        return 0
+
+    if failures:
+        print(f"Cold start regression: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
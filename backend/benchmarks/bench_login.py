@@ -0,0 +1,139 @@
+"""
+メール・パスワードログインのレイテンシベンチマーク（移行前後の比較）
+
+Cognito・DynamoDB の呼び出しを指定した遅延で模したクライアントに置き換え、次の2つを比較する。
+
+    legacy  InitiateAuth → GetUser → 最終ログインの UpdateItem（3回の順次呼び出し）
+    local   InitiateAuth（IDトークンのクレームを利用）→ 応答前の最終ログイン flush
+            （BatchGetItem → 条件付き UpdateItem。毎回書き込みが必要な最悪ケースで計測）
+
+    python benchmarks/bench_login.py [--iterations 30] [--cognito-ms 60] [--dynamodb-ms 15]
+"""
+import argparse
+import base64
+import importlib.util
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/common/python'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+os.environ.setdefault('COGNITO_CLIENT_ID', 'bench-client')
+# レート制限の共有カウンター（DynamoDB）は計測対象外
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'off')
+
+CLAIMS = {'token_use': 'id', 'aud': os.environ['COGNITO_CLIENT_ID'], 'sub': 'sub-bench',
+          'cognito:username': 'bench-user', 'email': 'bench@example.com', 'name': 'Bench'}
+
+
+def encode(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+
+def fake_cognito(latency_ms):
+    """遅延付きのCognitoクライアント"""
+    def initiate_auth(**kwargs):
+        time.sleep(latency_ms / 1000)
+        return {'AuthenticationResult': {
+            'AccessToken': 'access', 'RefreshToken': 'refresh',
+            'IdToken': f"{encode({'alg': 'RS256'})}.{encode(CLAIMS)}.signature"
+        }}
+
+    def get_user(**kwargs):
+        time.sleep(latency_ms / 1000)
+        return {'Username': CLAIMS['cognito:username'], 'UserAttributes': [
+            {'Name': 'email', 'Value': CLAIMS['email']}, {'Name': 'name', 'Value': CLAIMS['name']}
+        ]}
+
+    client = MagicMock()
+    client.initiate_auth.side_effect = initiate_auth
+    client.get_user.side_effect = get_user
+    client.exceptions.NotAuthorizedException = type('NotAuthorizedException', (Exception,), {})
+    client.exceptions.UserNotConfirmedException = type('UserNotConfirmedException', (Exception,), {})
+    return client
+
+
+def load_auth_handler():
+    spec = importlib.util.spec_from_file_location(
+        'auth_handler', os.path.join(os.path.dirname(__file__), '../functions/auth/handler.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_login(auth_handler, event, headers):
+    """移行前のログイン処理（GetUser と同期的な最終ログイン更新）"""
+    client = auth_handler.get_client('cognito-idp')
+    body = json.loads(event['body'])
+    auth_response = client.initiate_auth(
+        ClientId=os.environ['COGNITO_CLIENT_ID'], AuthFlow='USER_PASSWORD_AUTH',
+        AuthParameters={'USERNAME': body['email'], 'PASSWORD': body['password']}
+    )
+    user_response = client.get_user(AccessToken=auth_response['AuthenticationResult']['AccessToken'])
+    attributes = {attr['Name']: attr['Value'] for attr in user_response['UserAttributes']}
+    auth_handler.user_cache.update_user(
+        user_response['Username'],
+        UpdateExpression='SET last_login_at = :timestamp, updated_at = :timestamp',
+        ExpressionAttributeValues={':timestamp': auth_handler.get_jst_isoformat()}
+    )
+    return {'statusCode': 200, 'headers': headers, 'body': json.dumps({
+        'message': 'Login successful', 'tokens': auth_response['AuthenticationResult'],
+        'user_info': {'user_id': user_response['Username'], 'email': attributes.get('email', ''),
+                      'display_name': attributes.get('name', '')}
+    })}
+
+
+def measure(login, iterations):
+    event = {'body': json.dumps({'email': 'bench@example.com', 'password': 'secret'})}
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            response = login(event, {})
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response['statusCode'] == 200, response
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--cognito-ms', type=float, default=60)
+    parser.add_argument('--dynamodb-ms', type=float, default=15)
+    args = parser.parse_args()
+
+    auth_handler = load_auth_handler()
+
+    def update_user(user_id, **kwargs):
+        time.sleep(args.dynamodb_ms / 1000)
+        return {}
+
+    def get_users(user_ids):
+        time.sleep(args.dynamodb_ms / 1000)
+        return {user_id: {'user_id': user_id} for user_id in user_ids}
+
+    def local_login(event, headers):
+        # main() 経由（ルーター・応答前の flush を含む）。毎回書き込むよう記録済み時刻を破棄
+        activity.reset()
+        return auth_handler.main(dict(event, httpMethod='POST', pathParameters={'proxy': 'login'}), None)
+
+    activity = auth_handler.activity
+    with patch.object(auth_handler, 'get_client', return_value=fake_cognito(args.cognito_ms)), \
+            patch.object(auth_handler.user_cache, 'update_user', side_effect=update_user), \
+            patch.object(auth_handler.user_cache, 'get_users', side_effect=get_users):
+        legacy_ms = measure(lambda event, headers: legacy_login(auth_handler, event, headers), args.iterations)
+        local_ms = measure(local_login, args.iterations)
+
+    print(f"legacy (auth + get_user + last login): {legacy_ms:8.2f} ms/login")
+    print(f"local  (auth + ID token + flush):      {local_ms:8.2f} ms/login")
+    print(f"saved per login:                       {legacy_ms - local_ms:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+リクエスト振り分けオーバーヘッドのマイクロベンチマーク
+
+移行前の auth ハンドラーと同じ形の if/elif 分岐（CORSヘッダー生成・OPTIONS判定を含む）と、
+common.router（ミドルウェア4段）を、何もしないルート関数で比較する。ネットワーク通信は行わない。
+router (metrics) は timing ミドルウェアの EMF ログ出力（/dev/null へ）を含む。
+
+    python benchmarks/bench_router.py [--iterations 100000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/common/python'))
+
+from common.router import ANY, Router
+
+PATHS = ['check-usage', 'increment-usage', 'create-user', 'user-info', 'verify-token',
+         'signup', 'confirm-signup', 'login', 'resend-code']
+
+
+def ok(event, headers):
+    return {'statusCode': 200, 'headers': headers, 'body': '{}'}
+
+
+def legacy_main(event, context):
+    """移行前: ハンドラーごとの if/elif 分岐"""
+    try:
+        headers = {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+        }
+        if event['httpMethod'] == 'OPTIONS':
+            return {'statusCode': 200, 'headers': headers, 'body': ''}
+        path = event.get('pathParameters', {}).get('proxy', '')
+        if path == 'check-usage':
+            return ok(event, headers)
+        elif path == 'increment-usage':
+            return ok(event, headers)
+        elif path == 'create-user':
+            return ok(event, headers)
+        elif path == 'user-info':
+            return ok(event, headers)
+        elif path == 'verify-token':
+            return ok(event, headers)
+        elif path == 'signup':
+            return ok(event, headers)
+        elif path == 'confirm-signup':
+            return ok(event, headers)
+        elif path == 'login':
+            return ok(event, headers)
+        elif path == 'resend-code':
+            return ok(event, headers)
+        return {'statusCode': 404, 'headers': headers, 'body': json.dumps({'error': 'Endpoint not found'})}
+    except Exception as e:
+        return {'statusCode': 500, 'headers': headers, 'body': json.dumps({'error': str(e)})}
+
+
+router = Router('bench', error_prefix='Authentication error')
+for _path in PATHS:
+    router.add(ANY, _path, ok)
+
+
+def measure(func, path, iterations):
+    event = {'httpMethod': 'POST', 'pathParameters': {'proxy': path}, 'body': '{"email": "a@example.com"}'}
+    func(event, None)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(event, None)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'':20} {'first route':>12} {'last route':>12}  (us/request)")
+    os.environ['METRICS_ENABLED'] = 'off'
+    rows = [('legacy (if/elif)', legacy_main), ('router', router.dispatch)]
+    for name, func in rows:
+        print(f"{name:20} {measure(func, PATHS[0], args.iterations):12.2f} {measure(func, PATHS[-1], args.iterations):12.2f}")
+
+    os.environ['METRICS_ENABLED'] = 'on'
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        first = measure(router.dispatch, PATHS[0], args.iterations)
+        last = measure(router.dispatch, PATHS[-1], args.iterations)
+    print(f"{'router (metrics)':20} {first:12.2f} {last:12.2f}")
+
+
+if __name__ == '__main__':
+    main()
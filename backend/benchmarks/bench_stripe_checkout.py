@@ -0,0 +1,125 @@
+"""
+Checkout作成のStripe API呼び出しベンチマーク（接続の再利用・価格カタログのキャッシュ）
+
+ローカルのスタブサーバーをStripe APIの代わりに使い、新規接続ごとに --handshake-ms の
+遅延（TCP/TLSハンドシェイク相当）を入れる。次の2つを比較する。
+
+    cold  呼び出しごとに新しいHTTPクライアント（新規接続）＋ Price 一覧を取得
+    warm  コンテナ単位のHTTPクライアント（Keep-Alive）＋ TTLキャッシュ済みの価格カタログ
+
+    python benchmarks/bench_stripe_checkout.py [--iterations 50] [--handshake-ms 40]
+"""
+import argparse
+import importlib.util
+import io
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/common/python'))
+os.environ.setdefault('STRIPE_SECRET_KEY', 'sk_test_bench')
+os.environ.setdefault('STRIPE_PRICE_7DAYS', 'price_env_7')
+os.environ.setdefault('STRIPE_PRICE_20DAYS', 'price_env_20')
+
+PRICES = {
+    'object': 'list', 'url': '/v1/prices', 'has_more': False,
+    'data': [
+        {'id': 'price_7', 'object': 'price', 'lookup_key': 'premium_7days', 'metadata': {'premium_days': '7'},
+         'unit_amount': 500, 'currency': 'jpy'},
+        {'id': 'price_20', 'object': 'price', 'lookup_key': 'premium_20days', 'metadata': {'premium_days': '20'},
+         'unit_amount': 1200, 'currency': 'jpy'}
+    ]
+}
+SESSION = {'id': 'cs_bench', 'object': 'checkout.session', 'url': 'https://checkout.stripe.com/cs_bench'}
+
+
+def start_stub_server(handshake_ms):
+    """Stripe APIのスタブ（HTTP/1.1 Keep-Alive、新規接続ごとにハンドシェイク相当の遅延）"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # ヘッダーと本文の2回の書き込みで遅延ACK待ちにならないようにする
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            time.sleep(handshake_ms / 1000)
+            super().setup()
+
+        def _respond(self, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._respond(PRICES)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self._respond(SESSION)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def load_payment_handler():
+    spec = importlib.util.spec_from_file_location(
+        'payment_handler', os.path.join(os.path.dirname(__file__), '../functions/payment/handler.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(payment_handler, iterations, warm):
+    """Checkout作成1回あたりのレイテンシ（ms）"""
+    event = {'httpMethod': 'POST', 'path': '/payment/create-checkout',
+             'body': json.dumps({'planType': '7days', 'userId': 'bench-user'})}
+    stripe = payment_handler.get_stripe()
+    samples = []
+    for _ in range(iterations):
+        if not warm:
+            stripe.default_http_client = payment_handler.create_stripe_http_client()
+            payment_handler.reset_price_catalog()
+        started = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            response = payment_handler.main(event, None)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response['statusCode'] == 200, response
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--handshake-ms', type=float, default=40)
+    args = parser.parse_args()
+
+    server = start_stub_server(args.handshake_ms)
+    payment_handler = load_payment_handler()
+    stripe = payment_handler.get_stripe()
+    stripe.api_base = f"http://127.0.0.1:{server.server_address[1]}"
+    stripe.max_network_retries = 0
+
+    cold_ms = measure(payment_handler, args.iterations, warm=False)
+    payment_handler.get_price_catalog()
+    warm_ms = measure(payment_handler, args.iterations, warm=True)
+    server.shutdown()
+
+    print(f"cold (new connection + price list): {cold_ms:8.2f} ms/checkout")
+    print(f"warm (keep-alive + cached catalog): {warm_ms:8.2f} ms/checkout")
+    print(f"saved per warm checkout:            {cold_ms - warm_ms:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
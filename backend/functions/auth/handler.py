@@ -1,8 +1,21 @@
 import json
-import boto3
 import os
 from datetime import datetime, timedelta
 
+from common import activity, http_cache, rate_limit, sharding, user_cache
+from common.auth import decode_id_token
+from common.aws_clients import get_client
+from common.router import ANY, DEFAULT_MIDDLEWARE, HttpError, Router
+from common.usage import (
+    check_usage_limit, increment_usage_count, create_new_user, monthly_usage_count,
+    get_plan_rules, parse_premium_expiry, usage_month_attribute
+)
+
+# 条件付きGET（user-info / check-usage）: ETag の元にする users 項目の属性と Cache-Control の max-age（秒）
+VERSION_ATTRIBUTES = ('user_id', 'updated_at', 'premium_expiry')
+USER_INFO_MAX_AGE = 30
+USAGE_MAX_AGE = 10
+
 # JST時刻ユーティリティ関数
 def get_jst_now():
     """現在の日本時間（JST = UTC+9）を取得"""
@@ -13,155 +26,61 @@ def get_jst_isoformat():
     jst_time = get_jst_now()
     return jst_time.isoformat() + '+09:00'
 
-# Import usage checker functions (inline to avoid module dependency issues)
-def check_usage_limit(user_id, user_type='free'):
-    """ユーザーの解析使用制限をチェック"""
-    try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"{os.environ.get('PROJECT_NAME', 'ai-tourism-poc')}-users-{os.environ.get('STAGE', 'dev')}")
-        
-        try:
-            user_response = table.get_item(Key={'user_id': user_id})
-            if 'Item' not in user_response:
-                create_new_user(user_id)
-                user_data = {'user_type': 'free', 'monthly_analysis_count': 0, 'premium_expiry': None}
-            else:
-                user_data = user_response['Item']
-        except Exception as e:
-            print(f"Error getting user data: {e}")
-            create_new_user(user_id)
-            user_data = {'user_type': 'free', 'monthly_analysis_count': 0, 'premium_expiry': None}
-        
-        current_user_type = user_data.get('user_type', 'free')
-        
-        if current_user_type == 'free':
-            monthly_count = int(user_data.get('monthly_analysis_count', 0))
-            if monthly_count >= 5:
-                return {
-                    'allowed': False, 'remaining': 0, 'user_type': 'free',
-                    'message': '無料プランでは月5回まで解析可能です。プレミアムプランにアップグレードしてください。',
-                    'upgrade_required': True
-                }
-            return {'allowed': True, 'remaining': 5 - monthly_count, 'user_type': 'free', 'message': f'残り{5 - monthly_count}回利用可能です。'}
-        else:
-            return {'allowed': True, 'remaining': -1, 'user_type': current_user_type, 'message': 'プレミアムプラン利用中'}
-    except Exception as e:
-        print(f"Usage check error: {str(e)}")
-        return {'allowed': True, 'remaining': 5, 'user_type': 'free', 'message': 'システムエラー: 一時的に制限なしで利用可能'}
 
-def increment_usage_count(user_id):
-    """解析使用回数を増加"""
-    try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"{os.environ.get('PROJECT_NAME', 'ai-tourism-poc')}-users-{os.environ.get('STAGE', 'dev')}")
-        table.update_item(
-            Key={'user_id': user_id},
-            UpdateExpression='ADD monthly_analysis_count :inc, total_analysis_count :inc SET updated_at = :updated',
-            ExpressionAttributeValues={':inc': 1, ':updated': get_jst_isoformat()}
-        )
-        print(f"Usage count incremented for user: {user_id}")
-        return True
-    except Exception as e:
-        print(f"Error incrementing usage: {e}")
-        return False
+def rate_limit_middleware(request, call_next):
+    """Cognito を呼ぶエンドポイントはレート制限（超過時は Cognito を呼ばずに429）"""
+    if request.route is not None and request.route.path in rate_limit.LIMITS:
+        limited = check_rate_limit(request, request.route.path, request.response_headers)
+        if limited:
+            return limited
+    return call_next(request)
 
-def create_new_user(user_id, email='', display_name='', auth_provider='cognito'):
-    """新規ユーザー作成"""
-    try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"{os.environ.get('PROJECT_NAME', 'ai-tourism-poc')}-users-{os.environ.get('STAGE', 'dev')}")
-        
-        timestamp = get_jst_isoformat()
-        item = {
-            'user_id': user_id, 'email': email, 'auth_provider': auth_provider, 'display_name': display_name,
-            'profile_picture': '', 'preferred_language': 'ja', 'user_type': 'free', 'premium_expiry': None,
-            'monthly_analysis_count': 0, 'total_analysis_count': 0, 'last_login_at': timestamp,
-            'created_at': timestamp, 'updated_at': timestamp
-        }
-        table.put_item(Item=item)
-        print(f"New user created: {user_id}")
-        return item
-    except Exception as e:
-        print(f"Error creating new user: {e}")
-        return None
 
-# Cognito客户端初始化
-cognito_client = boto3.client('cognito-idp', region_name='ap-northeast-1')
+# 各エンドポイントは従来どおりメソッドを問わずパス（{proxy+}）で振り分ける
+router = Router(
+    'auth',
+    allow_headers='Content-Type,Authorization,If-None-Match',
+    expose_headers='ETag,Last-Modified,Retry-After',
+    auth=lambda event: get_user_from_token(event),
+    error_prefix='Authentication error',
+    middleware=DEFAULT_MIDDLEWARE + (rate_limit_middleware,)
+)
+
 
 def main(event, context):
     """
     認証・ユーザー管理のメインハンドラー（Cognito版）
     """
     try:
-        # CORS headers
-        headers = {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
-        }
-        
-        if event['httpMethod'] == 'OPTIONS':
-            return {'statusCode': 200, 'headers': headers, 'body': ''}
-        
-        # パスによる処理分岐
-        path = event.get('pathParameters', {}).get('proxy', '')
-        
-        if path == 'check-usage':
-            return handle_check_usage(event, headers)
-        elif path == 'increment-usage':
-            return handle_increment_usage(event, headers)
-        elif path == 'create-user':
-            return handle_create_user(event, headers)
-        elif path == 'user-info':
-            return handle_get_user_info(event, headers)
-        elif path == 'verify-token':
-            return handle_verify_token(event, headers)
-        elif path == 'signup':
-            return handle_signup_with_email(event, headers)
-        elif path == 'confirm-signup':
-            return handle_confirm_signup(event, headers)
-        elif path == 'login':
-            return handle_login_with_email(event, headers)
-        elif path == 'resend-code':
-            return handle_resend_confirmation_code(event, headers)
-        else:
-            return {
-                'statusCode': 404,
-                'headers': headers,
-                'body': json.dumps({'error': 'Endpoint not found'})
-            }
-            
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': headers,
-            'body': json.dumps({'error': f'Authentication error: {str(e)}'})
-        }
+        return router.dispatch(event, context)
+    finally:
+        # 応答前にアクティビティのバッファを反映（応答後はコンテナが凍結・破棄されうるため、待ち時間の上限付きで同期実行）
+        if activity.pending_count():
+            activity.flush(context)
 
 
+@router.route(ANY, 'check-usage', auth=True)
 def handle_check_usage(event, headers):
     """
     使用制限チェック処理
     """
     try:
-        # Cognitoトークンからユーザー情報取得
-        user_info = get_user_from_token(event)
-        if not user_info:
-            return {
-                'statusCode': 401,
-                'headers': headers,
-                'body': json.dumps({'error': 'Invalid or expired token'})
-            }
+        # 認証ユーザー（ルーターが1リクエストで1回だけ解決、未認証は401済み）
+        user_info = event.user
         
         user_id = user_info['user_id']
         
+        # バージョンは本文より先に読む（間に更新があっても ETag が古くなるだけで、新しい ETag に古い本文は載らない）
+        etag, last_modified = user_version('usage', user_id)
+        if http_cache.etag_matches(event, etag):
+            return http_cache.not_modified(headers, etag, USAGE_MAX_AGE, last_modified)
+        
         # 使用制限チェック
         usage_result = check_usage_limit(user_id)
         
         return {
             'statusCode': 200,
-            'headers': headers,
+            'headers': http_cache.cache_headers(headers, etag, USAGE_MAX_AGE, last_modified) if etag else headers,
             'body': json.dumps(usage_result)
         }
         
@@ -173,19 +92,14 @@ def handle_check_usage(event, headers):
         }
 
 
+@router.route(ANY, 'increment-usage', auth=True)
 def handle_increment_usage(event, headers):
     """
     使用回数増加処理
     """
     try:
-        # Cognitoトークンからユーザー情報取得
-        user_info = get_user_from_token(event)
-        if not user_info:
-            return {
-                'statusCode': 401,
-                'headers': headers,
-                'body': json.dumps({'error': 'Invalid or expired token'})
-            }
+        # 認証ユーザー（ルーターが1リクエストで1回だけ解決、未認証は401済み）
+        user_info = event.user
         
         user_id = user_info['user_id']
         
@@ -213,12 +127,13 @@ def handle_increment_usage(event, headers):
         }
 
 
+@router.route(ANY, 'create-user')
 def handle_create_user(event, headers):
     """
     新規ユーザー作成処理（Cognitoからコールバック用）
     """
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = event.json
         user_id = body.get('user_id')
         email = body.get('email', '')
         display_name = body.get('display_name', '')
@@ -258,19 +173,14 @@ def handle_create_user(event, headers):
         }
 
 
+@router.route(ANY, 'user-info', auth=True)
 def handle_get_user_info(event, headers):
     """
     ユーザー情報取得処理
     """
     try:
-        # Cognitoトークンからユーザー情報取得
-        user_info = get_user_from_token(event)
-        if not user_info:
-            return {
-                'statusCode': 401,
-                'headers': headers,
-                'body': json.dumps({'error': 'Invalid or expired token'})
-            }
+        # 認証ユーザー（ルーターが1リクエストで1回だけ解決、未認証は401済み）
+        user_info = event.user
         
         user_id = user_info['user_id']
         print(f"Getting user info for user_id: {user_id}")
@@ -294,15 +204,17 @@ def handle_get_user_info(event, headers):
                 'body': json.dumps(safe_user_data)
             }
         
-        # DynamoDBからユーザー詳細情報取得
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"{os.environ.get('PROJECT_NAME', 'ai-tourism-poc')}-users-{os.environ.get('STAGE', 'dev')}")
+        # 前回から変わっていなければ射影付きの読み込みだけで304
+        if http_cache.request_header(event, 'If-None-Match'):
+            etag, last_modified = user_version('user-info', user_id)
+            if http_cache.etag_matches(event, etag):
+                return http_cache.not_modified(headers, etag, USER_INFO_MAX_AGE, last_modified)
         
+        # DynamoDBからユーザー詳細情報取得（キャッシュ経由）
         try:
-            response = table.get_item(Key={'user_id': user_id})
-            print(f"DynamoDB response for {user_id}: {response}")
-            if 'Item' in response:
-                user_data = response['Item']
+            user_data = user_cache.get_user(user_id)
+            if user_data is not None:
+                etag, last_modified = user_version('user-info', user_id, user_data)
                 print(f"User data from DynamoDB: {user_data}")
                 # 機密情報を除外
                 safe_user_data = {
@@ -310,7 +222,7 @@ def handle_get_user_info(event, headers):
                     'email': user_data.get('email'),
                     'display_name': user_data.get('display_name', ''),
                     'user_type': user_data.get('user_type', 'free'),
-                    'monthly_analysis_count': int(user_data.get('monthly_analysis_count', 0)),
+                    'monthly_analysis_count': monthly_usage_count(user_data),
                     'total_analysis_count': int(user_data.get('total_analysis_count', 0)),
                     'premium_expiry': user_data.get('premium_expiry'),
                     'preferred_language': user_data.get('preferred_language', 'ja')
@@ -319,7 +231,7 @@ def handle_get_user_info(event, headers):
                 
                 return {
                     'statusCode': 200,
-                    'headers': headers,
+                    'headers': http_cache.cache_headers(headers, etag, USER_INFO_MAX_AGE, last_modified) if etag else headers,
                     'body': json.dumps(safe_user_data)
                 }
             else:
@@ -365,12 +277,13 @@ def handle_get_user_info(event, headers):
         }
 
 
+@router.route(ANY, 'verify-token')
 def handle_verify_token(event, headers):
     """
     Cognitoトークン検証
     """
     try:
-        user_info = get_user_from_token(event)
+        user_info = event.user
         
         if user_info:
             return {
@@ -404,10 +317,40 @@ def handle_verify_token(event, headers):
         }
 
 
+def user_version(kind, user_id, item=None):
+    """
+    user-info / check-usage の ETag と Last-Modified（条件付きGETの対象外なら (None, None)）
+
+    当月の使用回数の属性名・プレミアム期限切れの有無・無料上限は書き込みなしに変わるため ETag に含める。
+    check-usage はプレミアムの残り日数（本文の「残りN日」、evaluate_usage と同じ計算）も含める。
+    共有IDは使用回数がシャード項目にあり updated_at に反映されないため対象外。
+
+    Args:
+        item (dict): 読み込み済みのユーザー項目（省略時は射影付きで読む）
+    """
+    if user_id == 'emergency-user' or sharding.is_shared_identity(user_id):
+        return None, None
+    if item is None:
+        item = user_cache.get_user_version(user_id, VERSION_ATTRIBUTES)
+    if not item or not item.get('updated_at'):
+        return None, None
+    
+    now = get_jst_now()
+    expiry = parse_premium_expiry(item.get('premium_expiry'))
+    premium_active = bool(expiry and expiry > now)
+    days_remaining = (expiry - now).days if premium_active and kind == 'usage' else None
+    etag = http_cache.make_etag(
+        kind, user_id, item['updated_at'], usage_month_attribute(now),
+        premium_active, days_remaining, get_plan_rules().free_monthly_limit
+    )
+    return etag, http_cache.http_date(item['updated_at'])
+
+
 def get_user_from_token(event):
     """
     Cognitoトークンからユーザー情報を取得（緊急ログイントークン対応）
     """
+    cognito_client = get_client('cognito-idp')
     try:
         # Authorization ヘッダーから JWT トークン取得
         auth_header = event.get('headers', {}).get('Authorization', '')
@@ -453,12 +396,14 @@ def get_user_from_token(event):
         return None
 
 
+@router.route(ANY, 'signup')
 def handle_signup_with_email(event, headers):
     """
     メール認証付きユーザー登録
     """
+    cognito_client = get_client('cognito-idp')
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = event.json
         email = body.get('email', '').strip().lower()
         password = body.get('password', '').strip()
         display_name = body.get('display_name', '').strip()
@@ -511,12 +456,14 @@ def handle_signup_with_email(event, headers):
         }
 
 
+@router.route(ANY, 'confirm-signup')
 def handle_confirm_signup(event, headers):
     """
     メール認証コード確認
     """
+    cognito_client = get_client('cognito-idp')
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = event.json
         email = body.get('email', '').strip().lower()
         confirmation_code = body.get('confirmation_code', '').strip()
         
@@ -544,16 +491,12 @@ def handle_confirm_signup(event, headers):
             }
         )
         
-        # DynamoDBにユーザーレコード作成
-        user_response = cognito_client.get_user(
-            AccessToken=auth_response['AuthenticationResult']['AccessToken']
-        )
-        
-        user_attributes = {attr['Name']: attr['Value'] for attr in user_response['UserAttributes']}
+        # DynamoDBにユーザーレコード作成（ユーザー情報はIDトークンのクレームから取得）
+        user_info = decode_id_token(auth_response['AuthenticationResult']['IdToken'])
         create_new_user(
-            user_response['Username'],
-            user_attributes.get('email', ''),
-            user_attributes.get('name', ''),
+            user_info['user_id'],
+            user_info['email'],
+            user_info['display_name'],
             'cognito'
         )
         
@@ -564,9 +507,9 @@ def handle_confirm_signup(event, headers):
                 'message': 'Email confirmed successfully',
                 'tokens': auth_response['AuthenticationResult'],
                 'user_info': {
-                    'user_id': user_response['Username'],
-                    'email': user_attributes.get('email', ''),
-                    'display_name': user_attributes.get('name', '')
+                    'user_id': user_info['user_id'],
+                    'email': user_info['email'],
+                    'display_name': user_info['display_name']
                 }
             })
         }
@@ -591,12 +534,14 @@ def handle_confirm_signup(event, headers):
         }
 
 
+@router.route(ANY, 'login')
 def handle_login_with_email(event, headers):
     """
     メール・パスワードログイン
     """
+    cognito_client = get_client('cognito-idp')
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = event.json
         email = body.get('email', '').strip().lower()
         password = body.get('password', '').strip()
         
@@ -617,16 +562,12 @@ def handle_login_with_email(event, headers):
             }
         )
         
-        # ユーザー情報取得
-        user_response = cognito_client.get_user(
-            AccessToken=auth_response['AuthenticationResult']['AccessToken']
-        )
-        
-        user_attributes = {attr['Name']: attr['Value'] for attr in user_response['UserAttributes']}
-        user_id = user_response['Username']
+        # ユーザー情報はIDトークンのクレームから取得（GetUser の往復を省略）
+        user_info = decode_id_token(auth_response['AuthenticationResult']['IdToken'])
+        user_id = user_info['user_id']
         
-        # 最終ログイン更新
-        update_last_login(user_id)
+        # 最終ログイン更新（粒度内の再ログインは書き込まない、書き込みは応答前にまとめて実行）
+        record_last_login(user_id)
         
         return {
             'statusCode': 200,
@@ -636,8 +577,8 @@ def handle_login_with_email(event, headers):
                 'tokens': auth_response['AuthenticationResult'],
                 'user_info': {
                     'user_id': user_id,
-                    'email': user_attributes.get('email', ''),
-                    'display_name': user_attributes.get('name', '')
+                    'email': user_info['email'],
+                    'display_name': user_info['display_name']
                 }
             })
         }
@@ -662,12 +603,14 @@ def handle_login_with_email(event, headers):
         }
 
 
+@router.route(ANY, 'resend-code')
 def handle_resend_confirmation_code(event, headers):
     """
     認証コード再送信
     """
+    cognito_client = get_client('cognito-idp')
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = event.json
         email = body.get('email', '').strip().lower()
         
         if not email:
@@ -699,25 +642,35 @@ def handle_resend_confirmation_code(event, headers):
         }
 
 
-def update_last_login(user_id):
+def source_ip(event):
+    """送信元IP（API Gateway の requestContext から取得）"""
+    return ((event.get('requestContext') or {}).get('identity') or {}).get('sourceIp', '')
+
+
+def check_rate_limit(event, action, headers):
     """
-    最終ログイン時刻更新
+    メールアドレス・送信元IP単位のレート制限
+
+    Returns:
+        dict: 超過時は429レスポンス（上限内なら None）
     """
     try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"{os.environ.get('PROJECT_NAME', 'ai-tourism-poc')}-users-{os.environ.get('STAGE', 'dev')}")
-        
-        table.update_item(
-            Key={'user_id': user_id},
-            UpdateExpression='SET last_login_at = :timestamp, updated_at = :timestamp',
-            ExpressionAttributeValues={
-                ':timestamp': get_jst_isoformat()
-            }
-        )
-        
-        print(f"Last login updated for user: {user_id}")
-        return True
-        
-    except Exception as e:
-        print(f"Error updating last login: {e}")
-        return False
\ No newline at end of file
+        body = event.json
+    except HttpError:
+        body = {}
+    email = str(body.get('email', '')).strip().lower() if isinstance(body, dict) else ''
+    
+    retry_after = rate_limit.check(action, {'email': email, 'ip': source_ip(event)})
+    if retry_after is None:
+        return None
+    
+    return {
+        'statusCode': 429,
+        'headers': dict(headers, **{'Retry-After': str(retry_after)}),
+        'body': json.dumps({'error': 'Too many requests. Please try again later.', 'retry_after': retry_after})
+    }
+
+
+def record_last_login(user_id):
+    """最終ログイン時刻を記録（粒度内の再ログインは省略し、書き込みは応答前の flush で行う）"""
+    return activity.touch(user_id)
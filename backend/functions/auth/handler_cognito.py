@@ -1,6 +1,5 @@
 import json
 import os
-import boto3
 from datetime import datetime
 import urllib.request
 import urllib.parse
@@ -8,62 +7,30 @@ import hashlib
 import base64
 import hmac
 
+from common.aws_clients import get_client
+from common.router import Router, proxy_path
+
+router = Router(
+    'auth-cognito',
+    allow_methods='GET,POST,OPTIONS,PUT,DELETE',
+    path=lambda event: proxy_path(event).lower()
+)
+
+
 def main(event, context):
     """
     AWS Cognito統合認証関数
     """
-    try:
-        # CORS headers
-        headers = {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS,PUT,DELETE'
-        }
-        
-        if event['httpMethod'] == 'OPTIONS':
-            return {
-                'statusCode': 200,
-                'headers': headers,
-                'body': ''
-            }
-        
-        # パス解析
-        path = event.get('pathParameters', {}).get('proxy', '').lower()
-        http_method = event['httpMethod']
-        
-        if http_method == 'POST':
-            if path == 'register':
-                return handle_register(event, headers)
-            elif path == 'login':
-                return handle_login(event, headers)
-            elif path == 'confirm':
-                return handle_confirm_signup(event, headers)
-        elif http_method == 'GET':
-            if path == 'verify':
-                return handle_verify_token(event, headers)
-        
-        return {
-            'statusCode': 404,
-            'headers': headers,
-            'body': json.dumps({'error': 'Endpoint not found'})
-        }
-        
-    except Exception as e:
-        print(f"Auth error: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': headers,
-            'body': json.dumps({'error': str(e)})
-        }
+    return router.dispatch(event, context)
 
 
+@router.route('POST', 'register')
 def handle_register(event, headers):
     """
     Cognitoユーザー登録
     """
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = event.json
         email = body.get('email')
         password = body.get('password')
         name = body.get('name', '')
@@ -76,7 +43,7 @@ def handle_register(event, headers):
             }
         
         # Cognito Client初期化
-        cognito_client = boto3.client('cognito-idp')
+        cognito_client = get_client('cognito-idp')
         
         # ユーザープールIDとクライアントIDを取得（環境変数から）
         user_pool_id = get_user_pool_id()
@@ -132,12 +99,13 @@ def handle_register(event, headers):
         }
 
 
+@router.route('POST', 'login')
 def handle_login(event, headers):
     """
     Cognitoユーザーログイン
     """
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = event.json
         email = body.get('email')
         password = body.get('password')
         
@@ -149,7 +117,7 @@ def handle_login(event, headers):
             }
         
         # Cognito Client初期化
-        cognito_client = boto3.client('cognito-idp')
+        cognito_client = get_client('cognito-idp')
         
         client_id = get_client_id()
         
@@ -216,12 +184,13 @@ def handle_login(event, headers):
         }
 
 
+@router.route('POST', 'confirm')
 def handle_confirm_signup(event, headers):
     """
     ユーザー確認（メール認証）
     """
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = event.json
         email = body.get('email')
         confirmation_code = body.get('confirmationCode')
         
@@ -232,7 +201,7 @@ def handle_confirm_signup(event, headers):
                 'body': json.dumps({'error': 'Email and confirmation code are required'})
             }
         
-        cognito_client = boto3.client('cognito-idp')
+        cognito_client = get_client('cognito-idp')
         client_id = get_client_id()
         
         # 確認コード検証
@@ -269,6 +238,7 @@ def handle_confirm_signup(event, headers):
         }
 
 
+@router.route('GET', 'verify')
 def handle_verify_token(event, headers):
     """
     アクセストークン検証
@@ -285,7 +255,7 @@ def handle_verify_token(event, headers):
         
         access_token = auth_header.replace('Bearer ', '')
         
-        cognito_client = boto3.client('cognito-idp')
+        cognito_client = get_client('cognito-idp')
         
         # トークンでユーザー情報取得
         user_info = cognito_client.get_user(AccessToken=access_token)
@@ -354,7 +324,7 @@ def create_demo_user_if_not_exists():
     デモユーザー 'tourist-guide' を自動作成
     """
     try:
-        cognito_client = boto3.client('cognito-idp')
+        cognito_client = get_client('cognito-idp')
         user_pool_id = get_user_pool_id()
         
         try:
@@ -0,0 +1,96 @@
+import json
+from decimal import Decimal
+
+from common import user_cache
+from common.auth import get_user_from_token
+from common.jst import get_jst_now
+from common.router import Router
+from common.single_table import DEFAULT_LATEST_ANALYSES, get_bootstrap
+from common.usage import PlanState, create_new_user, evaluate_usage, monthly_usage_count
+
+MAX_LATEST_ANALYSES = 20
+
+# フロントエンドへ返すプロフィール属性（/auth/user-info と同じ）
+PROFILE_FIELDS = ('user_id', 'email', 'display_name', 'user_type', 'total_analysis_count',
+                  'premium_expiry', 'preferred_language')
+
+
+router = Router(
+    'bootstrap',
+    allow_methods='GET,OPTIONS',
+    path=lambda event: '',
+    auth=lambda event: get_user_from_token(event),
+    unauthorized_body={'error': 'Authentication required'},
+    hide_errors=True
+)
+
+
+def main(event, context):
+    """
+    アプリ起動時の初期データ一括取得（GET /bootstrap?latest=5）
+
+    /auth/user-info・/auth/check-usage・履歴一覧を個別に呼ぶ代わりに、
+    プロフィール・使用状況・プレミアム状態・最新の解析履歴を1リクエストで返す。
+    """
+    return router.dispatch(event, context)
+
+
+@router.route('GET', '', auth=True)
+def handle_bootstrap(event, headers):
+    """初期データ（latest は最新の解析履歴の件数）"""
+    params = event.get('queryStringParameters') or {}
+    try:
+        latest = min(max(int(params.get('latest', DEFAULT_LATEST_ANALYSES)), 0), MAX_LATEST_ANALYSES)
+    except ValueError:
+        latest = DEFAULT_LATEST_ANALYSES
+
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps(build_bootstrap(event.user, latest), ensure_ascii=False, default=json_default)
+    }
+
+
+def build_bootstrap(user_info, latest):
+    """初期データ作成（シングルテーブル未移行のユーザーは users テーブルから取得）"""
+    user_id = user_info['user_id']
+    now = get_jst_now()
+    data = get_bootstrap(user_id, latest, now)
+    profile = data['profile']
+    monthly_count = data['monthly_count']
+
+    if profile is None:
+        profile = user_cache.get_user(user_id)
+        if profile is None:
+            profile = create_new_user(
+                user_id, user_info.get('email', ''), user_info.get('display_name', '')
+            ) or {'user_id': user_id}
+        monthly_count = monthly_usage_count(profile, now)
+
+    state = PlanState.from_item(user_id, profile, now)
+    state.monthly_count = monthly_count
+    usage = evaluate_usage(state, now)
+
+    user = {field: profile.get(field) for field in PROFILE_FIELDS}
+    user['user_type'] = user['user_type'] or 'free'
+    user['monthly_analysis_count'] = monthly_count
+
+    return {
+        'user': user,
+        'usage': usage,
+        'premium': {
+            'active': state.is_premium(now),
+            'expired': state.is_expired_premium(now),
+            'expiry': profile.get('premium_expiry')
+        },
+        'latest_analyses': [
+            {k: v for k, v in item.items() if k not in ('PK', 'SK')} for item in data['latest_analyses']
+        ]
+    }
+
+
+def json_default(value):
+    """DynamoDBの数値（Decimal）をJSONに変換"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,168 @@
+import json
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from boto3.dynamodb.conditions import Key
+
+from common import single_table
+from common.account_export import export_s3_key, export_user_data, presigned_download_url
+from common.auth import get_user_from_token
+from common.aws_clients import get_client
+from common.jst import get_jst_isoformat
+from common.router import Router, path_parameter
+
+EXPORT_PREFIX = 'EXPORT#'
+# 署名付きダウンロードURLの有効期限（秒）
+DOWNLOAD_URL_EXPIRES = int(os.environ.get('EXPORT_DOWNLOAD_URL_EXPIRES', '3600'))
+# 同時に実行できるエクスポート（pending / running）の数
+MAX_ACTIVE_EXPORTS = 1
+# これより長く更新のない pending / running はワーカーのタイムアウトとみなす
+STALE_EXPORT_AFTER = timedelta(minutes=20)
+
+
+# export は開始、export/{jobId} は状態確認（pathParameters の jobId で振り分け）
+router = Router(
+    'data-export',
+    path=path_parameter('jobId'),
+    auth=lambda event: get_user_from_token(event),
+    unauthorized_body={'error': 'Authentication required'},
+    hide_errors=True
+)
+
+
+def main(event, context):
+    """
+    個人データエクスポートAPI
+    POST /export            エクスポート開始（非同期ジョブ、202でジョブIDを返す）
+    GET  /export/{jobId}    ジョブ状態（完了時は署名付きダウンロードURL）
+    """
+    return router.dispatch(event, context)
+
+
+@router.route('POST', '', auth=True)
+def handle_start(event, headers):
+    """エクスポート開始"""
+    return start_export(event.user['user_id'], headers)
+
+
+@router.route('GET', '{job_id}', auth=True)
+def handle_status(event, headers):
+    """ジョブ状態"""
+    return get_export_status(event.user['user_id'], event.params['job_id'], headers)
+
+
+def job_key(user_id, job_id):
+    return {'PK': single_table.user_pk(user_id), 'SK': f"{EXPORT_PREFIX}{job_id}"}
+
+
+def active_exports(user_id):
+    """実行中（pending / running）のエクスポート数"""
+    response = single_table.app_table().query(
+        KeyConditionExpression=Key('PK').eq(single_table.user_pk(user_id)) & Key('SK').begins_with(EXPORT_PREFIX),
+        ProjectionExpression='#status, updated_at',
+        ExpressionAttributeNames={'#status': 'status'}
+    )
+    stale_before = datetime.now(timezone.utc) - STALE_EXPORT_AFTER
+    return sum(
+        1 for item in response.get('Items', [])
+        if item.get('status') in ('pending', 'running')
+        and datetime.fromisoformat(item['updated_at']) > stale_before
+    )
+
+
+def start_export(user_id, headers):
+    """ジョブを登録してワーカーを非同期Invoke"""
+    if active_exports(user_id) >= MAX_ACTIVE_EXPORTS:
+        return {
+            'statusCode': 409,
+            'headers': headers,
+            'body': json.dumps({'error': 'Export already in progress'})
+        }
+
+    job_id = str(uuid.uuid4())
+    timestamp = get_jst_isoformat()
+    single_table.app_table().put_item(Item=dict(
+        job_key(user_id, job_id),
+        job_id=job_id, status='pending', created_at=timestamp, updated_at=timestamp
+    ))
+    get_client('lambda').invoke(
+        FunctionName=os.environ['DATA_EXPORT_FUNCTION'],
+        InvocationType='Event',
+        Payload=json.dumps({'user_id': user_id, 'job_id': job_id}).encode('utf-8')
+    )
+    print(f"Data export requested: {user_id} {job_id}")
+
+    return {
+        'statusCode': 202,
+        'headers': headers,
+        'body': json.dumps({'job_id': job_id, 'status': 'pending'})
+    }
+
+
+def get_export_status(user_id, job_id, headers):
+    """ジョブ状態取得（他ユーザーのジョブは404）"""
+    job = single_table.app_table().get_item(Key=job_key(user_id, job_id)).get('Item')
+    if not job:
+        return {
+            'statusCode': 404,
+            'headers': headers,
+            'body': json.dumps({'error': 'Export not found'})
+        }
+
+    body = {
+        'job_id': job_id,
+        'status': job['status'],
+        'created_at': job.get('created_at'),
+        'updated_at': job.get('updated_at')
+    }
+    if job['status'] == 'ready':
+        body.update({
+            'download_url': presigned_download_url(job['s3_key'], DOWNLOAD_URL_EXPIRES, f"export-{job_id}.zip"),
+            'expires_in': DOWNLOAD_URL_EXPIRES,
+            'size': int(job.get('size', 0)),
+            'analyses': int(job.get('analyses', 0)),
+            'payments': int(job.get('payments', 0)),
+            'images': int(job.get('images', 0))
+        })
+    elif job['status'] == 'failed':
+        body['error'] = job.get('error', '')
+
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps(body)
+    }
+
+
+def update_job(user_id, job_id, status, **values):
+    values.update({'status': status, 'updated_at': get_jst_isoformat()})
+    names = {f'#a{i}': name for i, name in enumerate(values)}
+    single_table.app_table().update_item(
+        Key=job_key(user_id, job_id),
+        UpdateExpression='SET ' + ', '.join(f'#a{i} = :v{i}' for i in range(len(values))),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues={f':v{i}': value for i, value in enumerate(values.values())}
+    )
+
+
+def worker(event, context):
+    """
+    エクスポート実行（非同期Invoke）
+
+    ZIPをS3マルチパートアップロードへストリーム出力するため、
+    写真が数千枚あってもメモリ使用量はパートサイズ＋先読み分に収まる。
+    """
+    user_id = event['user_id']
+    job_id = event['job_id']
+    update_job(user_id, job_id, 'running')
+    try:
+        result = export_user_data(user_id, export_s3_key(user_id, job_id))
+    except Exception as e:
+        print(f"Data export failed: {user_id} {job_id} {str(e)}")
+        update_job(user_id, job_id, 'failed', error=str(e)[:500])
+        return {'status': 'failed'}
+
+    update_job(user_id, job_id, 'ready', **result)
+    print(f"Data export ready: {user_id} {job_id} {result}")
+    return dict(result, status='ready')
@@ -0,0 +1,147 @@
+import json
+import base64
+import binascii
+
+from boto3.dynamodb.conditions import Key
+
+from common.aws_clients import get_table
+from common.auth import get_user_from_token
+from common.image_store import USER_CREATED_INDEX, load_analysis_text
+from common.router import HttpError, Router, path_parameter
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+
+# 一覧表示に必要な属性のみ（GSIのINCLUDE属性と一致させる）
+HISTORY_PROJECTION = 'image_id, created_at, analysis_type, #lang, analysis_summary, response_truncated, s3_url, #status, original_filename'
+HISTORY_ATTRIBUTE_NAMES = {'#lang': 'language', '#status': 'status'}
+
+# 詳細表示用（全文は analysis_compressed / analysis_s3_key から復元）
+DETAIL_PROJECTION = (
+    'image_id, user_id, created_at, analysis_type, #lang, analysis_summary, response_truncated, '
+    's3_url, #status, original_filename, analyzed_at, analysis_compressed, analysis_s3_key'
+)
+
+
+# history は一覧、history/{imageId} は詳細（pathParameters の imageId で振り分け）
+router = Router(
+    'history',
+    allow_methods='GET,OPTIONS',
+    path=path_parameter('imageId'),
+    auth=lambda event: get_user_from_token(event),
+    unauthorized_body={'error': 'Authentication required'},
+    hide_errors=True
+)
+
+
+def main(event, context):
+    """
+    解析履歴API
+    GET /history?limit=20&cursor=...  一覧
+    GET /history/{imageId}            解析結果全文（保存済み結果を返すのみでモデルは呼び出さない）
+    """
+    return router.dispatch(event, context)
+
+
+@router.route('GET', '', auth=True)
+def handle_list(event, headers):
+    """履歴一覧（1ページ分）"""
+    user_id = event.user['user_id']
+    params = event.get('queryStringParameters') or {}
+    try:
+        limit = min(max(int(params.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        start_key = decode_cursor(params.get('cursor'), user_id)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+    page = get_history_page(user_id, limit, start_key)
+
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps(page, ensure_ascii=False)
+    }
+
+
+@router.route('GET', '{image_id}', auth=True)
+def handle_detail(event, headers):
+    """解析結果全文"""
+    return get_history_detail(event.user['user_id'], event.params['image_id'], headers)
+
+
+def get_history_page(user_id, limit, start_key=None):
+    """
+    新しい順に1ページ分の履歴を取得（1回のQuery）
+
+    Returns:
+        dict: items, next_cursor（最終ページは None）
+    """
+    query_kwargs = {
+        'IndexName': USER_CREATED_INDEX,
+        'KeyConditionExpression': Key('user_id').eq(user_id),
+        'ProjectionExpression': HISTORY_PROJECTION,
+        'ExpressionAttributeNames': HISTORY_ATTRIBUTE_NAMES,
+        'ScanIndexForward': False,
+        'Limit': limit
+    }
+    if start_key:
+        query_kwargs['ExclusiveStartKey'] = start_key
+
+    response = get_table('images').query(**query_kwargs)
+
+    return {
+        'items': response.get('Items', []),
+        'next_cursor': encode_cursor(response.get('LastEvaluatedKey'))
+    }
+
+
+def get_history_detail(user_id, image_id, headers):
+    """解析結果全文を返す（他ユーザーの画像は404）"""
+    item = get_table('images').get_item(
+        Key={'image_id': image_id},
+        ProjectionExpression=DETAIL_PROJECTION,
+        ExpressionAttributeNames=HISTORY_ATTRIBUTE_NAMES
+    ).get('Item')
+
+    if not item or item.get('user_id') != user_id:
+        return {
+            'statusCode': 404,
+            'headers': headers,
+            'body': json.dumps({'error': 'Analysis not found'})
+        }
+
+    analysis = load_analysis_text(item)
+    detail = {key: value for key, value in item.items() if key not in ('analysis_compressed', 'analysis_s3_key')}
+    # 全文保存前の旧データは要約のみ
+    detail['analysis'] = analysis if analysis is not None else item.get('analysis_summary', '')
+    detail['full_text'] = analysis is not None
+
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps(detail, ensure_ascii=False)
+    }
+
+
+def encode_cursor(last_evaluated_key):
+    """LastEvaluatedKey をURLセーフな文字列に変換"""
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+
+def decode_cursor(cursor, user_id):
+    """
+    カーソルを ExclusiveStartKey に復元
+
+    他ユーザーのキーを指定したカーソルは拒否する
+    """
+    if not cursor:
+        return None
+    try:
+        start_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(start_key, dict) or start_key.get('user_id') != user_id:
+        raise ValueError('Invalid cursor')
+    return start_key
@@ -1,11 +1,13 @@
 import json
-import boto3
 import base64
 import os
 from datetime import datetime, timedelta
 from decimal import Decimal
 import google.generativeai as genai
 
+from common.aws_clients import get_client, get_table
+from common.usage import check_usage_limit, increment_usage_count
+
 # JST時刻関数
 def get_jst_now():
     """現在の日本時間（JST = UTC+9）を取得"""
@@ -16,78 +18,6 @@ def get_jst_isoformat():
     jst_time = get_jst_now()
     return jst_time.isoformat() + '+09:00'
 
-# Usage checking functions (imported from auth handler)
-def check_usage_limit(user_id, user_type='free'):
-    """ユーザーの解析使用制限をチェック"""
-    try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"{os.environ.get('PROJECT_NAME', 'ai-tourism-poc')}-users-{os.environ.get('STAGE', 'dev')}")
-        
-        try:
-            user_response = table.get_item(Key={'user_id': user_id})
-            if 'Item' not in user_response:
-                create_new_user(user_id)
-                user_data = {'user_type': 'free', 'monthly_analysis_count': 0, 'premium_expiry': None}
-            else:
-                user_data = user_response['Item']
-        except Exception as e:
-            print(f"Error getting user data: {e}")
-            create_new_user(user_id)
-            user_data = {'user_type': 'free', 'monthly_analysis_count': 0, 'premium_expiry': None}
-        
-        current_user_type = user_data.get('user_type', 'free')
-        
-        if current_user_type == 'free':
-            monthly_count = int(user_data.get('monthly_analysis_count', 0))
-            if monthly_count >= 5:
-                return {
-                    'allowed': False, 'remaining': 0, 'user_type': 'free',
-                    'message': '無料プランでは月5回まで解析可能です。プレミアムプランにアップグレードしてください。',
-                    'upgrade_required': True
-                }
-            return {'allowed': True, 'remaining': 5 - monthly_count, 'user_type': 'free', 'message': f'残り{5 - monthly_count}回利用可能です。'}
-        else:
-            return {'allowed': True, 'remaining': -1, 'user_type': current_user_type, 'message': 'プレミアムプラン利用中'}
-    except Exception as e:
-        print(f"Usage check error: {str(e)}")
-        return {'allowed': True, 'remaining': 5, 'user_type': 'free', 'message': 'システムエラー: 一時的に制限なしで利用可能'}
-
-def increment_usage_count(user_id):
-    """解析使用回数を増加"""
-    try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"{os.environ.get('PROJECT_NAME', 'ai-tourism-poc')}-users-{os.environ.get('STAGE', 'dev')}")
-        table.update_item(
-            Key={'user_id': user_id},
-            UpdateExpression='ADD monthly_analysis_count :inc, total_analysis_count :inc SET updated_at = :updated',
-            ExpressionAttributeValues={':inc': 1, ':updated': get_jst_isoformat()}
-        )
-        print(f"Usage count incremented for user: {user_id}")
-        return True
-    except Exception as e:
-        print(f"Error incrementing usage: {e}")
-        return False
-
-def create_new_user(user_id, email='', display_name='', auth_provider='cognito'):
-    """新規ユーザー作成"""
-    try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"{os.environ.get('PROJECT_NAME', 'ai-tourism-poc')}-users-{os.environ.get('STAGE', 'dev')}")
-        
-        timestamp = get_jst_isoformat()
-        item = {
-            'user_id': user_id, 'email': email, 'auth_provider': auth_provider, 'display_name': display_name,
-            'profile_picture': '', 'preferred_language': 'ja', 'user_type': 'free', 'premium_expiry': None,
-            'monthly_analysis_count': 0, 'total_analysis_count': 0, 'last_login_at': timestamp,
-            'created_at': timestamp, 'updated_at': timestamp
-        }
-        table.put_item(Item=item)
-        print(f"New user created: {user_id}")
-        return item
-    except Exception as e:
-        print(f"Error creating new user: {e}")
-        return None
-
 def get_user_from_token(event):
     """
     Cognitoトークンからユーザー情報を取得（緊急ログイントークン対応）
@@ -113,7 +43,7 @@ def get_user_from_token(event):
             }
         
         # CognitoでJWTトークンを検証してユーザー情報取得
-        cognito_client = boto3.client('cognito-idp', region_name='ap-northeast-1')
+        cognito_client = get_client('cognito-idp')
         response = cognito_client.get_user(AccessToken=access_token)
         print(f"Cognito user response: {response['Username']}")
         
@@ -202,7 +132,7 @@ def main(event, context):
         
         # 解析成功時のみ使用回数を増加
         if not analysis_result.get('error', False):
-            increment_result = increment_usage_count(user_id)
+            increment_result = increment_usage_count(user_id, language=language)
             print(f"Usage count increment result: {increment_result}")
         
         # DynamoDB記録
@@ -306,9 +236,7 @@ def save_analysis_log(user_id, result, image_data):
     分析結果をDynamoDBに保存
     """
     try:
-        dynamodb = boto3.resource('dynamodb')
-        table_name = f"ai-tourism-poc-analysis-history-{os.environ.get('STAGE', 'dev')}"
-        table = dynamodb.Table(table_name)
+        table = get_table('analysis-history')
         
         # 画像データサイズを記録（完全なデータは保存しない）
         image_size = len(image_data) if image_data else 0
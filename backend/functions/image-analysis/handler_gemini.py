@@ -1,11 +1,18 @@
 import json
 import os
 import base64
+import time
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import urllib.request
 import urllib.parse
-import boto3
-from decimal import Decimal
+from botocore.exceptions import ClientError
+
+from common import sharding
+from common.aws_clients import get_client, get_table
+from common.image_store import images_bucket, upload_image, save_image_metadata, update_image_with_analysis
+from common.router import DEFAULT_MIDDLEWARE, Router, last_path_segment
+from common.usage import check_usage_limit, increment_and_check
 
 # JST時刻ユーティリティ関数（Lambda内実装）
 def get_jst_now():
@@ -21,209 +28,412 @@ def get_jst_timestamp():
     """ファイル名用のタイムスタンプ（JST）を取得"""
     return get_jst_now().strftime('%Y%m%d_%H%M%S')
 
-# Cognitoクライアント初期化
-cognito_client = boto3.client('cognito-idp', region_name='ap-northeast-1')
+# 先行解析設定（off / s3: S3イベント起動 / invoke: アップロード関数からの非同期Invoke）
+SPECULATIVE_ANALYSIS_MODE = os.environ.get('SPECULATIVE_ANALYSIS', 'off')
+SPECULATIVE_JOIN_TIMEOUT = float(os.environ.get('SPECULATIVE_JOIN_TIMEOUT', '10'))
+SPECULATIVE_POLL_INTERVAL = 0.5
+# 待機打ち切り後に自前で解析するため残しておく秒数
+SPECULATIVE_FALLBACK_RESERVE = float(os.environ.get('SPECULATIVE_FALLBACK_RESERVE', '8'))
+SPECULATIVE_CLAIM_RETRIES = 5
 
-# Usage checker functions
-def check_usage_limit(user_id, user_type='free'):
-    """ユーザーの解析使用制限をチェック"""
-    try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"{os.environ.get('PROJECT_NAME', 'ai-tourism-poc')}-users-{os.environ.get('STAGE', 'dev')}")
-        
-        try:
-            user_response = table.get_item(Key={'user_id': user_id})
-            if 'Item' not in user_response:
-                create_new_user(user_id)
-                user_data = {'user_type': 'free', 'monthly_analysis_count': 0, 'premium_expiry': None}
-            else:
-                user_data = user_response['Item']
-        except Exception as e:
-            print(f"Error getting user data: {e}")
-            create_new_user(user_id)
-            user_data = {'user_type': 'free', 'monthly_analysis_count': 0, 'premium_expiry': None}
-        
-        current_user_type = user_data.get('user_type', 'free')
-        
-        if current_user_type == 'free':
-            monthly_count = int(user_data.get('monthly_analysis_count', 0))
-            if monthly_count >= 5:
-                return {
-                    'allowed': False, 'remaining': 0, 'user_type': 'free',
-                    'message': '無料プランでは月5回まで解析可能です。プレミアムプランにアップグレードしてください。',
-                    'upgrade_required': True
-                }
-            return {'allowed': True, 'remaining': 5 - monthly_count, 'user_type': 'free', 'message': f'残り{5 - monthly_count}回利用可能です。'}
-        else:
-            return {'allowed': True, 'remaining': -1, 'user_type': current_user_type, 'message': 'プレミアムプラン利用中'}
-    except Exception as e:
-        print(f"Usage check error: {str(e)}")
-        return {'allowed': True, 'remaining': 5, 'user_type': 'free', 'message': 'システムエラー: 一時的に制限なしで利用可能'}
 
-def create_new_user(user_id, email='', display_name='', auth_provider='cognito'):
-    """新規ユーザー作成"""
-    try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"{os.environ.get('PROJECT_NAME', 'ai-tourism-poc')}-users-{os.environ.get('STAGE', 'dev')}")
-        
-        timestamp = get_jst_isoformat()
-        item = {
-            'user_id': user_id, 'email': email, 'auth_provider': auth_provider, 'display_name': display_name,
-            'profile_picture': '', 'preferred_language': 'ja', 'user_type': 'free', 'premium_expiry': None,
-            'monthly_analysis_count': 0, 'total_analysis_count': 0, 'last_login_at': timestamp,
-            'created_at': timestamp, 'updated_at': timestamp
+def resolve_user(event):
+    """Cognito認証（緊急ログイントークンはダミーユーザー）"""
+    user_info = get_user_from_token(event)
+    if not user_info:
+        auth_header = event.get('headers', {}).get('Authorization', '')
+        if auth_header == 'Bearer emergency-login-token':
+            # 緊急ログイン用のダミーユーザー情報
+            user_info = {
+                'user_id': 'emergency-user',
+                'email': 'emergency@test.com',
+                'display_name': 'Emergency User'
+            }
+    return user_info
+
+
+def usage_limit_middleware(request, call_next):
+    """使用制限チェック（上限に達していれば解析せずに403）"""
+    if request.route is None:
+        return call_next(request)
+    user_id = request.user['user_id']
+    print(f"User ID for usage counting: {user_id}")
+    print(f"User info: {request.user}")
+    
+    usage_check = check_usage_limit(user_id)
+    if not usage_check.get('allowed', False):
+        return {
+            'statusCode': 403,
+            'headers': request.response_headers,
+            'body': json.dumps({
+                'error': 'Usage limit exceeded',
+                'message': usage_check.get('message', '使用制限に達しました'),
+                'remaining': usage_check.get('remaining', 0),
+                'user_type': usage_check.get('user_type', 'free'),
+                'upgrade_required': usage_check.get('upgrade_required', False)
+            })
         }
-        table.put_item(Item=item)
-        print(f"New user created: {user_id}")
-        return item
-    except Exception as e:
-        print(f"Error creating new user: {e}")
-        return None
+    return call_next(request)
+
+
+# /analyze と /upload-and-analyze（どちらもログイン必須・使用制限あり）
+router = Router(
+    'image-analysis',
+    path=last_path_segment,
+    auth=lambda event: resolve_user(event),
+    unauthorized_body={
+        'error': 'Authentication required',
+        'message': '画像解析にはログインが必要です。'
+    },
+    middleware=DEFAULT_MIDDLEWARE + (usage_limit_middleware,)
+)
 
-def increment_usage_count(user_id):
-    """解析使用回数を増加"""
-    try:
-        import boto3
-        from datetime import datetime
-        
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"{os.environ.get('PROJECT_NAME', 'ai-tourism-poc')}-users-{os.environ.get('STAGE', 'dev')}")
-        
-        table.update_item(
-            Key={'user_id': user_id},
-            UpdateExpression='ADD monthly_analysis_count :inc, total_analysis_count :inc SET updated_at = :updated',
-            ExpressionAttributeValues={
-                ':inc': 1,
-                ':updated': get_jst_isoformat()
-            }
-        )
-        
-        print(f"DynamoDB: Usage count incremented for user: {user_id}")
-        return True
-        
-    except Exception as e:
-        print(f"DynamoDB Error: Failed to increment usage count for {user_id}: {e}")
-        return False
 
 def main(event, context):
     """
     実際のGemini APIを使用した画像解析関数（使用制限チェック付き）
     """
-    try:
-        # CORS headers
-        headers = {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+    return router.dispatch(event, context)
+
+
+@router.route('POST', 'analyze', auth=True)
+def handle_analyze(event, headers):
+    """
+    画像解析（アップロード済み画像の先行解析結果、または送信された画像を解析）
+    """
+    user_id = event.user['user_id']
+    
+    # リクエスト解析
+    body = event.json
+    image_data = body.get('image')
+    language = body.get('language', 'ja')
+    analysis_type = body.get('type', 'store')  # 'store' or 'menu'
+    image_id = body.get('imageId')  # フロントエンドから送信される画像ID
+    s3_url = body.get('s3Url')      # S3 URL
+
+    if not image_data and not image_id:
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({'error': 'Image data is required'})
         }
-        
-        if event['httpMethod'] == 'OPTIONS':
-            return {
-                'statusCode': 200,
-                'headers': headers,
-                'body': ''
-            }
-            
-        # Cognito認証とユーザー情報取得
-        user_info = get_user_from_token(event)
-        if not user_info:
-            # 緊急ログイントークンをチェック
-            auth_header = event.get('headers', {}).get('Authorization', '')
-            if auth_header == 'Bearer emergency-login-token':
-                # 緊急ログイン用のダミーユーザー情報
-                user_info = {
-                    'user_id': 'emergency-user',
-                    'email': 'emergency@test.com',
-                    'display_name': 'Emergency User'
-                }
-            else:
-                return {
-                    'statusCode': 401,
-                    'headers': headers,
-                    'body': json.dumps({
-                        'error': 'Authentication required',
-                        'message': '画像解析にはログインが必要です。'
-                    })
-                }
-        
-        user_id = user_info['user_id']
-        print(f"User ID for usage counting: {user_id}")
-        print(f"User info: {user_info}")
-        
-        # 使用制限チェック
-        usage_check = check_usage_limit(user_id)
-        if not usage_check.get('allowed', False):
-            return {
-                'statusCode': 403,
-                'headers': headers,
-                'body': json.dumps({
-                    'error': 'Usage limit exceeded',
-                    'message': usage_check.get('message', '使用制限に達しました'),
-                    'remaining': usage_check.get('remaining', 0),
-                    'user_type': usage_check.get('user_type', 'free'),
-                    'upgrade_required': usage_check.get('upgrade_required', False)
-                })
-            }
-        
-        # リクエスト解析
-        body = json.loads(event.get('body', '{}'))
-        image_data = body.get('image')
-        language = body.get('language', 'ja')
-        analysis_type = body.get('type', 'store')  # 'store' or 'menu'
-        image_id = body.get('imageId')  # フロントエンドから送信される画像ID
-        s3_url = body.get('s3Url')      # S3 URL
-        
+
+    # アップロード時の先行解析があれば利用（実行中なら完了を待つ）
+    analysis_result = None
+    if image_id:
+        analysis_result = get_speculative_analysis(image_id, user_id, language, analysis_type, event.context)
+
+    if analysis_result is None:
         if not image_data:
             return {
                 'statusCode': 400,
                 'headers': headers,
                 'body': json.dumps({'error': 'Image data is required'})
             }
-        
         # Gemini API呼び出し
         analysis_result = analyze_image_with_gemini_rest(image_data, language, analysis_type)
-        
-        # 解析成功時に使用回数を増加
-        if analysis_result.get('status') == 'success':
-            print(f"Analysis successful, incrementing usage count for user: {user_id}")
-            increment_success = increment_usage_count(user_id)
-            if increment_success:
-                print(f"Successfully incremented usage count for user: {user_id}")
-            else:
-                print(f"Failed to increment usage count for user: {user_id}")
-        
-        # 解析結果をDynamoDBに保存（image_idがある場合のみ）
-        if image_id and analysis_result.get('analysis'):
-            update_image_with_analysis(image_id, analysis_result['analysis'])
-        
-        # 残り使用回数情報を含めて返却
+
+    # 解析成功時に使用回数を増加（先行解析の結果もここで初めて課金）
+    # 更新後の値から残り回数を判定するため、再読み込みは失敗時のみ
+    updated_usage_check = None
+    if analysis_result.get('status') == 'success':
+        print(f"Analysis successful, incrementing usage count for user: {user_id}")
+        updated_usage_check = increment_and_check(user_id, analysis_type, language)
+        if updated_usage_check is None:
+            print(f"Failed to increment usage count for user: {user_id}")
+
+    # 解析結果をDynamoDBに保存（image_idがある場合のみ）
+    if image_id and analysis_result.get('analysis'):
+        update_image_with_analysis(image_id, analysis_result['analysis'])
+
+    # 残り使用回数情報を含めて返却
+    if updated_usage_check is None:
         updated_usage_check = check_usage_limit(user_id)
-        analysis_result['usage_info'] = {
-            'remaining': updated_usage_check.get('remaining', -1),
-            'user_type': updated_usage_check.get('user_type', 'free'),
-            'message': updated_usage_check.get('message', '')
-        }
-        
+    analysis_result['usage_info'] = {
+        'remaining': updated_usage_check.get('remaining', -1),
+        'user_type': updated_usage_check.get('user_type', 'free'),
+        'message': updated_usage_check.get('message', '')
+    }
+
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps(analysis_result)
+    }
+
+
+@router.route('POST', 'upload-and-analyze', auth=True)
+def handle_upload_and_analyze(event, headers):
+    """
+    画像アップロードと解析を1リクエストで処理
+    S3保存＋メタデータ保存とGemini解析を並行実行し、解析結果は1回の更新で書き戻す
+    """
+    user_id = event.user['user_id']
+    
+    body = event.json
+    image_data = body.get('image')
+    filename = body.get('filename', 'image.jpg')
+    language = body.get('language', 'ja')
+    analysis_type = body.get('type', body.get('analysisType', 'store'))
+    
+    if not image_data:
         return {
-            'statusCode': 200,
+            'statusCode': 400,
             'headers': headers,
-            'body': json.dumps(analysis_result)
+            'body': json.dumps({'error': 'Image data is required'})
         }
-        
+    
+    # data URLプレフィックスを除去（S3用デコードとGemini送信で共用）
+    if image_data.startswith('data:image'):
+        image_data = image_data.split(',')[1]
+    
+    try:
+        image_bytes = base64.b64decode(image_data, validate=True)
     except Exception as e:
-        print(f"Error in image analysis: {str(e)}")
         return {
-            'statusCode': 500,
+            'statusCode': 400,
             'headers': headers,
-            'body': json.dumps({'error': str(e)})
+            'body': json.dumps({'error': f'Invalid base64 image data: {str(e)}'})
+        }
+    
+    def store_image():
+        s3_result = upload_image(image_bytes, filename, user_id)
+        metadata_result = save_image_metadata(
+            s3_result['s3_key'],
+            s3_result['s3_url'],
+            user_id,
+            filename,
+            analysis_type,
+            language
+        )
+        return s3_result, metadata_result
+    
+    # S3保存とGemini解析を並行実行
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        store_future = executor.submit(store_image)
+        analysis_future = executor.submit(analyze_image_with_gemini_rest, image_data, language, analysis_type)
+        analysis_result = analysis_future.result()
+        try:
+            s3_result, metadata_result = store_future.result()
+        except Exception as e:
+            # 画像保存に失敗しても解析結果は返す（従来の/upload-image失敗時と同じ扱い）
+            print(f"Image store failed, returning analysis only: {str(e)}")
+            s3_result, metadata_result = None, None
+    
+    updated_usage_check = None
+    if analysis_result.get('status') == 'success':
+        print(f"Analysis successful, incrementing usage count for user: {user_id}")
+        updated_usage_check = increment_and_check(user_id, analysis_type, language)
+        if updated_usage_check is None:
+            print(f"Failed to increment usage count for user: {user_id}")
+    
+    # 解析結果をimagesテーブルに1回の更新で書き戻し
+    if metadata_result and 'warning' not in metadata_result and analysis_result.get('analysis'):
+        update_image_with_analysis(metadata_result['image_id'], analysis_result['analysis'])
+    
+    if metadata_result:
+        analysis_result['image_id'] = metadata_result['image_id']
+        analysis_result['uploaded_at'] = metadata_result['uploaded_at']
+    if s3_result:
+        analysis_result['s3_url'] = s3_result['s3_url']
+        analysis_result['s3_key'] = s3_result['s3_key']
+    
+    if updated_usage_check is None:
+        updated_usage_check = check_usage_limit(user_id)
+    analysis_result['usage_info'] = {
+        'remaining': updated_usage_check.get('remaining', -1),
+        'user_type': updated_usage_check.get('user_type', 'free'),
+        'message': updated_usage_check.get('message', '')
+    }
+    
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps(analysis_result)
+    }
+
+
+def pre_analyze(event, context):
+    """
+    アップロード直後の先行解析（S3 ObjectCreatedイベント または 非同期Invoke）
+    結果はimagesテーブルにimage_idをキーとして保存し、使用回数は加算しない
+    """
+    mode = SPECULATIVE_ANALYSIS_MODE
+    if mode not in ('s3', 'invoke'):
+        return {'processed': 0}
+    
+    if 'Records' in event:
+        if mode != 's3':
+            return {'processed': 0}
+        targets = [
+            {
+                'bucket': record['s3']['bucket']['name'],
+                's3_key': urllib.parse.unquote_plus(record['s3']['object']['key'])
+            }
+            for record in event['Records']
+        ]
+    else:
+        targets = [event]
+    
+    processed = 0
+    for target in targets:
+        try:
+            if run_speculative_analysis(target):
+                processed += 1
+        except Exception as e:
+            print(f"Speculative analysis failed for {target}: {str(e)}")
+    return {'processed': processed}
+
+
+def run_speculative_analysis(target):
+    """
+    1画像分の先行解析を実行（他の実行・/analyzeと重複しないよう条件付き更新で確保）
+    """
+    s3_client = get_client('s3')
+    bucket = target.get('bucket') or images_bucket()
+    image_id = target.get('image_id')
+    if not image_id:
+        # S3イベントの場合はHEADでメタデータのみ確認（本体の取得は確保後）
+        head = s3_client.head_object(Bucket=bucket, Key=target['s3_key'])
+        image_id = head.get('Metadata', {}).get('image-id')
+    if not image_id:
+        # image-id メタデータがないオブジェクト（一括エンドポイント経由など）は対象外
+        return False
+    
+    image_item = claim_speculative_analysis(image_id)
+    if not image_item:
+        print(f"Speculative analysis skipped (already claimed or missing): {image_id}")
+        return False
+    
+    s3_object = s3_client.get_object(Bucket=bucket, Key=target['s3_key'])
+    image_data = base64.b64encode(s3_object['Body'].read()).decode('utf-8')
+    language = image_item.get('language', 'ja')
+    analysis_type = image_item.get('analysis_type', 'store')
+    analysis_result = analyze_image_with_gemini_rest(image_data, language, analysis_type)
+    
+    status = 'ready' if analysis_result.get('status') == 'success' else 'failed'
+    images_table().update_item(
+        Key={'image_id': image_id},
+        UpdateExpression='SET prefetch_status = :status, prefetch_result = :result, prefetch_completed_at = :completed',
+        ExpressionAttributeValues={
+            ':status': status,
+            ':result': json.dumps(analysis_result),
+            ':completed': get_jst_isoformat()
         }
+    )
+    print(f"Speculative analysis {status}: {image_id}")
+    return True
+
+
+def claim_speculative_analysis(image_id):
+    """
+    先行解析の実行権を確保して画像メタデータ（analysis_type/language）を返す
+    メタデータ保存がS3イベントより遅れる場合に備えて短時間リトライ
+    """
+    for attempt in range(SPECULATIVE_CLAIM_RETRIES):
+        try:
+            response = images_table().update_item(
+                Key={'image_id': image_id},
+                UpdateExpression='SET prefetch_status = :running, prefetch_started_at = :started',
+                ConditionExpression='attribute_exists(image_id) AND attribute_not_exists(prefetch_status)',
+                ExpressionAttributeValues={
+                    ':running': 'running',
+                    ':started': get_jst_isoformat()
+                },
+                ReturnValues='ALL_NEW'
+            )
+            return response['Attributes']
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            item = images_table().get_item(
+                Key={'image_id': image_id},
+                ProjectionExpression='image_id',
+                ConsistentRead=True
+            ).get('Item')
+            if item:
+                # 既に他の実行または/analyzeが確保済み
+                return None
+            time.sleep(SPECULATIVE_POLL_INTERVAL)
+    return None
+
+
+def get_speculative_analysis(image_id, user_id, language, analysis_type, context=None):
+    """
+    先行解析の結果を取得（実行中なら完了まで待機）
+    結果がない場合はこのリクエストで解析する旨を記録し、以降の先行解析を抑止してNoneを返す
+    
+    画像の所有者（imagesテーブルのuser_id）が呼び出しユーザーと異なる場合は利用しない。
+    待機はLambdaの残り時間からフォールバック解析分を差し引いた範囲に制限する。
+    """
+    if SPECULATIVE_ANALYSIS_MODE not in ('s3', 'invoke'):
+        return None
+    
+    try:
+        deadline = time.time() + get_join_budget(context)
+        while True:
+            item = images_table().get_item(
+                Key={'image_id': image_id},
+                ProjectionExpression='user_id, prefetch_status, prefetch_result, #language, analysis_type',
+                ExpressionAttributeNames={'#language': 'language'},
+                ConsistentRead=True
+            ).get('Item')
+            if not item:
+                return None
+            if sharding.logical_key(item.get('user_id', '')) != user_id:
+                print(f"Speculative analysis ignored: image {image_id} is not owned by {user_id}")
+                return None
+            
+            prefetch_status = item.get('prefetch_status')
+            if prefetch_status == 'ready':
+                if item.get('language') != language or item.get('analysis_type') != analysis_type:
+                    # アップロード時と異なる条件での解析要求
+                    return None
+                print(f"Using speculative analysis result: {image_id}")
+                return json.loads(item['prefetch_result'])
+            if prefetch_status != 'running' or time.time() >= deadline:
+                break
+            time.sleep(SPECULATIVE_POLL_INTERVAL)
+        
+        if not item.get('prefetch_status'):
+            # 先行解析が未開始ならこのリクエストが解析を担当
+            try:
+                images_table().update_item(
+                    Key={'image_id': image_id},
+                    UpdateExpression='SET prefetch_status = :status',
+                    ConditionExpression='attribute_exists(image_id) AND attribute_not_exists(prefetch_status)',
+                    ExpressionAttributeValues={':status': 'requested'}
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+        return None
+        
+    except Exception as e:
+        print(f"Speculative analysis lookup failed: {str(e)}")
+        return None
+
+
+def get_join_budget(context):
+    """先行解析の完了待ちに使える秒数"""
+    budget = SPECULATIVE_JOIN_TIMEOUT
+    get_remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    if callable(get_remaining):
+        remaining = get_remaining() / 1000.0 - SPECULATIVE_FALLBACK_RESERVE
+        budget = min(budget, remaining)
+    return max(budget, 0)
+
+
+def images_table():
+    """imagesテーブル取得"""
+    return get_table('images')
 
 
 def get_user_from_token(event):
     """
     Cognitoトークンからユーザー情報を取得
     """
+    cognito_client = get_client('cognito-idp')
     try:
         # Authorization ヘッダーから JWT トークン取得
         auth_header = event.get('headers', {}).get('Authorization', '')
@@ -463,37 +673,6 @@ def analyze_image_with_gemini_rest(image_data, language='ja', analysis_type='sto
         return generate_enhanced_mock_analysis(language, analysis_type)
 
 
-def update_image_with_analysis(image_id, analysis_result):
-    """
-    画像に解析結果を追加保存
-    """
-    try:
-        dynamodb = boto3.resource('dynamodb')
-        table_name = f"{os.environ.get('PROJECT_NAME', 'ai-tourism-poc')}-images-{os.environ.get('STAGE', 'dev')}"
-        table = dynamodb.Table(table_name)
-        
-        # 返答文の先頭200文字を保存
-        analysis_summary = analysis_result[:200] if analysis_result else ""
-        response_truncated = len(analysis_result) > 200 if analysis_result else False
-        
-        table.update_item(
-            Key={'image_id': image_id},
-            UpdateExpression="SET analysis_summary = :summary, response_truncated = :truncated, #status = :status, analyzed_at = :analyzed_at",
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':summary': analysis_summary,
-                ':truncated': response_truncated,
-                ':status': 'analyzed',
-                ':analyzed_at': get_jst_isoformat()
-            }
-        )
-        print(f"Successfully updated analysis for image_id: {image_id}")
-        return True
-    except Exception as e:
-        print(f"Failed to update image analysis: {str(e)}")
-        return False
-
-
 def generate_enhanced_mock_analysis(language='ja', analysis_type='store'):
     """
     強化されたモック解析（Gemini API使用不可時）
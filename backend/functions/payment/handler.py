@@ -1,32 +1,29 @@
+import base64
+import binascii
 import json
-import boto3
 import os
+import time
 from datetime import datetime, timedelta
-import sys
-import zipfile
+from decimal import Decimal
 
-# Lambda環境で.requirements.zipを展開してPythonパスに追加
-try:
-    import stripe
-except ImportError:
-    # .requirements.zipが存在する場合に展開
-    requirements_zip_path = '.requirements.zip'
-    if os.path.exists(requirements_zip_path):
-        import tempfile
-        temp_dir = tempfile.mkdtemp()
-        
-        # ZIPファイルを一時ディレクトリに展開
-        with zipfile.ZipFile(requirements_zip_path, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-        
-        # Pythonパスに追加
-        sys.path.insert(0, temp_dir)
-        
-        # 再度インポートを試行
-        import stripe
-        print(f"Successfully extracted and imported stripe from {requirements_zip_path}")
-    else:
-        raise ImportError("stripe module not found and .requirements.zip does not exist")
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from common.aws_clients import get_resource, get_table, table_name
+from common import revenue, single_table, stats, user_cache, webhook_events
+from common.auth import get_user_from_token
+from common.router import ANY, Router, last_path_segment
+from common.usage import PREMIUM_EXPIRY_BUCKET, PlanState, premium_expiry_bucket
+
+# 同時購入で premium_expiry が変わった場合の再試行回数
+MAX_GRANT_ATTEMPTS = 3
+# 決済ごとの記録済みマーカー（シングルテーブル、PK=PAYMENT#<session_id>）
+PAYMENT_GUARD_PREFIX = 'PAYMENT#'
+PAYMENT_GUARD_SK = 'RECORDED'
+
+# 決済履歴のページサイズ
+DEFAULT_HISTORY_PAGE_SIZE = 20
+MAX_HISTORY_PAGE_SIZE = 50
 
 # JST時刻関数
 def get_jst_now():
@@ -38,59 +35,220 @@ def get_jst_isoformat():
     jst_time = get_jst_now()
     return jst_time.isoformat() + '+09:00'
 
-# Stripe設定
-stripe.api_key = os.environ.get('STRIPE_SECRET_KEY', '')
+# Stripe SDKは初回の決済API呼び出し時に読み込む（Webhook・OPTIONSのコールドスタートでは不要）
+_stripe = None
+
+# Stripe API の接続・読み取りタイムアウト（秒）と、ネットワークエラー時の自動リトライ回数
+STRIPE_CONNECT_TIMEOUT = float(os.environ.get('STRIPE_CONNECT_TIMEOUT', '3'))
+STRIPE_READ_TIMEOUT = float(os.environ.get('STRIPE_READ_TIMEOUT', '10'))
+STRIPE_MAX_NETWORK_RETRIES = int(os.environ.get('STRIPE_MAX_NETWORK_RETRIES', '2'))
+
+def create_stripe_http_client():
+    """
+    コンテナ単位で使い回すStripe HTTPクライアント
+
+    requests.Session を共有してTLS接続をKeep-Aliveで再利用する
+    （ウォームコンテナではTCP/TLSハンドシェイクを省略できる）。
+    """
+    import requests
+    import stripe
+    session = requests.Session()
+    session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4))
+    return stripe.RequestsClient(timeout=(STRIPE_CONNECT_TIMEOUT, STRIPE_READ_TIMEOUT), session=session)
+
+def get_stripe():
+    """Stripe SDK取得（遅延インポート・APIキー・HTTPクライアント設定済み）"""
+    global _stripe
+    if _stripe is None:
+        import stripe
+        stripe.api_key = os.environ.get('STRIPE_SECRET_KEY', '')
+        stripe.max_network_retries = STRIPE_MAX_NETWORK_RETRIES
+        stripe.default_http_client = create_stripe_http_client()
+        _stripe = stripe
+    return _stripe
+
+# プラン別のプレミアム日数（Stripe Price の metadata.premium_days があればそちらを優先）
+PLAN_DAYS = {'7days': 7, '20days': 20}
+# Price の lookup_key（例: premium_7days）
+PRICE_LOOKUP_KEY_PREFIX = 'premium_'
+# 価格カタログのキャッシュ期間（秒）。Stripeから取得できなかった場合は短い期間で再取得する
+PRICE_CATALOG_TTL = int(os.environ.get('PRICE_CATALOG_TTL', '300'))
+PRICE_CATALOG_FALLBACK_TTL = 30
+
+_price_catalog = None
+_price_catalog_expires = 0.0
+
+def env_price_catalog():
+    """環境変数（STRIPE_PRICE_7DAYS / STRIPE_PRICE_20DAYS）のPrice IDによるカタログ"""
+    return {
+        plan_type: {'price_id': os.environ.get(f'STRIPE_PRICE_{plan_type.upper()}'), 'days': days}
+        for plan_type, days in PLAN_DAYS.items()
+    }
+
+def load_price_catalog():
+    """
+    Stripeから有効なPriceを lookup_key で取得してカタログを作成
+
+    Stripeに見つからないプランは環境変数のPrice IDで補う。
+
+    Returns:
+        dict: plan_type → price_id, days（と Stripe から取得できた場合は amount, currency）
+    """
+    catalog = env_price_catalog()
+    prices = get_stripe().Price.list(
+        active=True,
+        lookup_keys=[PRICE_LOOKUP_KEY_PREFIX + plan_type for plan_type in PLAN_DAYS],
+        limit=len(PLAN_DAYS)
+    )
+    for price in prices.data:
+        plan_type = price.lookup_key[len(PRICE_LOOKUP_KEY_PREFIX):]
+        metadata = price.metadata or {}
+        catalog[plan_type] = {
+            'price_id': price.id,
+            'days': int(metadata.get('premium_days') or PLAN_DAYS.get(plan_type, 0)),
+            'amount': price.unit_amount,
+            'currency': price.currency
+        }
+    return catalog
+
+def get_price_catalog(now=None):
+    """価格カタログ取得（コンテナ単位でTTLキャッシュ、Stripe障害時は環境変数のカタログ）"""
+    global _price_catalog, _price_catalog_expires
+    now = time.monotonic() if now is None else now
+    if _price_catalog is None or now >= _price_catalog_expires:
+        try:
+            _price_catalog = load_price_catalog()
+            _price_catalog_expires = now + PRICE_CATALOG_TTL
+        except Exception as e:
+            print(f"Price catalog load failed, using environment prices: {str(e)}")
+            _price_catalog = env_price_catalog()
+            _price_catalog_expires = now + PRICE_CATALOG_FALLBACK_TTL
+    return _price_catalog
+
+def reset_price_catalog():
+    """価格カタログのキャッシュを破棄（テスト用）"""
+    global _price_catalog, _price_catalog_expires
+    _price_catalog = None
+    _price_catalog_expires = 0.0
+
+# パスは最後の要素（/payment/history → history）で振り分ける
+router = Router(
+    'payment',
+    path=last_path_segment,
+    auth=lambda event: get_user_from_token(event),
+    unauthorized_body={'error': 'Authentication required'}
+)
 
 def main(event, context):
     """Stripe決済処理メイン"""
+    return router.dispatch(event, context)
+
+def json_default(value):
+    """DynamoDBの数値（Decimal）をJSONに変換"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def created_at_condition(user_id, date_from=None, date_to=None):
+    """
+    createdAt の範囲を KeyConditionExpression に変換
+
+    date_from / date_to は YYYY-MM-DD または ISO日時（両端を含む、日付のみの date_to はその日の終わりまで）
+    """
+    condition = Key('userId').eq(user_id)
+    # createdAt はJSTのISO文字列なので文字列比較で範囲指定できる（'~' は日時のどの文字よりも大きい）
+    upper = date_to + '~' if date_to and len(date_to) == 10 else date_to
+    if date_from and upper:
+        if date_from > upper:
+            raise ValueError('from must not be after to')
+        return condition & Key('createdAt').between(date_from, upper)
+    if date_from:
+        return condition & Key('createdAt').gte(date_from)
+    if upper:
+        return condition & Key('createdAt').lte(upper)
+    return condition
+
+def parse_date_parameter(value, name):
+    """YYYY-MM-DD またはISO日時のみ受け付ける"""
+    if not value:
+        return None
     try:
-        headers = {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type',
-            'Access-Control-Allow-Methods': 'POST,OPTIONS'
-        }
-        
-        if event['httpMethod'] == 'OPTIONS':
-            return {'statusCode': 200, 'headers': headers, 'body': ''}
-        
-        path = event.get('path', '').split('/')[-1]
-        
-        if path == 'create-checkout':
-            return create_checkout_session(event, headers)
-        elif path == 'webhook':
-            return handle_webhook(event, headers)
-        
-        return {
-            'statusCode': 404,
-            'headers': headers,
-            'body': json.dumps({'error': 'Endpoint not found'})
-        }
-        
-    except Exception as e:
-        print(f"Error: {str(e)}")
+        datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'Invalid {name}')
+    return value
+
+def encode_history_cursor(last_evaluated_key):
+    """LastEvaluatedKey をURLセーフな文字列に変換"""
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+def decode_history_cursor(cursor, user_id):
+    """カーソルを ExclusiveStartKey に復元（他ユーザーのキーは拒否）"""
+    if not cursor:
+        return None
+    try:
+        start_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(start_key, dict) or start_key.get('userId') != user_id:
+        raise ValueError('Invalid cursor')
+    return start_key
+
+@router.route('GET', 'history', auth=True)
+def get_payment_history(event, headers):
+    """
+    決済履歴（新しい順、1ページ1回のQuery）
+    GET /payment/history?limit=20&cursor=...&from=2026-10-01&to=2026-10-31
+    """
+    user_id = event.user['user_id']
+
+    params = event.get('queryStringParameters') or {}
+    try:
+        limit = min(max(int(params.get('limit', DEFAULT_HISTORY_PAGE_SIZE)), 1), MAX_HISTORY_PAGE_SIZE)
+        start_key = decode_history_cursor(params.get('cursor'), user_id)
+        key_condition = created_at_condition(
+            user_id, parse_date_parameter(params.get('from'), 'from'), parse_date_parameter(params.get('to'), 'to')
+        )
+    except ValueError as e:
         return {
-            'statusCode': 500,
+            'statusCode': 400,
             'headers': headers,
             'body': json.dumps({'error': str(e)})
         }
 
+    query_kwargs = {
+        'KeyConditionExpression': key_condition,
+        'ScanIndexForward': False,
+        'Limit': limit
+    }
+    if start_key:
+        query_kwargs['ExclusiveStartKey'] = start_key
+    response = get_table('payment-history').query(**query_kwargs)
+
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps({
+            'items': response.get('Items', []),
+            'next_cursor': encode_history_cursor(response.get('LastEvaluatedKey'))
+        }, default=json_default)
+    }
+
+@router.route(ANY, 'create-checkout')
 def create_checkout_session(event, headers):
     """Stripe Checkout Session作成"""
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = event.json
         plan_type = body.get('planType')  # '7days' or '20days'
         user_id = body.get('userId')
         
         print(f"Creating checkout session: planType={plan_type}, userId={user_id}")
         
-        # Price ID設定
-        price_ids = {
-            '7days': os.environ['STRIPE_PRICE_7DAYS'],
-            '20days': os.environ['STRIPE_PRICE_20DAYS']
-        }
-        
-        price_id = price_ids.get(plan_type)
+        # Price ID・日数は価格カタログ（TTLキャッシュ）から取得
+        plan = get_price_catalog().get(plan_type) or {}
+        price_id = plan.get('price_id')
         if not price_id or not user_id:
             return {
                 'statusCode': 400,
@@ -107,7 +265,7 @@ def create_checkout_session(event, headers):
         frontend_url = os.environ.get('FRONTEND_URL', 'https://ai-tourism-poc-frontend-dev.s3.amazonaws.com')
         
         # Checkout Session作成
-        session = stripe.checkout.Session.create(
+        session = get_stripe().checkout.Session.create(
             payment_method_types=['card'],
             line_items=[{
                 'price': price_id,
@@ -118,7 +276,9 @@ def create_checkout_session(event, headers):
             cancel_url=f'{frontend_url}/tourism-guide.html?payment=cancel',
             metadata={
                 'user_id': user_id,
-                'plan_type': plan_type
+                'plan_type': plan_type,
+                # 購入時点の日数（Webhookでの権限付与に使う）
+                'premium_days': str(plan['days'])
             }
         )
         
@@ -141,8 +301,15 @@ def create_checkout_session(event, headers):
             'body': json.dumps({'error': str(e)})
         }
 
+@router.route(ANY, 'webhook')
 def handle_webhook(event, headers):
-    """Stripe Webhook処理"""
+    """
+    Stripe Webhook処理
+
+    イベントIDを記録（重複排除）した時点で200を返し、決済記録・権限付与はワーカーで行う。
+    同じイベントの再送は、処理済みなら何もせず200を返す。未処理・失敗していれば後続処理を
+    起動し直し、ワーカーの処理中なら503を返して Stripe の再送に任せる。
+    """
     try:
         payload = event.get('body', '')
         sig_header = event.get('headers', {}).get('stripe-signature', '')
@@ -158,7 +325,7 @@ def handle_webhook(event, headers):
         
         # 本番運用時は以下を有効化（要ヘッダー名調査）
         # if webhook_secret and webhook_secret != 'whsec_xxx_placeholder':
-        #     webhook_event = stripe.Webhook.construct_event(
+        #     webhook_event = get_stripe().Webhook.construct_event(
         #         payload, sig_header, webhook_secret
         #     )
         # else:
@@ -168,36 +335,52 @@ def handle_webhook(event, headers):
         event_type = webhook_event.get('type')
         print(f"Webhook event type: {event_type}")
         
-        # checkout.session.completed処理
-        if event_type == 'checkout.session.completed':
-            session = webhook_event['data']['object']
-            
-            # メタデータからユーザー情報取得
-            user_id = session['metadata']['user_id']
-            plan_type = session['metadata']['plan_type']
-            payment_intent_id = session.get('payment_intent')
-            
-            print(f"Processing payment completion: user={user_id}, plan={plan_type}")
-            
-            # 決済記録をDynamoDBに保存
-            save_payment_record(
-                user_id=user_id,
-                session_id=session['id'],
-                payment_intent_id=payment_intent_id,
-                plan_type=plan_type,
-                amount=session['amount_total'],
-                status='completed'
-            )
-            
-            # プレミアム権限付与
-            grant_premium_access(user_id, plan_type)
-            
-            print(f"Premium access granted: {user_id} - {plan_type}")
+        # 後続処理のあるイベントのみ重複排除して受け付ける（記録後すぐに200を返す）
+        if event_type not in WEBHOOK_HANDLERS:
+            return {
+                'statusCode': 200,
+                'headers': headers,
+                'body': json.dumps({'status': 'ignored'})
+            }
+        
+        event_id = webhook_event['id']
+        claimed = webhook_events.claim_event(event_id, event_type, payload)
+        if not claimed:
+            record = webhook_events.get_event(event_id)
+            if record and record['status'] == 'processed':
+                print(f"Duplicate webhook event: {event_id}")
+                return {
+                    'statusCode': 200,
+                    'headers': headers,
+                    'body': json.dumps({'status': 'duplicate'})
+                }
+            if not record or not webhook_events.should_redispatch(record):
+                # ワーカーの処理中（または記録の取り消し直後）: 再送で結果を確認する
+                print(f"Webhook event in progress: {event_id}")
+                return {
+                    'statusCode': 503,
+                    'headers': headers,
+                    'body': json.dumps({'error': 'Webhook event is being processed'})
+                }
+            print(f"Redispatching webhook event: {event_id} ({record['status']})")
+        
+        try:
+            webhook_events.dispatch(event_id, process_webhook_event)
+        except Exception as e:
+            # 後続処理を起動できなければ（初回は記録を取り消して）Stripeの再送に任せる
+            print(f"Webhook dispatch error: {event_id} {str(e)}")
+            if claimed:
+                webhook_events.release_event(event_id)
+            return {
+                'statusCode': 500,
+                'headers': headers,
+                'body': json.dumps({'error': 'Webhook dispatch failed'})
+            }
         
         return {
             'statusCode': 200,
             'headers': headers,
-            'body': json.dumps({'status': 'success'})
+            'body': json.dumps({'status': 'accepted' if claimed else 'redispatched'})
         }
         
     except Exception as e:
@@ -208,13 +391,118 @@ def handle_webhook(event, headers):
             'body': json.dumps({'error': str(e)})
         }
 
-def save_payment_record(user_id, session_id, payment_intent_id, plan_type, amount, status):
-    """決済記録をDynamoDBに保存"""
+def handle_checkout_completed(webhook_event):
+    """checkout.session.completed: 決済記録保存とプレミアム権限付与"""
+    session = webhook_event['data']['object']
+    
+    # メタデータからユーザー情報取得
+    user_id = session['metadata']['user_id']
+    plan_type = session['metadata']['plan_type']
+    payment_intent_id = session.get('payment_intent')
+    
+    print(f"Processing payment completion: user={user_id}, plan={plan_type}")
+    
+    # 決済記録保存とプレミアム権限付与（1トランザクション、イベントの processed 更新も含む）
+    record_payment_and_grant(
+        user_id=user_id,
+        session_id=session['id'],
+        payment_intent_id=payment_intent_id,
+        plan_type=plan_type,
+        amount=session['amount_total'],
+        status='completed',
+        # Checkout作成時の日数（作成後に価格カタログが変わっても購入時の日数で付与）
+        days=session['metadata'].get('premium_days'),
+        event_id=webhook_event.get('id')
+    )
+
+WEBHOOK_HANDLERS = {
+    'checkout.session.completed': handle_checkout_completed
+}
+
+def process_webhook_event(event_id):
+    """記録済みWebhookイベントの後続処理（処理済みなら何もしない）"""
+    record = webhook_events.get_event(event_id)
+    if not record:
+        print(f"Webhook event not found: {event_id}")
+        return 'missing'
+    if record['status'] == 'processed':
+        print(f"Webhook event already processed: {event_id}")
+        return 'processed'
+    
+    webhook_events.update_status(event_id, 'processing')
     try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"ai-tourism-poc-payment-history-{os.environ.get('STAGE', 'dev')}")
-        
-        item = {
+        webhook_event = json.loads(record['payload'])
+        WEBHOOK_HANDLERS[record['event_type']](webhook_event)
+    except Exception as e:
+        print(f"Webhook processing error: {event_id} {str(e)}")
+        webhook_events.update_status(event_id, 'failed', error=str(e)[:500])
+        raise
+    
+    webhook_events.update_status(event_id, 'processed')
+    return 'processed'
+
+def worker(event, context):
+    """
+    Webhook後続処理ワーカー（非同期Invoke、失敗時はLambdaの非同期リトライに任せる）
+
+    リトライを使い切ったイベントは onFailure 先のキュー（PaymentWebhookFailureQueue）に残る。
+    """
+    return {'status': process_webhook_event(event['event_id'])}
+
+def premium_days(plan_type):
+    """プランのプレミアム日数（価格カタログから取得）"""
+    plan = get_price_catalog().get(plan_type)
+    if not plan or not plan.get('days'):
+        raise ValueError(f"Unknown plan type: {plan_type}")
+    return int(plan['days'])
+
+def extended_premium_expiry(user, days, now):
+    """
+    新しいプレミアム期限（有効なプレミアムの残り期間に購入日数を加算）
+
+    期限切れ・無料ユーザーは現在時刻から数える。
+    """
+    state = PlanState.from_item(user.get('user_id'), user, now)
+    base = state.premium_expiry if state.is_premium(now) else now
+    return (base + timedelta(days=days)).isoformat()
+
+def payment_guard_key(session_id):
+    return {'PK': f"{PAYMENT_GUARD_PREFIX}{session_id}", 'SK': PAYMENT_GUARD_SK}
+
+def payment_recorded(session_id):
+    """決済が記録済みか（記録済みマーカーの有無）"""
+    return 'Item' in single_table.app_table().get_item(Key=payment_guard_key(session_id), ConsistentRead=True)
+
+def record_payment_and_grant(user_id, session_id, payment_intent_id, plan_type, amount, status, days=None,
+                             event_id=None):
+    """
+    決済記録保存とプレミアム権限付与を1回のTransactWriteItemsで実行
+
+    payment-history の記録、users のプレミアム更新、STATS・売上集計（日次・月次）の加算
+    （と Webhook イベントの processed 更新）は全て成立するか全て不成立になる。
+    決済ごとの記録済みマーカー（PAYMENT#<session_id>）が既にあれば不成立（再送・再実行で二重に
+    延長しない。後から別の決済があった古い決済の再実行も含む）、users 項目の premium_expiry が
+    読み込み時から変わっていれば不成立（同時購入は再読み込みして加算し直す）。
+
+    Args:
+        days (int): 付与日数（省略時は価格カタログのプラン日数）
+
+    Returns:
+        bool: 記録した場合 True、同じ決済が記録済みなら False
+    """
+    days = int(days) if days else premium_days(plan_type)
+    users = get_table('users')
+    for attempt in range(MAX_GRANT_ATTEMPTS):
+        user = users.get_item(Key={'user_id': user_id}, ConsistentRead=True).get('Item') or {'user_id': user_id}
+        if user.get('last_payment_id') == session_id:
+            print(f"Payment already recorded: {session_id}")
+            return False
+
+        now = get_jst_now()
+        timestamp = get_jst_isoformat()
+        expiry = extended_premium_expiry(user, days, now)
+        user_type_value = f'premium_{plan_type}'  # 'premium_7days' or 'premium_20days'
+        payment = {
             'userId': user_id,
             'paymentId': session_id,  # Checkout Session ID
             'paymentIntentId': payment_intent_id,  # Payment Intent ID
@@ -222,46 +510,78 @@ def save_payment_record(user_id, session_id, payment_intent_id, plan_type, amoun
             'currency': 'JPY',
             'planType': plan_type,
             'status': status,
-            'createdAt': get_jst_isoformat(),
-            'updatedAt': get_jst_isoformat(),
+            'createdAt': timestamp,
+            'updatedAt': timestamp,
             'provider': 'stripe'
         }
-        
-        table.put_item(Item=item)
-        print(f"Payment record saved: {session_id}")
-        
-    except Exception as e:
-        print(f"Error saving payment record: {str(e)}")
-        raise
+        profile = {
+            'user_type': user_type_value,
+            'premium_expiry': expiry,
+            'plan_type': plan_type,
+            # premium_expiry_bucket は期限切れスイープ用のスパースGSIキー
+            PREMIUM_EXPIRY_BUCKET: premium_expiry_bucket(expiry),
+            'updated_at': now.isoformat()
+        }
 
-def grant_premium_access(user_id, plan_type):
-    """プレミアム権限付与"""
-    try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"ai-tourism-poc-users-{os.environ.get('STAGE', 'dev')}")
-        
-        # 有効期限設定
-        days = 7 if plan_type == '7days' else 20
-        now = get_jst_now()
-        expiry = (now + timedelta(days=days)).isoformat()
-        
-        # プレミアム関連項目のみ更新（既存データを保護）
-        # plan_typeから具体的なuser_typeを構築（期限チェック機能と整合性確保）
-        user_type_value = f'premium_{plan_type}'  # 'premium_7days' or 'premium_20days'
-        
-        table.update_item(
-            Key={'user_id': user_id},
-            UpdateExpression='SET user_type = :user_type, premium_expiry = :expiry, plan_type = :plan_type, updated_at = :updated',
-            ExpressionAttributeValues={
-                ':user_type': user_type_value,
-                ':expiry': expiry,
-                ':plan_type': plan_type,
-                ':updated': now.isoformat()
-            }
-        )
-        
-        print(f"DynamoDB updated: {user_id} -> premium until {expiry}")
-        
-    except Exception as e:
-        print(f"DynamoDB update error: {str(e)}")
-        raise
\ No newline at end of file
+        # 読み込み時の premium_expiry を条件にする（楽観ロック）
+        values = {':pid': session_id}
+        if 'premium_expiry' in user:
+            expiry_condition = 'premium_expiry = :previous_expiry'
+            values[':previous_expiry'] = user['premium_expiry']
+        else:
+            expiry_condition = 'attribute_not_exists(premium_expiry)'
+        names = {}
+        set_parts = ['last_payment_id = :pid']
+        for i, (name, value) in enumerate(profile.items()):
+            names[f'#p{i}'] = name
+            values[f':p{i}'] = value
+            set_parts.append(f'#p{i} = :p{i}')
+
+        transact_items = [
+            # payment-history のキー（userId, createdAt）は試行ごとに変わるため、重複はマーカーで防ぐ
+            {'Put': {
+                'TableName': table_name('app'),
+                'Item': dict(payment_guard_key(session_id), user_id=user_id, created_at=timestamp),
+                'ConditionExpression': 'attribute_not_exists(PK)'
+            }},
+            {'Put': {
+                'TableName': table_name('payment-history'),
+                'Item': payment
+            }},
+            {'Update': {
+                'TableName': table_name('users'),
+                'Key': {'user_id': user_id},
+                'UpdateExpression': 'SET ' + ', '.join(set_parts),
+                'ConditionExpression': f'(attribute_not_exists(last_payment_id) OR last_payment_id <> :pid) AND {expiry_condition}',
+                'ExpressionAttributeNames': names,
+                'ExpressionAttributeValues': values
+            }}
+        ]
+        stats_item = stats.payment_transact_item(user_id, payment['amount'], status)
+        if stats_item:
+            transact_items.append(stats_item)
+        transact_items.extend(revenue.rollup_transact_items(plan_type, payment['amount'], status, timestamp))
+        if event_id:
+            transact_items.append(webhook_events.processed_transact_item(event_id))
+
+        try:
+            get_resource('dynamodb').meta.client.transact_write_items(TransactItems=transact_items)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            if payment_recorded(session_id):
+                print(f"Payment already recorded: {session_id}")
+                return False
+            # 条件不成立: 同時更新で期限が変わった（再読み込みしてやり直す）
+            print(f"Payment transaction canceled (attempt {attempt + 1}): {user_id} {session_id}")
+            continue
+        finally:
+            user_cache.invalidate_user(user_id)
+
+        # シングルテーブルへの二重書き込み（失敗してもリクエストは失敗させない）
+        single_table.put_payment(payment)
+        single_table.update_profile(user_id, profile)
+        print(f"Payment recorded and premium granted: {user_id} -> {plan_type} until {expiry}")
+        return True
+
+    raise RuntimeError(f"Payment transaction did not succeed after {MAX_GRANT_ATTEMPTS} attempts: {session_id}")
@@ -1,8 +1,10 @@
 import json
-import boto3
 import stripe
 import os
 from datetime import datetime, timedelta
+from boto3.dynamodb.conditions import Key
+
+from common.aws_clients import get_table
 
 # JST時刻関数
 def get_jst_now():
@@ -212,9 +214,7 @@ def save_payment_record(user_id, payment_id, amount, currency, service_type, sta
     """
     決済記録をDynamoDBに保存
     """
-    dynamodb = boto3.resource('dynamodb')
-    table_name = f"ai-tourism-poc-payment-history-{os.environ.get('STAGE', 'dev')}"
-    table = dynamodb.Table(table_name)
+    table = get_table('payment-history')
     
     item = {
         'userId': user_id,
@@ -234,9 +234,7 @@ def update_payment_status(user_id, payment_id, status):
     """
     決済ステータス更新
     """
-    dynamodb = boto3.resource('dynamodb')
-    table_name = f"ai-tourism-poc-payment-history-{os.environ.get('STAGE', 'dev')}"
-    table = dynamodb.Table(table_name)
+    table = get_table('payment-history')
     
     table.update_item(
         Key={
@@ -256,12 +254,10 @@ def get_payment_history(user_id):
     """
     ユーザーの決済履歴取得
     """
-    dynamodb = boto3.resource('dynamodb')
-    table_name = f"ai-tourism-poc-payment-history-{os.environ.get('STAGE', 'dev')}"
-    table = dynamodb.Table(table_name)
+    table = get_table('payment-history')
     
     response = table.query(
-        KeyConditionExpression=boto3.dynamodb.conditions.Key('userId').eq(user_id),
+        KeyConditionExpression=Key('userId').eq(user_id),
         ScanIndexForward=False  # 新しい順
     )
     
@@ -1,9 +1,10 @@
 import json
-import boto3
 import os
 import stripe
 from datetime import datetime, timedelta
 
+from common.aws_clients import get_table
+
 # JST時刻関数
 def get_jst_now():
     """現在の日本時間（JST = UTC+9）を取得"""
@@ -182,8 +183,7 @@ def handle_webhook(event, headers):
 def save_payment_record(user_id, session_id, payment_intent_id, plan_type, amount, status):
     """決済記録をDynamoDBに保存"""
     try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"ai-tourism-poc-payment-history-{os.environ.get('STAGE', 'dev')}")
+        table = get_table('payment-history')
         
         item = {
             'userId': user_id,
@@ -208,8 +208,7 @@ def save_payment_record(user_id, session_id, payment_intent_id, plan_type, amoun
 def grant_premium_access(user_id, plan_type):
     """プレミアム権限付与"""
     try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f"ai-tourism-poc-users-{os.environ.get('STAGE', 'dev')}")
+        table = get_table('users')
         
         # 有効期限設定
         days = 7 if plan_type == '7days' else 20
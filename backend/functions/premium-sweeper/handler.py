@@ -0,0 +1,86 @@
+import os
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.conditions import Key
+
+from common.aws_clients import get_table
+from common.jst import get_jst_now
+from common.usage import (
+    PREMIUM_EXPIRY_BUCKET, PREMIUM_EXPIRY_INDEX, downgrade_to_free, parse_premium_expiry
+)
+
+# 遡って確認する日数（スイープが止まっていた期間の取りこぼし対策）
+SWEEP_LOOKBACK_DAYS = int(os.environ.get('PREMIUM_SWEEP_LOOKBACK_DAYS', '7'))
+SWEEP_BATCH_SIZE = 25
+SWEEP_WORKERS = 8
+# 残り時間がこれを下回ったら打ち切り（次回スケジュール実行で続きを処理）
+SWEEP_TIME_RESERVE_MS = 5000
+
+
+def main(event, context):
+    """
+    期限切れプレミアムユーザーの一括降格（スケジュール実行）
+
+    premium-expiry-index（期限日バケットのスパースGSI）で期限日を迎えたバケットのみを
+    クエリするため、ユーザー数が増えてもテーブルスキャンは発生しない。
+    """
+    result = sweep_expired_premium(get_jst_now(), context)
+    print(f"Premium sweep finished: {result}")
+    return result
+
+
+def due_buckets(now, lookback_days=SWEEP_LOOKBACK_DAYS):
+    """確認対象の期限日バケット（古い順、当日を含む）"""
+    return [(now - timedelta(days=days)).strftime('%Y-%m-%d') for days in range(lookback_days, -1, -1)]
+
+
+def query_due_users(bucket, now):
+    """
+    バケット内で期限を過ぎたユーザーを取得
+
+    Returns:
+        list: (user_id, premium_expiry) のリスト
+    """
+    table = get_table('users')
+    query_kwargs = {
+        'IndexName': PREMIUM_EXPIRY_INDEX,
+        'KeyConditionExpression': Key(PREMIUM_EXPIRY_BUCKET).eq(bucket),
+        'ProjectionExpression': 'user_id, premium_expiry'
+    }
+    due = []
+    while True:
+        response = table.query(**query_kwargs)
+        for item in response.get('Items', []):
+            expiry = parse_premium_expiry(item.get('premium_expiry'))
+            # 当日バケットには期限前のユーザーも含まれる
+            if expiry is None or expiry <= now:
+                due.append((item['user_id'], item.get('premium_expiry')))
+        if 'LastEvaluatedKey' not in response:
+            return due
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def sweep_expired_premium(now, context=None):
+    """
+    期限切れユーザーをバッチ単位で並列に降格
+
+    Returns:
+        dict: downgraded / skipped 件数、打ち切り時は incomplete=True
+    """
+    result = {'downgraded': 0, 'skipped': 0, 'incomplete': False}
+    get_remaining = getattr(context, 'get_remaining_time_in_millis', None)
+
+    with ThreadPoolExecutor(max_workers=SWEEP_WORKERS) as executor:
+        for bucket in due_buckets(now):
+            due = query_due_users(bucket, now)
+            for start in range(0, len(due), SWEEP_BATCH_SIZE):
+                if callable(get_remaining) and get_remaining() < SWEEP_TIME_RESERVE_MS:
+                    result['incomplete'] = True
+                    return result
+                batch = due[start:start + SWEEP_BATCH_SIZE]
+                # premium_expiry が変わっていれば（再購入・延長）降格しない
+                for downgraded in executor.map(lambda user: downgrade_to_free(user[0], user[1]), batch):
+                    result['downgraded' if downgraded else 'skipped'] += 1
+
+    return result
@@ -1,18 +1,45 @@
 import json
-import boto3
-import os
-from datetime import datetime, timedelta
-from decimal import Decimal
+import time
 
-# JST時刻関数
-def get_jst_now():
-    """現在の日本時間（JST = UTC+9）を取得"""
-    return datetime.utcnow() + timedelta(hours=9)
+from common import stats, user_cache
+from common.account_deletion import delete_user_account
+from common.aws_clients import get_table
+from common.jst import get_jst_isoformat
+from common.router import Router, proxy_path
 
-def get_jst_isoformat():
-    """現在の日本時間をISO形式の文字列で取得"""
-    jst_time = get_jst_now()
-    return jst_time.isoformat() + '+09:00'
+# 残り時間がこれを下回ったら削除を中断（202を返し、再実行で続きから削除）
+DELETE_TIME_RESERVE_MS = 5000
+
+
+# ルーティング（{proxy+} の最後の要素がユーザーID、ユーザーIDなしの GET は統計）
+# 各処理はユーザーIDを引数に取るため、ルート関数で event.params から渡す
+router = Router(
+    'user-management',
+    allow_methods='GET,POST,PUT,DELETE,OPTIONS',
+    path=lambda event: proxy_path(event).split('/')[-1]
+)
+
+
+@router.route('GET', '')
+def get_user_stats_route(event, headers):
+    return handle_get_user_stats(event, headers)
+
+
+@router.route('GET', '{user_id}')
+def get_user_route(event, headers):
+    return handle_get_user(event.params['user_id'], headers)
+
+
+@router.route('PUT', '')
+@router.route('PUT', '{user_id}')
+def update_user_route(event, headers):
+    return handle_update_user(event.params.get('user_id', ''), event, headers)
+
+
+@router.route('DELETE', '')
+@router.route('DELETE', '{user_id}')
+def delete_user_route(event, headers):
+    return handle_delete_user(event.params.get('user_id', ''), headers, event.context)
 
 
 def main(event, context):
@@ -20,226 +47,163 @@ def main(event, context):
     ユーザー管理メイン関数
     ユーザー情報の取得・更新・削除
     """
-    try:
-        # CORS headers
-        headers = {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-        }
-        
-        if event['httpMethod'] == 'OPTIONS':
-            return {
-                'statusCode': 200,
-                'headers': headers,
-                'body': ''
-            }
-        
-        # パス解析
-        path_parameters = event.get('pathParameters') or {}
-        user_id = path_parameters.get('proxy', '').split('/')[-1]
-        method = event.get('httpMethod')
-        
-        # ルーティング
-        if method == 'GET':
-            if user_id:
-                return handle_get_user(user_id, headers)
-            else:
-                return handle_get_user_stats(event, headers)
-        elif method == 'PUT':
-            return handle_update_user(user_id, event, headers)
-        elif method == 'DELETE':
-            return handle_delete_user(user_id, headers)
-        
-        return {
-            'statusCode': 404,
-            'headers': headers,
-            'body': json.dumps({'error': 'Endpoint not found'})
-        }
-        
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': headers,
-            'body': json.dumps({'error': str(e)})
-        }
+    return router.dispatch(event, context)
 
 
 def handle_get_user(user_id, headers):
     """
     ユーザー情報取得
     """
-    try:
-        if not user_id:
-            return {
-                'statusCode': 400,
-                'headers': headers,
-                'body': json.dumps({'error': 'User ID is required'})
-            }
-        
-        user = get_user_by_id(user_id)
-        if not user:
-            return {
-                'statusCode': 404,
-                'headers': headers,
-                'body': json.dumps({'error': 'User not found'})
-            }
-        
-        # パスワードハッシュを除外
-        user_info = {
-            'userId': user['userId'],
-            'email': user['email'],
-            'name': user.get('name', ''),
-            'createdAt': user.get('createdAt', ''),
-            'lastLogin': user.get('lastLogin', ''),
-            'analysisCount': user.get('analysisCount', 0),
-            'totalSpent': float(user.get('totalSpent', 0))
-        }
-        
+    if not user_id:
         return {
-            'statusCode': 200,
+            'statusCode': 400,
             'headers': headers,
-            'body': json.dumps(user_info)
+            'body': json.dumps({'error': 'User ID is required'})
         }
-        
-    except Exception as e:
+    
+    user = get_user_by_id(user_id)
+    if not user:
         return {
-            'statusCode': 500,
+            'statusCode': 404,
             'headers': headers,
-            'body': json.dumps({'error': str(e)})
+            'body': json.dumps({'error': 'User not found'})
         }
+    
+    # パスワードハッシュを除外
+    user_info = {
+        'userId': user['userId'],
+        'email': user['email'],
+        'name': user.get('name', ''),
+        'createdAt': user.get('createdAt', ''),
+        'lastLogin': user.get('lastLogin', ''),
+        'analysisCount': user.get('analysisCount', 0),
+        'totalSpent': float(user.get('totalSpent', 0))
+    }
+    
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps(user_info)
+    }
 
 
 def handle_update_user(user_id, event, headers):
     """
     ユーザー情報更新
     """
-    try:
-        if not user_id:
-            return {
-                'statusCode': 400,
-                'headers': headers,
-                'body': json.dumps({'error': 'User ID is required'})
-            }
-        
-        body = json.loads(event.get('body', '{}'))
-        name = body.get('name')
-        
-        if not name:
-            return {
-                'statusCode': 400,
-                'headers': headers,
-                'body': json.dumps({'error': 'Name is required'})
-            }
-        
-        # ユーザー存在確認
-        user = get_user_by_id(user_id)
-        if not user:
-            return {
-                'statusCode': 404,
-                'headers': headers,
-                'body': json.dumps({'error': 'User not found'})
-            }
-        
-        # 更新実行
-        update_user_info(user_id, name)
-        
+    if not user_id:
         return {
-            'statusCode': 200,
+            'statusCode': 400,
             'headers': headers,
-            'body': json.dumps({
-                'userId': user_id,
-                'message': 'User updated successfully'
-            })
+            'body': json.dumps({'error': 'User ID is required'})
         }
-        
-    except Exception as e:
+    
+    body = event.json
+    name = body.get('name')
+    
+    if not name:
         return {
-            'statusCode': 500,
+            'statusCode': 400,
             'headers': headers,
-            'body': json.dumps({'error': str(e)})
+            'body': json.dumps({'error': 'Name is required'})
         }
+    
+    # ユーザー存在確認
+    user = get_user_by_id(user_id)
+    if not user:
+        return {
+            'statusCode': 404,
+            'headers': headers,
+            'body': json.dumps({'error': 'User not found'})
+        }
+    
+    # 更新実行
+    update_user_info(user_id, name)
+    
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps({
+            'userId': user_id,
+            'message': 'User updated successfully'
+        })
+    }
 
 
-def handle_delete_user(user_id, headers):
+def handle_delete_user(user_id, headers, context=None):
     """
     ユーザー削除
+
+    時間内に終わらない場合は 202 を返す（同じリクエストの再実行で続きから削除）
     """
-    try:
-        if not user_id:
-            return {
-                'statusCode': 400,
-                'headers': headers,
-                'body': json.dumps({'error': 'User ID is required'})
-            }
-        
-        # ユーザー存在確認
-        user = get_user_by_id(user_id)
-        if not user:
-            return {
-                'statusCode': 404,
-                'headers': headers,
-                'body': json.dumps({'error': 'User not found'})
-            }
-        
-        # 削除実行
-        delete_user_data(user_id)
-        
+    if not user_id:
         return {
-            'statusCode': 200,
+            'statusCode': 400,
             'headers': headers,
-            'body': json.dumps({
-                'userId': user_id,
-                'message': 'User deleted successfully'
-            })
+            'body': json.dumps({'error': 'User ID is required'})
         }
-        
-    except Exception as e:
+    
+    # ユーザー存在確認（users 項目は最後に削除するため、削除途中でも存在する）
+    user = user_cache.get_user(user_id)
+    if not user:
         return {
-            'statusCode': 500,
+            'statusCode': 404,
             'headers': headers,
-            'body': json.dumps({'error': str(e)})
+            'body': json.dumps({'error': 'User not found'})
         }
+    
+    # 削除実行
+    result = delete_user_data(user_id, context)
+    
+    if not result['complete']:
+        return {
+            'statusCode': 202,
+            'headers': headers,
+            'body': json.dumps({
+                'userId': user_id,
+                'message': 'User deletion in progress. Please retry to continue.',
+                'deleted': result['deleted']
+            })
+        }
+    
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps({
+            'userId': user_id,
+            'message': 'User deleted successfully',
+            'deleted': result['deleted']
+        })
+    }
 
 
 def handle_get_user_stats(event, headers):
     """
     ユーザー統計情報取得
     """
-    try:
-        user_id = event.get('queryStringParameters', {}).get('userId')
-        
-        if not user_id:
-            return {
-                'statusCode': 400,
-                'headers': headers,
-                'body': json.dumps({'error': 'userId parameter is required'})
-            }
-        
-        stats = get_user_statistics(user_id)
-        
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps(stats)
-        }
-        
-    except Exception as e:
+    user_id = event.get('queryStringParameters', {}).get('userId')
+    
+    if not user_id:
         return {
-            'statusCode': 500,
+            'statusCode': 400,
             'headers': headers,
-            'body': json.dumps({'error': str(e)})
+            'body': json.dumps({'error': 'userId parameter is required'})
         }
+    
+    stats = get_user_statistics(user_id)
+    
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps(stats)
+    }
 
 
 def get_user_by_id(user_id):
     """
     ユーザーIDでユーザー取得
     """
-    dynamodb = boto3.resource('dynamodb')
-    table_name = f"ai-tourism-poc-users-{os.environ.get('STAGE', 'dev')}"
-    table = dynamodb.Table(table_name)
+    table = get_table('users')
     
     response = table.get_item(Key={'userId': user_id})
     return response.get('Item')
@@ -249,9 +213,7 @@ def update_user_info(user_id, name):
     """
     ユーザー情報更新
     """
-    dynamodb = boto3.resource('dynamodb')
-    table_name = f"ai-tourism-poc-users-{os.environ.get('STAGE', 'dev')}"
-    table = dynamodb.Table(table_name)
+    table = get_table('users')
     
     table.update_item(
         Key={'userId': user_id},
@@ -264,77 +226,33 @@ def update_user_info(user_id, name):
     )
 
 
-def delete_user_data(user_id):
+def delete_user_data(user_id, context=None):
     """
-    ユーザーデータ削除（関連データも含む）
+    ユーザーデータ削除（関連データ・S3オブジェクトも含む）
+
+    Returns:
+        dict: complete, deleted（common.account_deletion.delete_user_account の結果）
     """
-    dynamodb = boto3.resource('dynamodb')
-    stage = os.environ.get('STAGE', 'dev')
-    
-    # ユーザー情報削除
-    users_table = dynamodb.Table(f"ai-tourism-poc-users-{stage}")
-    users_table.delete_item(Key={'userId': user_id})
-    
-    # 分析履歴削除
-    analysis_table = dynamodb.Table(f"ai-tourism-poc-analysis-history-{stage}")
-    analysis_response = analysis_table.query(
-        KeyConditionExpression=boto3.dynamodb.conditions.Key('userId').eq(user_id)
-    )
-    
-    for item in analysis_response.get('Items', []):
-        analysis_table.delete_item(
-            Key={
-                'userId': user_id,
-                'timestamp': item['timestamp']
-            }
-        )
-    
-    # 決済履歴削除
-    payment_table = dynamodb.Table(f"ai-tourism-poc-payment-history-{stage}")
-    payment_response = payment_table.query(
-        KeyConditionExpression=boto3.dynamodb.conditions.Key('userId').eq(user_id)
-    )
-    
-    for item in payment_response.get('Items', []):
-        payment_table.delete_item(
-            Key={
-                'userId': user_id,
-                'paymentId': item['paymentId']
-            }
-        )
+    deadline = None
+    get_remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    if callable(get_remaining):
+        deadline = time.time() + (get_remaining() - DELETE_TIME_RESERVE_MS) / 1000
+    return delete_user_account(user_id, deadline=deadline)
 
 
 def get_user_statistics(user_id):
     """
-    ユーザー統計情報取得
+    ユーザー統計情報取得（書き込み時に集計済みの STATS 項目を1回読むだけ）
     """
-    dynamodb = boto3.resource('dynamodb')
-    stage = os.environ.get('STAGE', 'dev')
-    
-    # 分析回数
-    analysis_table = dynamodb.Table(f"ai-tourism-poc-analysis-history-{stage}")
-    analysis_response = analysis_table.query(
-        KeyConditionExpression=boto3.dynamodb.conditions.Key('userId').eq(user_id),
-        Select='COUNT'
-    )
-    analysis_count = analysis_response.get('Count', 0)
-    
-    # 決済統計
-    payment_table = dynamodb.Table(f"ai-tourism-poc-payment-history-{stage}")
-    payment_response = payment_table.query(
-        KeyConditionExpression=boto3.dynamodb.conditions.Key('userId').eq(user_id),
-        FilterExpression=boto3.dynamodb.conditions.Attr('status').eq('succeeded')
-    )
-    
-    total_spent = sum(
-        float(item.get('amount', 0)) for item in payment_response.get('Items', [])
-    )
-    payment_count = len(payment_response.get('Items', []))
+    user_stats = stats.get_stats(user_id)
     
     return {
         'userId': user_id,
-        'analysisCount': analysis_count,
-        'paymentCount': payment_count,
-        'totalSpent': total_spent,
+        'analysisCount': user_stats['analysis_count'],
+        'analysisByType': user_stats['analysis_by_type'],
+        'analysisByLanguage': user_stats['analysis_by_language'],
+        'paymentCount': user_stats['payment_count'],
+        'totalSpent': user_stats['total_spent'],
+        'updatedAt': user_stats['updated_at'],
         'generatedAt': get_jst_isoformat()
-    }
\ No newline at end of file
+    }
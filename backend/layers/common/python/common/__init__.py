@@ -0,0 +1,3 @@
+"""
+Lambda関数共通ライブラリ（Lambdaレイヤーとして /opt/python に配置）
+"""
@@ -0,0 +1,183 @@
+"""
+アカウント削除（ユーザーに紐づく全データの一括削除）
+
+各テーブル・S3をページ単位で読み込み、BatchWriteItem（25件/回）と
+S3 DeleteObjects（1000件/回）でまとめて削除する。削除はワーカースレッドで並行実行する。
+
+削除順序:
+    1. 解析履歴（images）: 解析全文のS3オブジェクト → 項目
+    2. S3 users/<user_id>/ 配下（アップロード画像・メタデータ保存に失敗した孤立オブジェクト）
+    3. 決済履歴（payment-history）
+    4. シングルテーブル（PK=USER#<user_id> の全項目）
+    5. users 項目（最後に削除。残っていれば削除未完了）
+
+各ステップは「残っているものを削除する」だけなので、期限切れで中断しても再実行で続きから処理できる。
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.conditions import Key
+
+from common import sharding, single_table, user_cache
+from common.aws_clients import get_client, get_resource, get_table, table_name
+from common.image_store import USER_CREATED_INDEX, analysis_s3_key, images_bucket
+
+BATCH_WRITE_LIMIT = 25
+S3_DELETE_LIMIT = 1000
+DEFAULT_WORKERS = 4
+MAX_UNPROCESSED_RETRIES = 8
+
+
+def batch_delete(name, keys):
+    """
+    キーをBatchWriteItemで削除（1回25件まで、未処理分はバックオフして再送）
+
+    Args:
+        name (str): 論理テーブル名
+        keys (list): 25件以下のキー
+    """
+    full_name = table_name(name)
+    requests = [{'DeleteRequest': {'Key': key}} for key in keys]
+    for attempt in range(MAX_UNPROCESSED_RETRIES + 1):
+        response = get_resource('dynamodb').batch_write_item(RequestItems={full_name: requests})
+        requests = response.get('UnprocessedItems', {}).get(full_name, [])
+        if not requests:
+            return
+        time.sleep(min(0.05 * (2 ** attempt), 5) * random.uniform(0.5, 1.0))
+    raise RuntimeError(f"{len(requests)} items left unprocessed in {full_name}")
+
+
+def delete_s3_objects(keys):
+    """S3オブジェクトをDeleteObjectsで削除（1回1000件まで、存在しないキーは無視される）"""
+    response = get_client('s3').delete_objects(
+        Bucket=images_bucket(),
+        Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+    )
+    if response.get('Errors'):
+        raise RuntimeError(f"S3 delete failed: {response['Errors'][:3]}")
+
+
+class DeletionPipeline:
+    """削除リクエストを上限付きのワーカーで並行実行"""
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.futures = []
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def _count(self, label, amount):
+        with self._lock:
+            self.counts[label] = self.counts.get(label, 0) + amount
+
+    def delete_items(self, name, keys):
+        for start in range(0, len(keys), BATCH_WRITE_LIMIT):
+            self.futures.append(self.executor.submit(batch_delete, name, keys[start:start + BATCH_WRITE_LIMIT]))
+        self._count(name, len(keys))
+
+    def delete_objects(self, keys, wait=False):
+        futures = [
+            self.executor.submit(delete_s3_objects, keys[start:start + S3_DELETE_LIMIT])
+            for start in range(0, len(keys), S3_DELETE_LIMIT)
+        ]
+        if wait:
+            for future in futures:
+                future.result()
+        else:
+            self.futures.extend(futures)
+        self._count('s3', len(keys))
+
+    def wait(self):
+        """投入済みの削除を完了させる（失敗があれば例外）"""
+        futures, self.futures = self.futures, []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def _pages(table, query_kwargs):
+    while True:
+        response = table.query(**query_kwargs)
+        yield response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _s3_pages(prefix):
+    paginator = get_client('s3').get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=images_bucket(), Prefix=prefix, PaginationConfig={'PageSize': S3_DELETE_LIMIT}):
+        yield [obj['Key'] for obj in page.get('Contents', [])]
+
+
+def _steps(user_id, pipeline):
+    """削除ステップ（ページごとに yield し、呼び出し側で期限を確認する）"""
+    # 1. 解析履歴: 全文のS3オブジェクトを先に消す（項目が消えると場所が分からなくなる）
+    images = get_table('images')
+    for items in _pages(images, {
+        'IndexName': USER_CREATED_INDEX,
+        'KeyConditionExpression': Key('user_id').eq(user_id),
+        'ProjectionExpression': 'image_id'
+    }):
+        image_ids = [item['image_id'] for item in items]
+        if image_ids:
+            pipeline.delete_objects([analysis_s3_key(image_id) for image_id in image_ids], wait=True)
+            pipeline.delete_items('images', [{'image_id': image_id} for image_id in image_ids])
+        yield
+
+    # 2. S3 users/<user_id>/ 配下
+    for keys in _s3_pages(f"users/{user_id}/"):
+        if keys:
+            pipeline.delete_objects(keys)
+        yield
+
+    # 3. 決済履歴
+    for items in _pages(get_table('payment-history'), {
+        'KeyConditionExpression': Key('userId').eq(user_id),
+        'ProjectionExpression': 'userId, createdAt'
+    }):
+        pipeline.delete_items('payment-history', items)
+        yield
+
+    # 4. シングルテーブル
+    for items in _pages(single_table.app_table(), {
+        'KeyConditionExpression': Key('PK').eq(single_table.user_pk(user_id)),
+        'ProjectionExpression': 'PK, SK'
+    }):
+        pipeline.delete_items('app', items)
+        yield
+
+
+def delete_user_account(user_id, deadline=None, workers=DEFAULT_WORKERS):
+    """
+    ユーザーの全データを削除
+
+    Args:
+        deadline (float): time.time() の打ち切り時刻（超えたら投入済みの削除を待って中断）
+        workers (int): 並行して実行する削除リクエスト数の上限
+
+    Returns:
+        dict: complete（False なら再実行が必要）, deleted（種別ごとの件数）
+    """
+    if sharding.is_shared_identity(user_id):
+        raise ValueError(f"Shared identity cannot be deleted: {user_id}")
+
+    pipeline = DeletionPipeline(workers)
+    try:
+        for _ in _steps(user_id, pipeline):
+            if deadline is not None and time.time() >= deadline:
+                pipeline.wait()
+                print(f"Account deletion paused: {user_id} {pipeline.counts}")
+                return {'complete': False, 'deleted': pipeline.counts}
+        pipeline.wait()
+    finally:
+        pipeline.close()
+
+    user_cache.delete_user(user_id)
+    pipeline.counts['users'] = 1
+    print(f"Account deleted: {user_id} {pipeline.counts}")
+    return {'complete': True, 'deleted': pipeline.counts}
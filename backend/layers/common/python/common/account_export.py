@@ -0,0 +1,260 @@
+"""
+個人データエクスポート（ZIPをS3マルチパートアップロードへストリーム出力）
+
+ZIPの構成:
+    profile.json        プロフィール（users 項目）
+    stats.json          ユーザー統計
+    payments.jsonl      決済履歴（1行1件）
+    analyses.jsonl      解析履歴（全文を含む、1行1件）
+    images/<ファイル名>  S3 users/<user_id>/ 配下の元画像
+
+出力先は users/<user_id>/exports/<job_id>.zip（ダウンロードは署名付きURL）。
+
+ZIPはシーク不要のストリーミング形式（データディスクリプタ付き）で書き出し、
+一定サイズごとにマルチパートのパートとしてアップロードするため、
+メモリ使用量はパートサイズと画像の先読み分のみで写真の枚数に依存しない。
+"""
+import base64
+import json
+import os
+import shutil
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import Binary
+
+from common import stats, user_cache
+from common.aws_clients import get_client, get_resource, get_table, table_name
+from common.image_store import USER_CREATED_INDEX, images_bucket, load_analysis_text
+
+# マルチパートの最小パートサイズは5MB（最後のパートを除く）
+EXPORT_PART_SIZE = int(os.environ.get('EXPORT_PART_SIZE', str(8 * 1024 * 1024)))
+# 画像の先読み（並行ダウンロード数と、メモリに読み込む1枚あたりの上限）
+IMAGE_PREFETCH = 4
+IMAGE_PREFETCH_MAX_BYTES = 8 * 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+BATCH_GET_LIMIT = 100
+
+EXPORTS_DIRECTORY = 'exports/'
+
+# analyses.jsonl に出力しない属性（全文は analysis として展開）
+ANALYSIS_INTERNAL_ATTRIBUTES = ('analysis_compressed', 'analysis_s3_key', 'analysis_encoding',
+                                'prefetch_result', 'prefetch_status')
+
+
+class MultipartUploadWriter:
+    """
+    S3マルチパートアップロードへの書き込みストリーム（zipfile から書き込み専用ファイルとして使う）
+
+    part_size ごとにパートをアップロードし、close で完了する。
+    例外で抜けた場合（abort）は未完了のアップロードを破棄する。
+    """
+
+    def __init__(self, bucket, key, part_size=EXPORT_PART_SIZE, content_type='application/zip'):
+        self.s3 = get_client('s3')
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.upload_id = self.s3.create_multipart_upload(
+            Bucket=bucket, Key=key, ContentType=content_type, ServerSideEncryption='AES256'
+        )['UploadId']
+        self.parts = []
+        self._buffer = bytearray()
+        self._position = 0
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def _upload_part(self, body):
+        number = len(self.parts) + 1
+        response = self.s3.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=number, Body=body
+        )
+        self.parts.append({'PartNumber': number, 'ETag': response['ETag']})
+
+    def close(self):
+        """残りを最後のパートとしてアップロードして完了"""
+        if self._buffer or not self.parts:
+            self._upload_part(bytes(self._buffer))
+            self._buffer = bytearray()
+        self.s3.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={'Parts': self.parts}
+        )
+
+    def abort(self):
+        self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+    @property
+    def size(self):
+        return self._position
+
+
+def to_json_value(value):
+    """DynamoDBの型をJSON互換に変換"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, Binary):
+        return base64.b64encode(value.value).decode()
+    if isinstance(value, set):
+        return sorted(to_json_value(v) for v in value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, default=to_json_value)
+
+
+def _query_pages(table, query_kwargs):
+    while True:
+        response = table.query(**query_kwargs)
+        yield response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def iter_payments(user_id):
+    for items in _query_pages(get_table('payment-history'), {'KeyConditionExpression': Key('userId').eq(user_id)}):
+        yield from items
+
+
+def iter_analyses(user_id):
+    """解析履歴（GSIで画像IDを取得し、全属性は BatchGetItem でまとめて読む）"""
+    images_table_name = table_name('images')
+    for items in _query_pages(get_table('images'), {
+        'IndexName': USER_CREATED_INDEX,
+        'KeyConditionExpression': Key('user_id').eq(user_id),
+        'ProjectionExpression': 'image_id'
+    }):
+        image_ids = [item['image_id'] for item in items]
+        for start in range(0, len(image_ids), BATCH_GET_LIMIT):
+            request = {images_table_name: {'Keys': [{'image_id': i} for i in image_ids[start:start + BATCH_GET_LIMIT]]}}
+            while request:
+                response = get_resource('dynamodb').batch_get_item(RequestItems=request)
+                yield from response.get('Responses', {}).get(images_table_name, [])
+                request = response.get('UnprocessedKeys') or None
+
+
+def analysis_record(item):
+    """解析履歴1件分の出力（全文を復元）"""
+    record = {k: v for k, v in item.items() if k not in ANALYSIS_INTERNAL_ATTRIBUTES}
+    try:
+        record['analysis'] = load_analysis_text(item)
+    except Exception as e:
+        print(f"Failed to load analysis text for {item.get('image_id')}: {str(e)}")
+        record['analysis'] = None
+    return record
+
+
+def export_s3_key(user_id, job_id):
+    """エクスポートファイルのキー（users/<user_id>/ 配下のためアカウント削除時に一緒に消える）"""
+    return f"users/{user_id}/{EXPORTS_DIRECTORY}{job_id}.zip"
+
+
+def iter_image_keys(user_id):
+    """users/<user_id>/ 配下の画像（過去のエクスポートファイルを除く）"""
+    prefix = f"users/{user_id}/"
+    paginator = get_client('s3').get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=images_bucket(), Prefix=prefix):
+        for obj in page.get('Contents', []):
+            if not obj['Key'][len(prefix):].startswith(EXPORTS_DIRECTORY):
+                yield obj['Key'], obj['Size']
+
+
+def _fetch_image(key, size):
+    """小さい画像は先読みしてメモリに保持、大きい画像はストリームのまま返す"""
+    body = get_client('s3').get_object(Bucket=images_bucket(), Key=key)['Body']
+    return body.read() if size <= IMAGE_PREFETCH_MAX_BYTES else body
+
+
+def _write_entry(zf, name, compress=True):
+    info = zipfile.ZipInfo(name)
+    info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    return zf.open(info, 'w', force_zip64=True)
+
+
+def _write_images(zf, user_id):
+    """元画像を先読みしながら順にZIPへ書き込む（JPEG等は圧縮済みのため無圧縮で格納）"""
+    prefix = f"users/{user_id}/"
+    count = 0
+    pending = []
+    with ThreadPoolExecutor(max_workers=IMAGE_PREFETCH) as executor:
+        def drain(limit):
+            nonlocal count
+            while len(pending) > limit:
+                key, future = pending.pop(0)
+                body = future.result()
+                # users/<user_id>/images/<ファイル名> → images/<ファイル名>
+                relative = key[len(prefix):]
+                name = relative if relative.startswith('images/') else 'images/' + relative
+                with _write_entry(zf, name, compress=False) as dest:
+                    if isinstance(body, bytes):
+                        dest.write(body)
+                    else:
+                        shutil.copyfileobj(body, dest, COPY_CHUNK_SIZE)
+                count += 1
+
+        for key, size in iter_image_keys(user_id):
+            pending.append((key, executor.submit(_fetch_image, key, size)))
+            drain(IMAGE_PREFETCH)
+        drain(0)
+    return count
+
+
+def export_user_data(user_id, s3_key):
+    """
+    ユーザーの全データをZIPにしてS3へ書き出し
+
+    Returns:
+        dict: s3_key, size（バイト）, analyses, payments, images 件数
+    """
+    writer = MultipartUploadWriter(images_bucket(), s3_key)
+    result = {'s3_key': s3_key, 'analyses': 0, 'payments': 0, 'images': 0}
+    try:
+        with zipfile.ZipFile(writer, 'w') as zf:
+            with _write_entry(zf, 'profile.json') as f:
+                f.write(_dumps(user_cache.get_user(user_id) or {'user_id': user_id}).encode('utf-8'))
+            with _write_entry(zf, 'stats.json') as f:
+                f.write(_dumps(stats.get_stats(user_id)).encode('utf-8'))
+            with _write_entry(zf, 'payments.jsonl') as f:
+                for payment in iter_payments(user_id):
+                    f.write((_dumps(payment) + '\n').encode('utf-8'))
+                    result['payments'] += 1
+            with _write_entry(zf, 'analyses.jsonl') as f:
+                for item in iter_analyses(user_id):
+                    f.write((_dumps(analysis_record(item)) + '\n').encode('utf-8'))
+                    result['analyses'] += 1
+            result['images'] = _write_images(zf, user_id)
+        writer.close()
+    except Exception:
+        writer.abort()
+        raise
+    result['size'] = writer.size
+    return result
+
+
+def presigned_download_url(s3_key, expires_in=3600, filename='export.zip'):
+    """エクスポートファイルの署名付きダウンロードURL"""
+    return get_client('s3').generate_presigned_url(
+        'get_object',
+        Params={
+            'Bucket': images_bucket(),
+            'Key': s3_key,
+            'ResponseContentDisposition': f'attachment; filename="{filename}"'
+        },
+        ExpiresIn=expires_in
+    )
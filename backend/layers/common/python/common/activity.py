@@ -0,0 +1,202 @@
+"""
+最終ログイン等のアクティビティ記録（書き込みの間引き）
+
+ログインのたびに users テーブルへ UpdateItem すると、朝のログイン集中時に書き込み容量を消費する。
+最終ログイン時刻は ACTIVITY_GRANULARITY 秒単位で分かれば十分なため、
+
+    1. touch() は呼び出し内のバッファに積むだけ（同じユーザーは最新の時刻にまとめる）
+    2. 直近に記録済みと分かっているユーザーは積まない（コンテナ内の記録済み時刻）
+    3. flush() はバッファのユーザーを BatchGetItem（キャッシュ経由）でまとめて読み、
+       保存済みの時刻が粒度内のユーザーを除いて UpdateItem する
+
+flush は各呼び出しの応答前に同期的に実行する（Lambda は応答後にコンテナを凍結し、
+そのまま破棄することがあるため、応答後のスレッドやコンテナ内バッファには頼らない）。
+待つのは ACTIVITY_FLUSH_TIMEOUT 秒（Lambda の残り時間が少なければそれ以下）まで。
+時間内に終わらなかった書き込み・失敗した書き込みはバッファへ戻し、次の呼び出しの flush で
+再度書き込む（条件付き更新のため、遅れて完了した書き込みと重複しても二重には記録されない）。
+失われうるのは、この戻した分がある状態でコンテナが破棄された場合のみ。
+
+ACTIVITY_GRANULARITY    記録の粒度（秒、既定 900）
+ACTIVITY_FLUSH_TIMEOUT  flush の待ち時間の上限（秒、既定 0.5）
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from botocore.exceptions import ClientError
+
+from common import user_cache
+from common.jst import get_jst_now
+from common.metrics import emit_metrics
+
+DEFAULT_GRANULARITY_SECONDS = 900
+DEFAULT_FLUSH_TIMEOUT = 0.5
+# Lambda の残り時間からこれを差し引いた範囲で flush を待つ（応答の返却分）
+FLUSH_TIME_RESERVE_MS = 200
+FLUSH_WORKERS = 8
+MAX_RECENT_USERS = 10000
+LAST_LOGIN_ATTRIBUTE = 'last_login_at'
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_pending = {}
+_recent = OrderedDict()
+_executor = ThreadPoolExecutor(max_workers=FLUSH_WORKERS)
+
+
+def granularity_seconds():
+    return int(os.environ.get('ACTIVITY_GRANULARITY', DEFAULT_GRANULARITY_SECONDS))
+
+
+def flush_timeout(context=None):
+    """flush の待ち時間（秒、Lambda の残り時間が少なければそれ以下）"""
+    timeout = float(os.environ.get('ACTIVITY_FLUSH_TIMEOUT', DEFAULT_FLUSH_TIMEOUT))
+    get_remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    if callable(get_remaining):
+        timeout = min(timeout, (get_remaining() - FLUSH_TIME_RESERVE_MS) / 1000)
+    return max(timeout, 0)
+
+
+def _isoformat(value):
+    return value.isoformat() + '+09:00'
+
+
+def _threshold(now=None):
+    """この時刻より新しい記録は粒度内とみなす（JSTのISO形式、文字列比較）"""
+    return _isoformat((now or get_jst_now()) - timedelta(seconds=granularity_seconds()))
+
+
+def _remember(user_id, attribute, timestamp):
+    key = (user_id, attribute)
+    _recent[key] = timestamp
+    _recent.move_to_end(key)
+    while len(_recent) > MAX_RECENT_USERS:
+        _recent.popitem(last=False)
+
+
+def touch(user_id, attribute=LAST_LOGIN_ATTRIBUTE, now=None):
+    """
+    アクティビティを記録（バッファに積むだけで書き込みはしない）
+
+    Returns:
+        bool: バッファに積んだ場合 True（直近に記録済みで省略した場合 False）
+    """
+    now = now or get_jst_now()
+    with _lock:
+        recorded = _recent.get((user_id, attribute))
+        if recorded is not None and recorded > _threshold(now):
+            skipped = True
+        else:
+            skipped = False
+            _pending[(user_id, attribute)] = _isoformat(now)
+    if skipped:
+        emit_metrics({'ActivitySkipped': 1}, {'Table': user_cache.USERS_TABLE})
+        return False
+    return True
+
+
+def pending_count():
+    with _lock:
+        return len(_pending)
+
+
+def flush(context=None):
+    """
+    バッファを users テーブルへ反映（応答前に同期的に呼ぶ、待ち時間は flush_timeout まで）
+
+    Returns:
+        int: 書き込んだ項目数
+    """
+    with _flush_lock:
+        with _lock:
+            pending = dict(_pending)
+            _pending.clear()
+        if not pending:
+            return 0
+
+        deadline = time.monotonic() + flush_timeout(context)
+        threshold = _threshold()
+        try:
+            stored = user_cache.get_users([user_id for user_id, _ in pending])
+        except Exception as e:
+            print(f"Activity flush read failed: {str(e)}")
+            _requeue(pending)
+            return 0
+
+        writes = {}
+        skipped = 0
+        for (user_id, attribute), timestamp in pending.items():
+            item = stored.get(user_id)
+            if item is None:
+                # 未登録ユーザー（UpdateItem で属性だけの項目を作らない）
+                skipped += 1
+            elif item.get(attribute, '') > threshold:
+                skipped += 1
+                with _lock:
+                    _remember(user_id, attribute, item[attribute])
+            else:
+                writes[(user_id, attribute)] = timestamp
+
+        futures = {key: _executor.submit(_write, key, timestamp, threshold) for key, timestamp in writes.items()}
+        if futures:
+            wait(futures.values(), timeout=max(deadline - time.monotonic(), 0))
+        results = {key: future.result() if future.done() else None for key, future in futures.items()}
+
+        # 失敗・時間切れの分はバッファへ戻す（次の呼び出しで再度書き込む）
+        failed = {key: writes[key] for key, result in results.items() if result is None}
+        if failed:
+            _requeue(failed)
+        written = sum(1 for result in results.values() if result)
+        emit_metrics({
+            'ActivityWritten': written,
+            'ActivitySkipped': skipped + sum(1 for result in results.values() if result is False),
+            'ActivityDeferred': len(failed)
+        }, {'Table': user_cache.USERS_TABLE})
+        return written
+
+
+def _write(key, timestamp, threshold):
+    """
+    1ユーザー分の UpdateItem（保存済みの時刻が粒度内なら条件で省略）
+
+    Returns:
+        bool: 書き込んだ場合 True、条件不成立で省略した場合 False（失敗時は None）
+    """
+    user_id, attribute = key
+    try:
+        user_cache.update_user(
+            user_id,
+            UpdateExpression='SET #attribute = :timestamp',
+            ConditionExpression='attribute_exists(user_id) AND (attribute_not_exists(#attribute) OR #attribute < :threshold)',
+            ExpressionAttributeNames={'#attribute': attribute},
+            ExpressionAttributeValues={':timestamp': timestamp, ':threshold': threshold}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            print(f"Activity write failed for user {user_id}: {str(e)}")
+            return None
+        return False
+    except Exception as e:
+        print(f"Activity write failed for user {user_id}: {str(e)}")
+        return None
+    with _lock:
+        _remember(user_id, attribute, timestamp)
+    return True
+
+
+def _requeue(pending):
+    """失敗分をバッファへ戻す（その間に積まれた新しい時刻を優先）"""
+    with _lock:
+        for key, timestamp in pending.items():
+            if _pending.get(key, '') < timestamp:
+                _pending[key] = timestamp
+
+
+def reset():
+    """バッファ・記録済み時刻を破棄（テスト用）"""
+    with _lock:
+        _pending.clear()
+        _recent.clear()
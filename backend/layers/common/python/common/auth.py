@@ -0,0 +1,71 @@
+"""
+Cognitoアクセストークンからのユーザー特定（各関数の get_user_from_token と同じ仕様）
+"""
+import base64
+import json
+import os
+
+from common.aws_clients import get_client
+
+
+def get_user_from_token(event):
+    """
+    Authorization: Bearer <アクセストークン> からユーザー情報を取得
+
+    Returns:
+        dict: user_id, email, display_name, auth_provider（無効なトークンは None）
+    """
+    cognito_client = get_client('cognito-idp')
+    try:
+        auth_header = (event.get('headers') or {}).get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return None
+
+        response = cognito_client.get_user(AccessToken=auth_header.split(' ')[1])
+        user_attributes = {attr['Name']: attr['Value'] for attr in response['UserAttributes']}
+
+        return {
+            'user_id': response['Username'],  # CognitoのUsernameを user_id として使用
+            'email': user_attributes.get('email', ''),
+            'display_name': user_attributes.get('name', user_attributes.get('given_name', '')),
+            'auth_provider': 'cognito'
+        }
+
+    except cognito_client.exceptions.NotAuthorizedException:
+        print("Token is invalid or expired")
+        return None
+    except Exception as e:
+        print(f"Error getting user from token: {str(e)}")
+        return None
+
+
+def decode_id_token(id_token, client_id=None):
+    """
+    InitiateAuth の応答に含まれるIDトークンのクレームを取り出す（署名検証なし）
+
+    Cognito から TLS で直接受け取ったトークン専用。クライアントから受け取ったトークンには
+    使わないこと（その場合は get_user_from_token で Cognito に問い合わせる）。
+
+    Args:
+        client_id (str): aud として期待するアプリクライアントID（既定は COGNITO_CLIENT_ID）
+
+    Returns:
+        dict: user_id（cognito:username）, email, display_name, auth_provider, claims
+    """
+    try:
+        payload = id_token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except (AttributeError, IndexError, ValueError) as e:
+        raise ValueError(f"Malformed ID token: {str(e)}")
+
+    expected_audience = client_id or os.environ.get('COGNITO_CLIENT_ID')
+    if claims.get('token_use') != 'id' or (expected_audience and claims.get('aud') != expected_audience):
+        raise ValueError('Unexpected ID token claims')
+
+    return {
+        'user_id': claims.get('cognito:username') or claims['sub'],
+        'email': claims.get('email', ''),
+        'display_name': claims.get('name', claims.get('given_name', '')),
+        'auth_provider': 'cognito',
+        'claims': claims
+    }
@@ -0,0 +1,100 @@
+"""
+AWSクライアント・リソースプール
+
+boto3.resource()/boto3.client() は呼び出しのたびにセッション生成とエンドポイント解決を行うため、
+コンテナ単位で1度だけ生成してウォームスタート時は再利用する。
+"""
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+DEFAULT_REGION = 'ap-northeast-1'
+
+# 接続プール・タイムアウト・リトライ設定（環境変数で調整可能）
+BOTO_CONFIG = Config(
+    max_pool_connections=int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '25')),
+    connect_timeout=float(os.environ.get('AWS_CONNECT_TIMEOUT', '2')),
+    read_timeout=float(os.environ.get('AWS_READ_TIMEOUT', '10')),
+    retries={
+        'mode': 'adaptive',
+        'max_attempts': int(os.environ.get('AWS_MAX_ATTEMPTS', '4'))
+    },
+    tcp_keepalive=True
+)
+
+_lock = threading.RLock()
+_session = None
+_clients = {}
+_resources = {}
+_tables = {}
+
+
+def get_region():
+    """Lambda実行リージョン（ローカル実行時は東京リージョン）"""
+    return os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION') or DEFAULT_REGION
+
+
+def get_session():
+    """コンテナ共有のboto3セッション"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = boto3.session.Session(region_name=get_region())
+    return _session
+
+
+def get_client(service_name):
+    """サービスクライアント取得（初回のみ生成）"""
+    client = _clients.get(service_name)
+    if client is None:
+        with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                client = get_session().client(service_name, config=BOTO_CONFIG)
+                _clients[service_name] = client
+    return client
+
+
+def get_resource(service_name):
+    """サービスリソース取得（初回のみ生成）"""
+    resource = _resources.get(service_name)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(service_name)
+            if resource is None:
+                resource = get_session().resource(service_name, config=BOTO_CONFIG)
+                _resources[service_name] = resource
+    return resource
+
+
+def table_name(name):
+    """論理テーブル名から実テーブル名を生成（例: users → ai-tourism-poc-users-dev）"""
+    return f"{os.environ.get('PROJECT_NAME', 'ai-tourism-poc')}-{name}-{os.environ.get('STAGE', 'dev')}"
+
+
+def get_table(name):
+    """
+    DynamoDBテーブルハンドル取得
+
+    Args:
+        name (str): 論理テーブル名（'users', 'images', 'payment-history' など）
+    """
+    full_name = table_name(name)
+    table = _tables.get(full_name)
+    if table is None:
+        table = get_resource('dynamodb').Table(full_name)
+        _tables[full_name] = table
+    return table
+
+
+def reset_clients():
+    """プールを破棄（テスト・認証情報切替用）"""
+    global _session
+    with _lock:
+        _session = None
+        _clients.clear()
+        _resources.clear()
+        _tables.clear()
@@ -0,0 +1,78 @@
+"""
+条件付きGET（ETag / If-None-Match → 304）と Cache-Control の付与
+
+レスポンス本文の元になった項目のバージョン（updated_at 等）から ETag を作り、
+クライアントが同じ ETag を If-None-Match で送ってきた場合は本文を作らずに 304 を返す。
+本文は JSON の再シリアライズで表現が変わりうるため弱い ETag（W/"..."）とする。
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+JST = timezone(timedelta(hours=9))
+
+
+def make_etag(*parts):
+    """バージョンを構成する値から弱い ETag を作る"""
+    digest = hashlib.sha256('\x1f'.join('' if part is None else str(part) for part in parts).encode('utf-8'))
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+
+def request_header(event, name):
+    """リクエストヘッダー取得（API Gateway はヘッダー名の大文字小文字を保持するため区別しない）"""
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def etag_matches(event, etag):
+    """If-None-Match が ETag に一致するか（弱い比較、カンマ区切り・* に対応）"""
+    header = request_header(event, 'If-None-Match')
+    if not header or not etag:
+        return False
+    if header.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith('W/') else candidate) == opaque:
+            return True
+    return False
+
+
+def http_date(value):
+    """
+    ISO形式の時刻を HTTP-date（Last-Modified 用）に変換（解析できなければ None）
+
+    タイムゾーンなしの値はJSTとして扱う。
+    """
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=JST)
+    return format_datetime(parsed.astimezone(timezone.utc), usegmt=True)
+
+
+def cache_headers(headers, etag, max_age, last_modified=None):
+    """
+    検証用ヘッダーを付与したヘッダーを返す
+
+    Cache-Control は private（ユーザーごとの内容のため共有キャッシュに載せない）。
+    max_age 秒以内はブラウザ・Service Worker が再取得せず、以降は If-None-Match で再検証する。
+    """
+    result = dict(headers, **{
+        'ETag': etag,
+        'Cache-Control': f'private, max-age={max_age}, must-revalidate'
+    })
+    if last_modified:
+        result['Last-Modified'] = last_modified
+    return result
+
+
+def not_modified(headers, etag, max_age, last_modified=None):
+    """304 レスポンス（本文なし）"""
+    return {'statusCode': 304, 'headers': cache_headers(headers, etag, max_age, last_modified), 'body': ''}
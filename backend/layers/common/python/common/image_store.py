@@ -0,0 +1,217 @@
+"""
+画像保存（S3 + imagesテーブル）
+
+/upload-image（image-upload）と /upload-and-analyze（image-analysis）で共用する。
+解析結果の全文は zlib 圧縮して保存し、履歴の再表示でモデルを再度呼び出さない。
+"""
+import os
+import uuid
+import zlib
+
+from boto3.dynamodb.types import Binary
+
+from common import sharding, single_table
+from common.aws_clients import get_client, get_table
+from common.jst import get_jst_isoformat, get_jst_timestamp
+
+CONTENT_TYPE_MAP = {
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp'
+}
+
+# 圧縮後サイズがこれ以下なら項目内（Binary）に保存、超える場合はS3（DynamoDB項目上限400KBに余裕を持たせる）
+ANALYSIS_INLINE_LIMIT = int(os.environ.get('ANALYSIS_INLINE_LIMIT', str(100 * 1024)))
+ANALYSIS_ENCODING = 'zlib'
+ANALYSIS_COMPRESSION_LEVEL = 6
+
+# imagesテーブルの (user_id, created_at) GSI（scripts/create-images-user-index.sh で作成）
+USER_CREATED_INDEX = 'user-created-index'
+
+
+def images_bucket():
+    """画像バケット名（ステージ別）"""
+    return os.environ.get('IMAGES_BUCKET') or \
+        f"{os.environ.get('PROJECT_NAME', 'ai-tourism-poc')}-images-{os.environ.get('STAGE', 'dev')}"
+
+
+def upload_image(image_bytes, filename, user_id, image_id=None):
+    """
+    デコード済み画像をS3にアップロード
+
+    Args:
+        image_bytes (bytes): 画像データ
+        filename (str): 元ファイル名（拡張子からContent-Typeを決定）
+        user_id (str): ユーザーID（キーのプレフィックス）
+        image_id (str): 画像ID（指定時はオブジェクトメタデータ image-id に記録）
+
+    Returns:
+        dict: s3_key, s3_url, bucket
+    """
+    bucket_name = images_bucket()
+
+    # ユニークなファイル名生成
+    timestamp = get_jst_timestamp()
+    unique_id = str(uuid.uuid4())[:8]
+    file_extension = filename.split('.')[-1].lower() if '.' in filename else 'jpg'
+    s3_key = f"users/{user_id}/images/{timestamp}_{unique_id}.{file_extension}"
+
+    try:
+        get_client('s3').put_object(
+            Bucket=bucket_name,
+            Key=s3_key,
+            Body=image_bytes,
+            ContentType=CONTENT_TYPE_MAP.get(file_extension, 'image/jpeg'),
+            CacheControl='max-age=31536000',  # 1年キャッシュ
+            ServerSideEncryption='AES256',
+            Metadata={'image-id': image_id} if image_id else {}
+        )
+    except Exception as e:
+        raise Exception(f"S3 upload failed: {str(e)}")
+
+    return {
+        's3_key': s3_key,
+        's3_url': f"https://{bucket_name}.s3.ap-northeast-1.amazonaws.com/{s3_key}",
+        'bucket': bucket_name
+    }
+
+
+def save_image_metadata(s3_key, s3_url, user_id, filename, analysis_type, language, analysis_result=None, image_id=None):
+    """
+    画像メタデータをimagesテーブルに保存
+    S3にはアップロード済みのため、保存失敗時も例外にせずwarningを付けて返す
+    """
+    image_id = image_id or str(uuid.uuid4())
+    timestamp = get_jst_isoformat()
+
+    # 返答文の先頭200文字を保存
+    analysis_summary = ""
+    response_truncated = False
+    if analysis_result:
+        analysis_summary = analysis_result[:200]
+        response_truncated = len(analysis_result) > 200
+
+    # 共有ID（匿名アップロード等）はGSI・シングルテーブルのパーティションが集中しないようシャード化
+    item = {
+        'image_id': image_id,
+        'user_id': sharding.write_key(user_id),
+        's3_key': s3_key,
+        's3_url': s3_url,
+        'original_filename': filename,
+        'analysis_type': analysis_type,
+        'language': language,
+        'uploaded_at': timestamp,
+        'created_at': timestamp,
+        'status': 'uploaded',
+        'analysis_summary': analysis_summary,
+        'response_truncated': response_truncated
+    }
+
+    try:
+        get_table('images').put_item(Item=item)
+        single_table.put_image(item)
+        return {
+            'image_id': image_id,
+            'uploaded_at': timestamp
+        }
+    except Exception as e:
+        print(f"DynamoDB save error: {str(e)}")
+        return {
+            'image_id': image_id,
+            'uploaded_at': timestamp,
+            'warning': 'Metadata save failed but image uploaded to S3'
+        }
+
+
+def analysis_s3_key(image_id):
+    """解析結果全文のS3キー（users/ 配下の先行解析トリガーに掛からないプレフィックス）"""
+    return f"analysis/{image_id}.md.zlib"
+
+
+def store_analysis_text(image_id, analysis_result, inline_limit=None):
+    """
+    解析結果全文を圧縮し、保存先に応じた項目属性を返す
+
+    Returns:
+        dict: analysis_compressed（項目内）または analysis_s3_key（S3）と
+              analysis_encoding, analysis_length
+    """
+    limit = ANALYSIS_INLINE_LIMIT if inline_limit is None else inline_limit
+    compressed = zlib.compress(analysis_result.encode('utf-8'), ANALYSIS_COMPRESSION_LEVEL)
+    fields = {
+        'analysis_encoding': ANALYSIS_ENCODING,
+        'analysis_length': len(analysis_result)
+    }
+
+    if len(compressed) <= limit:
+        fields['analysis_compressed'] = Binary(compressed)
+    else:
+        s3_key = analysis_s3_key(image_id)
+        get_client('s3').put_object(
+            Bucket=images_bucket(),
+            Key=s3_key,
+            Body=compressed,
+            ContentType='application/zlib',
+            ServerSideEncryption='AES256'
+        )
+        fields['analysis_s3_key'] = s3_key
+    return fields
+
+
+def load_analysis_text(item):
+    """
+    画像項目から解析結果全文を復元（全文未保存の旧データは None）
+    """
+    if item.get('analysis_compressed') is not None:
+        compressed = item['analysis_compressed']
+        compressed = compressed.value if isinstance(compressed, Binary) else bytes(compressed)
+    elif item.get('analysis_s3_key'):
+        response = get_client('s3').get_object(Bucket=images_bucket(), Key=item['analysis_s3_key'])
+        compressed = response['Body'].read()
+    else:
+        return None
+    return zlib.decompress(compressed).decode('utf-8')
+
+
+def update_image_with_analysis(image_id, analysis_result):
+    """
+    画像に解析結果を追加保存（1回のUpdateItem）
+
+    一覧用の先頭200文字に加え、全文を圧縮して保存する
+    """
+    try:
+        # 返答文の先頭200文字を保存
+        analysis_summary = analysis_result[:200] if analysis_result else ""
+        response_truncated = len(analysis_result) > 200 if analysis_result else False
+
+        values = {
+            ':summary': analysis_summary,
+            ':truncated': response_truncated,
+            ':status': 'analyzed',
+            ':analyzed_at': get_jst_isoformat()
+        }
+        update_expression = "SET analysis_summary = :summary, response_truncated = :truncated, #status = :status, analyzed_at = :analyzed_at"
+        if analysis_result:
+            for name, value in store_analysis_text(image_id, analysis_result).items():
+                update_expression += f", {name} = :{name}"
+                values[f':{name}'] = value
+
+        update_kwargs = {
+            'Key': {'image_id': image_id},
+            'UpdateExpression': update_expression,
+            'ExpressionAttributeNames': {'#status': 'status'},
+            'ExpressionAttributeValues': values
+        }
+        if single_table.dual_write_enabled():
+            # IMG# 項目のキー（user_id, created_at）を追加の読み込みなしで得る
+            update_kwargs['ReturnValues'] = 'ALL_NEW'
+        response = get_table('images').update_item(**update_kwargs)
+        if response.get('Attributes', {}).get('user_id'):
+            single_table.put_image(response['Attributes'])
+        print(f"Successfully updated analysis for image_id: {image_id}")
+        return True
+    except Exception as e:
+        print(f"Failed to update image analysis: {str(e)}")
+        return False
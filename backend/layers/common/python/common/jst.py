@@ -0,0 +1,19 @@
+"""
+JST時刻ユーティリティ（各ハンドラーのLambda内実装と同じ仕様）
+"""
+from datetime import datetime, timedelta
+
+
+def get_jst_now():
+    """現在の日本時間（JST = UTC+9）を取得"""
+    return datetime.utcnow() + timedelta(hours=9)
+
+
+def get_jst_isoformat():
+    """現在の日本時間をISO形式の文字列で取得"""
+    return get_jst_now().isoformat() + '+09:00'
+
+
+def get_jst_timestamp():
+    """ファイル名用のタイムスタンプ（JST）を取得"""
+    return get_jst_now().strftime('%Y%m%d_%H%M%S')
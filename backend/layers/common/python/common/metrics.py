@@ -0,0 +1,42 @@
+"""
+CloudWatch メトリクス出力（Embedded Metric Format）
+
+ログに EMF 形式の JSON を1行出力するだけで CloudWatch がメトリクスを抽出するため、
+PutMetricData の API 呼び出し（レイテンシ・権限）が不要。
+"""
+import json
+import os
+import time
+
+DEFAULT_NAMESPACE = 'AiTourismPoc'
+
+
+def metrics_enabled():
+    return os.environ.get('METRICS_ENABLED', 'on') == 'on'
+
+
+def emit_metrics(metrics, dimensions=None, unit='Count', namespace=None):
+    """
+    メトリクスを1行のEMFログとして出力
+
+    Args:
+        metrics (dict): メトリクス名 -> 値
+        dimensions (dict): ディメンション名 -> 値（例: {'Table': 'users'}）
+        unit (str): 単位（全メトリクス共通）
+    """
+    if not metrics_enabled() or not metrics:
+        return
+    dimensions = dimensions or {}
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': namespace or os.environ.get('METRICS_NAMESPACE', DEFAULT_NAMESPACE),
+                'Dimensions': [list(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': unit} for name in metrics]
+            }]
+        }
+    }
+    record.update(dimensions)
+    record.update(metrics)
+    print(json.dumps(record))
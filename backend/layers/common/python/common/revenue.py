@@ -0,0 +1,127 @@
+"""
+売上の日次・月次集計（シングルテーブルの REVENUE# 項目）
+
+支払い済みの決済ごとに、決済記録と同じトランザクションで日次・月次のプラン別項目へ
+金額と件数を ADD する。売上ダッシュボードは決済履歴をスキャンせず、
+月ごとのパーティションを Query するだけで集計値を得られる。
+
+    PK=REVENUE#<YYYY-MM>  SK=DAY#<YYYY-MM-DD>#<plan_type>   日次（プラン別）
+    PK=REVENUE#<YYYY-MM>  SK=MONTH#<plan_type>              月次（プラン別）
+
+日付は決済記録の createdAt（JST）の日付部分。
+"""
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Key
+
+from common import single_table
+from common.aws_clients import table_name
+from common.jst import get_jst_isoformat
+from common.stats import PAID_STATUSES
+
+REVENUE_PREFIX = 'REVENUE#'
+DAY_PREFIX = 'DAY#'
+MONTH_PREFIX = 'MONTH#'
+
+
+def revenue_pk(month):
+    """month: YYYY-MM"""
+    return f"{REVENUE_PREFIX}{month}"
+
+
+def day_sk(day, plan_type):
+    """day: YYYY-MM-DD"""
+    return f"{DAY_PREFIX}{day}#{plan_type}"
+
+
+def month_sk(plan_type):
+    return f"{MONTH_PREFIX}{plan_type}"
+
+
+def rollup_transact_items(plan_type, amount, status, created_at):
+    """
+    決済1件分の日次・月次加算を TransactWriteItems の要素として返す（支払い済み以外は空）
+
+    Args:
+        created_at (str): 決済記録の createdAt（JSTのISO形式）
+    """
+    if status not in PAID_STATUSES:
+        return []
+    day = created_at[:10]
+    items = []
+    for sk, period in ((day_sk(day, plan_type), day), (month_sk(plan_type), day[:7])):
+        items.append({'Update': {
+            'TableName': table_name('app'),
+            'Key': {'PK': revenue_pk(day[:7]), 'SK': sk},
+            'UpdateExpression': 'ADD amount :amount, #count :one SET plan_type = :plan, #period = :period, updated_at = :updated',
+            'ExpressionAttributeNames': {'#count': 'count', '#period': 'period'},
+            'ExpressionAttributeValues': {
+                ':amount': Decimal(str(amount)),
+                ':one': 1,
+                ':plan': plan_type,
+                ':period': period,
+                ':updated': get_jst_isoformat()
+            }
+        }})
+    return items
+
+
+def _months(start_month, end_month):
+    """YYYY-MM の範囲（両端を含む）"""
+    year, month = map(int, start_month.split('-'))
+    end_year, end = map(int, end_month.split('-'))
+    while (year, month) <= (end_year, end):
+        yield f"{year:04d}-{month:02d}"
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _query(pk, key_condition):
+    query_kwargs = {'KeyConditionExpression': Key('PK').eq(pk) & key_condition}
+    while True:
+        response = single_table.app_table().query(**query_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _row(item):
+    return {
+        'period': item['period'],
+        'plan_type': item['plan_type'],
+        'amount': int(item.get('amount', 0)),
+        'count': int(item.get('count', 0))
+    }
+
+
+def get_daily_revenue(start_day, end_day):
+    """
+    日次売上（プラン別）
+
+    Args:
+        start_day, end_day (str): YYYY-MM-DD（両端を含む）
+
+    Returns:
+        list: period, plan_type, amount, count（日付・プラン順）
+    """
+    rows = []
+    for month in _months(start_day[:7], end_day[:7]):
+        condition = Key('SK').between(day_sk(max(start_day, f"{month}-01"), ''), day_sk(min(end_day, f"{month}-31"), '~'))
+        rows.extend(_row(item) for item in _query(revenue_pk(month), condition))
+    return rows
+
+
+def get_monthly_revenue(start_month, end_month):
+    """
+    月次売上（プラン別）
+
+    Args:
+        start_month, end_month (str): YYYY-MM（両端を含む）
+
+    Returns:
+        list: period, plan_type, amount, count（月・プラン順）
+    """
+    rows = []
+    for month in _months(start_month, end_month):
+        rows.extend(_row(item) for item in _query(revenue_pk(month), Key('SK').begins_with(MONTH_PREFIX)))
+    return rows
@@ -0,0 +1,273 @@
+"""
+Lambda（API Gateway プロキシ統合）用のルーターとミドルウェア
+
+各ハンドラーで個別に書いていた if/elif のパス分岐・CORSヘッダー・OPTIONS 応答・
+例外時のJSONエラー応答を共通化する。
+
+    router = Router('auth', allow_methods='GET,POST,OPTIONS', error_prefix='Authentication error')
+    router.add(ANY, 'user-info', handle_get_user_info, auth=True)
+
+    def main(event, context):
+        return router.dispatch(event, context)
+
+ルート表は最初のリクエストで一度だけ組み立てる（固定パスは (メソッド, パス) の辞書、
+{name} を含むパスは正規表現）。以降の振り分けは辞書引き1回（＋パラメーター付きルートの照合）。
+
+ルート関数は従来どおり (event, headers) を受け取る。event は Request（元のイベントの dict
+のサブクラス）で、次の属性を持つ。
+
+    event.json     本文のJSON（1リクエストで1回だけ解析、不正なJSONは HttpError(400)）
+    event.user     認証ユーザー（1リクエストで1回だけ Router の auth 関数で解決、無効なら None）
+    event.params   パス中の {name} の値
+    event.context  Lambda コンテキスト
+
+ミドルウェアは middleware(request, call_next) -> response の関数。既定の順序は
+
+    timing  処理時間をメトリクス（Latency、Function / Route ディメンション）として出力
+    errors  HttpError は対応するステータス、その他の例外は500のJSONエラーに変換
+    cors    OPTIONS に本文なしの200を返し、応答に CORS ヘッダーを付与
+    auth    auth=True のルートで認証ユーザーがなければ401
+"""
+import json
+import re
+import time
+from functools import reduce
+
+from common.metrics import emit_metrics
+
+ANY = '*'
+DEFAULT_ALLOW_HEADERS = 'Content-Type,Authorization'
+UNAUTHORIZED_BODY = {'error': 'Invalid or expired token'}
+
+_PARAMETER = re.compile(r'\{(\w+)\}')
+_UNSET = object()
+
+
+class HttpError(Exception):
+    """ルート関数から送出してステータス付きのJSONエラーを返す"""
+
+    def __init__(self, status_code, message, **extra):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = dict({'error': message}, **extra)
+
+
+class Route:
+    __slots__ = ('method', 'path', 'handler', 'auth', 'pattern')
+
+    def __init__(self, method, path, handler, auth=False):
+        self.method = method.upper()
+        self.path = path
+        self.handler = handler
+        self.auth = auth
+        self.pattern = _compile_pattern(path) if _PARAMETER.search(path) else None
+
+
+def _compile_pattern(path):
+    """'users/{user_id}/stats' → ^users/(?P<user_id>[^/]+)/stats$"""
+    parts = []
+    position = 0
+    for matched in _PARAMETER.finditer(path):
+        parts.append(re.escape(path[position:matched.start()]))
+        parts.append(f'(?P<{matched.group(1)}>[^/]+)')
+        position = matched.end()
+    parts.append(re.escape(path[position:]))
+    return re.compile('^' + ''.join(parts) + '$')
+
+
+class Request(dict):
+    """API Gateway のイベント（dict としてそのまま使える）と、リクエスト単位で1回だけ求める値"""
+
+    def __init__(self, event, context, router):
+        super().__init__(event)
+        self.context = context
+        self.router = router
+        self.route = None
+        self.params = {}
+        self.response_headers = dict(router.headers)
+        self._json = _UNSET
+        self._user = _UNSET
+
+    @property
+    def method(self):
+        return self.get('httpMethod', '')
+
+    @property
+    def json(self):
+        if self._json is _UNSET:
+            body = self.get('body')
+            if not body:
+                self._json = {}
+            else:
+                try:
+                    self._json = json.loads(body)
+                except ValueError:
+                    raise HttpError(400, 'Invalid JSON body')
+        return self._json
+
+    @property
+    def user(self):
+        if self._user is _UNSET:
+            self._user = self.router.auth(self) if self.router.auth else None
+        return self._user
+
+
+def proxy_path(event):
+    """{proxy+} の値（auth/{proxy+} 等）"""
+    return (event.get('pathParameters') or {}).get('proxy', '') or ''
+
+
+def last_path_segment(event):
+    """リソースパスの最後の要素（/payment/history → history）"""
+    return (event.get('path') or '').rstrip('/').split('/')[-1]
+
+
+def path_parameter(name):
+    """
+    パスパラメーター1つのリソース（history と history/{imageId} 等）用の path 関数
+
+    パラメーターの値（なければ ''）を照合用のパスにするため、ルートは '' と '{name}' で登録する。
+    """
+    return lambda event: (event.get('pathParameters') or {}).get(name) or ''
+
+
+def error_response(status_code, body, headers):
+    return {'statusCode': status_code, 'headers': headers, 'body': json.dumps(body)}
+
+
+def timing_middleware(request, call_next):
+    started = time.perf_counter()
+    response = call_next(request)
+    route = request.route.path if request.route else 'unmatched'
+    emit_metrics(
+        {'Latency': round((time.perf_counter() - started) * 1000, 3)},
+        {'Function': request.router.name, 'Route': route}, unit='Milliseconds'
+    )
+    return response
+
+
+def error_middleware(request, call_next):
+    try:
+        return call_next(request)
+    except HttpError as e:
+        return error_response(e.status_code, e.body, request.response_headers)
+    except Exception as e:
+        print(f"{request.router.name} error: {str(e)}")
+        if request.router.hide_errors:
+            return error_response(500, {'error': 'Internal server error'}, request.response_headers)
+        prefix = request.router.error_prefix
+        return error_response(500, {'error': f'{prefix}: {str(e)}' if prefix else str(e)}, request.response_headers)
+
+
+def cors_middleware(request, call_next):
+    if request.method == 'OPTIONS':
+        return {'statusCode': 200, 'headers': request.response_headers, 'body': ''}
+    response = call_next(request)
+    # ルート関数が独自のヘッダーで応答した場合も CORS ヘッダーは付ける
+    headers = response.setdefault('headers', {})
+    for name, value in request.router.headers.items():
+        headers.setdefault(name, value)
+    return response
+
+
+def auth_middleware(request, call_next):
+    if request.route is not None and request.route.auth and not request.user:
+        return error_response(401, request.router.unauthorized_body, request.response_headers)
+    return call_next(request)
+
+
+DEFAULT_MIDDLEWARE = (timing_middleware, error_middleware, cors_middleware, auth_middleware)
+
+
+class Router:
+    """
+    パス・メソッドからルート関数への振り分け
+
+    Args:
+        name (str): メトリクス・ログ用の関数名
+        allow_methods (str): Access-Control-Allow-Methods
+        path (callable): イベントから照合用のパスを取り出す関数（既定は {proxy+} の値）
+        auth (callable): イベントから認証ユーザーを求める関数（無効なら None）
+        error_prefix (str): 500応答のエラーメッセージの接頭辞
+        unauthorized_body (dict): auth=True のルートの401応答の本文
+        expose_headers (str): Access-Control-Expose-Headers
+        hide_errors (bool): 500応答に例外の内容を含めない（'Internal server error' のみ）
+    """
+
+    def __init__(self, name, allow_methods='GET,POST,OPTIONS', allow_headers=DEFAULT_ALLOW_HEADERS,
+                 path=proxy_path, auth=None, error_prefix=None, unauthorized_body=None,
+                 expose_headers=None, middleware=DEFAULT_MIDDLEWARE, hide_errors=False):
+        self.name = name
+        self.path = path
+        self.auth = auth
+        self.error_prefix = error_prefix
+        self.hide_errors = hide_errors
+        self.unauthorized_body = unauthorized_body or UNAUTHORIZED_BODY
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': allow_headers,
+            'Access-Control-Allow-Methods': allow_methods
+        }
+        if expose_headers:
+            self.headers['Access-Control-Expose-Headers'] = expose_headers
+        self.middleware = tuple(middleware)
+        self._routes = []
+        self._static = None
+        self._dynamic = None
+        self._chain = None
+
+    def add(self, method, path, handler, auth=False):
+        """ルート登録（method は GET 等または ANY、path の {name} は event.params に入る）"""
+        self._routes.append(Route(method, path, handler, auth))
+        self._static = None
+        return handler
+
+    def route(self, method, path, auth=False):
+        """add のデコレーター版"""
+        return lambda handler: self.add(method, path, handler, auth)
+
+    def compile(self):
+        """ルート表とミドルウェアの連結を組み立てる（登録後の最初のリクエストで1回）"""
+        static = {}
+        dynamic = []
+        for route in self._routes:
+            if route.pattern is None:
+                static.setdefault((route.method, route.path), route)
+            else:
+                dynamic.append(route)
+        self._dynamic = tuple(dynamic)
+        self._chain = reduce(
+            lambda call_next, middleware: lambda request: middleware(request, call_next),
+            reversed(self.middleware), self._call_route
+        )
+        self._static = static
+
+    def match(self, method, path):
+        """
+        Returns:
+            tuple: (Route, パラメーター)（該当なしは (None, {})）
+        """
+        if self._static is None:
+            self.compile()
+        route = self._static.get((method, path)) or self._static.get((ANY, path))
+        if route is not None:
+            return route, {}
+        for route in self._dynamic:
+            if route.method in (method, ANY):
+                matched = route.pattern.match(path)
+                if matched:
+                    return route, matched.groupdict()
+        return None, {}
+
+    def dispatch(self, event, context=None):
+        """Lambda のエントリーポイントから呼ぶ"""
+        request = Request(event, context, self)
+        request.route, request.params = self.match(request.method, self.path(request))
+        return self._chain(request)
+
+    @staticmethod
+    def _call_route(request):
+        if request.route is None:
+            return error_response(404, {'error': 'Endpoint not found'}, request.response_headers)
+        return request.route.handler(request, request.response_headers)
@@ -0,0 +1,144 @@
+"""
+DynamoDB 並列スキャン（管理・移行・エクスポート用。リクエスト処理では使わない）
+
+- TotalSegments 分割したセグメントをワーカースレッドで並列に読み込む
+- 消費キャパシティに基づくレート制限で本番のリード容量を圧迫しない
+- スロットリング時は指数バックオフで再試行
+- セグメントごとの LastEvaluatedKey をチェックポイントとして通知し、中断後に再開できる
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from common.aws_clients import get_table
+
+DEFAULT_SEGMENTS = 8
+
+# チェックポイントでセグメント完了を表す値
+SEGMENT_DONE = 'done'
+
+THROTTLE_ERRORS = ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded')
+MAX_THROTTLE_RETRIES = 8
+
+
+class CapacityLimiter:
+    """
+    読み込みキャパシティのトークンバケット（全ワーカーで共有）
+
+    消費したRCUを後から差し引くため、1ページ分だけ上限を超えることがある
+    """
+
+    def __init__(self, units_per_second):
+        self.units_per_second = float(units_per_second)
+        self._available = self.units_per_second
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._available = min(self.units_per_second, self._available + (now - self._updated) * self.units_per_second)
+        self._updated = now
+
+    def wait(self):
+        """残量が正になるまで待機"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._available > 0:
+                    return
+                shortage = -self._available
+            time.sleep(shortage / self.units_per_second)
+
+    def consume(self, units):
+        with self._lock:
+            self._refill()
+            self._available -= units
+
+
+def _scan_page(table, kwargs, limiter):
+    """1ページ読み込み（スロットリング時は指数バックオフ）"""
+    for attempt in range(MAX_THROTTLE_RETRIES + 1):
+        if limiter:
+            limiter.wait()
+        try:
+            response = table.scan(**kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in THROTTLE_ERRORS or attempt == MAX_THROTTLE_RETRIES:
+                raise
+            delay = min(0.1 * (2 ** attempt), 10) * random.uniform(0.5, 1.0)
+            print(f"Scan throttled (segment {kwargs.get('Segment')}), retry in {delay:.2f}s")
+            time.sleep(delay)
+            continue
+        if limiter:
+            limiter.consume(response.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
+        return response
+
+
+def scan_segment(table, segment, total_segments, handle_page, start_key=None, on_checkpoint=None,
+                 limiter=None, **scan_kwargs):
+    """
+    1セグメント分をページ単位で読み込み handle_page(items, segment) に渡す
+
+    Args:
+        start_key (dict): 再開位置（前回のチェックポイント）
+        on_checkpoint (callable): ページ処理後に (segment, LastEvaluatedKey または SEGMENT_DONE) で呼ばれる
+        limiter (CapacityLimiter): 共有レート制限
+
+    Returns:
+        int: 読み込んだ件数
+    """
+    kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
+    if limiter:
+        kwargs['ReturnConsumedCapacity'] = 'TOTAL'
+    if start_key:
+        kwargs['ExclusiveStartKey'] = start_key
+
+    count = 0
+    while True:
+        response = _scan_page(table, kwargs, limiter)
+        items = response.get('Items', [])
+        if items:
+            handle_page(items, segment)
+        count += len(items)
+
+        last_key = response.get('LastEvaluatedKey')
+        if on_checkpoint:
+            on_checkpoint(segment, last_key or SEGMENT_DONE)
+        if not last_key:
+            return count
+        kwargs['ExclusiveStartKey'] = last_key
+
+
+def parallel_scan(name, handle_page, total_segments=DEFAULT_SEGMENTS, workers=None, checkpoint=None,
+                  on_checkpoint=None, capacity_per_second=None, **scan_kwargs):
+    """
+    論理テーブル名 name を total_segments 分割で並列スキャン
+
+    handle_page(items, segment) は複数スレッドから呼ばれる。
+    同一セグメントは常に1スレッドで順に処理される。
+
+    Args:
+        workers (int): ワーカー数（既定はセグメント数）
+        checkpoint (dict): {segment: LastEvaluatedKey または SEGMENT_DONE}（再開時）
+        capacity_per_second (float): 全ワーカー合計の消費RCU上限
+
+    Returns:
+        int: 読み込んだ件数（今回の実行分）
+    """
+    table = get_table(name)
+    checkpoint = checkpoint or {}
+    limiter = CapacityLimiter(capacity_per_second) if capacity_per_second else None
+    pending = [segment for segment in range(total_segments) if checkpoint.get(segment) != SEGMENT_DONE]
+
+    with ThreadPoolExecutor(max_workers=workers or total_segments) as executor:
+        futures = [
+            executor.submit(
+                scan_segment, table, segment, total_segments, handle_page,
+                start_key=checkpoint.get(segment), on_checkpoint=on_checkpoint, limiter=limiter, **scan_kwargs
+            )
+            for segment in pending
+        ]
+        return sum(future.result() for future in futures)
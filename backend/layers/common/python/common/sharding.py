@@ -0,0 +1,141 @@
+"""
+ホットキーの書き込みシャーディング
+
+匿名アップロードの 'sapporo-guide'、緊急ログインの 'emergency-user' のような共有IDは
+全リクエストが同じパーティションキーに書き込むため、キー単位の上限でスロットリングされる。
+共有IDへの書き込みは '<key>#<n>'（n = 0..シャード数-1）に分散し、読み込み時に全シャードを集計する。
+
+HOT_KEY_SHARDS（既定 10）を減らすと上位シャードの値が集計されなくなるため、増やす方向にのみ変更する。
+"""
+import os
+import random
+
+from common.aws_clients import get_resource, get_table, table_name
+
+SHARD_SEPARATOR = '#'
+DEFAULT_SHARD_COUNT = 10
+DEFAULT_SHARED_IDENTITIES = 'sapporo-guide,emergency-user'
+
+BATCH_GET_LIMIT = 100
+
+
+def shard_count():
+    return max(int(os.environ.get('HOT_KEY_SHARDS', DEFAULT_SHARD_COUNT)), 1)
+
+
+def shared_identities():
+    """書き込みを分散する共有ID"""
+    value = os.environ.get('SHARED_IDENTITIES', DEFAULT_SHARED_IDENTITIES)
+    return frozenset(identity.strip() for identity in value.split(',') if identity.strip())
+
+
+def is_shared_identity(user_id):
+    return user_id in shared_identities()
+
+
+def sharded_key(key, shard=None):
+    """書き込み用のシャードキー（shard 省略時はランダム）"""
+    if shard is None:
+        shard = random.randrange(shard_count())
+    return f"{key}{SHARD_SEPARATOR}{shard}"
+
+
+def shard_keys(key):
+    """集計読み込み用の全シャードキー"""
+    return [sharded_key(key, shard) for shard in range(shard_count())]
+
+
+def write_key(user_id):
+    """パーティションキーに使うユーザーID（共有IDのみシャード化）"""
+    return sharded_key(user_id) if is_shared_identity(user_id) else user_id
+
+
+def logical_key(key):
+    """シャードキーから元のキーを取得（シャード化されていなければそのまま）"""
+    base, separator, shard = key.rpartition(SHARD_SEPARATOR)
+    if separator and shard.isdigit() and is_shared_identity(base):
+        return base
+    return key
+
+
+class ShardedCounter:
+    """
+    シャード化カウンター
+
+    increment はランダムな1シャードに ADD し、read は全シャードを BatchGetItem して合計する。
+
+    Args:
+        name (str): 論理テーブル名
+        key_name (str): パーティションキー属性名
+        key (str): 論理キー（シャード項目は '<key>#<n>'）
+    """
+
+    def __init__(self, name, key_name, key):
+        self.name = name
+        self.key_name = key_name
+        self.key = key
+
+    def increment(self, amounts, shard=None, extra_values=None):
+        """
+        ランダムな1シャードに加算
+
+        Args:
+            amounts (dict): 属性名 -> 加算値
+            extra_values (dict): 同時に SET する属性
+
+        Returns:
+            str: 書き込んだシャードキー
+        """
+        names = {}
+        values = {}
+        add_parts = []
+        for i, (attribute, amount) in enumerate(amounts.items()):
+            names[f'#c{i}'] = attribute
+            values[f':c{i}'] = amount
+            add_parts.append(f'#c{i} :c{i}')
+        update_expression = 'ADD ' + ', '.join(add_parts)
+        if extra_values:
+            set_parts = []
+            for i, (attribute, value) in enumerate(extra_values.items()):
+                names[f'#s{i}'] = attribute
+                values[f':s{i}'] = value
+                set_parts.append(f'#s{i} = :s{i}')
+            update_expression += ' SET ' + ', '.join(set_parts)
+
+        key = sharded_key(self.key, shard)
+        get_table(self.name).update_item(
+            Key={self.key_name: key},
+            UpdateExpression=update_expression,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+        return key
+
+    def read(self, attributes):
+        """
+        全シャードの合計
+
+        Returns:
+            dict: 属性名 -> 合計値（int）
+        """
+        totals = {attribute: 0 for attribute in attributes}
+        full_name = table_name(self.name)
+        keys = [{self.key_name: key} for key in shard_keys(self.key)]
+        projection = ', '.join(f'#a{i}' for i in range(len(attributes)))
+        names = {f'#a{i}': attribute for i, attribute in enumerate(attributes)}
+
+        for start in range(0, len(keys), BATCH_GET_LIMIT):
+            request = {
+                full_name: {
+                    'Keys': keys[start:start + BATCH_GET_LIMIT],
+                    'ProjectionExpression': projection,
+                    'ExpressionAttributeNames': names
+                }
+            }
+            while request:
+                response = get_resource('dynamodb').batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(full_name, []):
+                    for attribute in attributes:
+                        totals[attribute] += int(item.get(attribute, 0))
+                request = response.get('UnprocessedKeys') or None
+        return totals
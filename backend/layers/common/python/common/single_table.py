@@ -0,0 +1,211 @@
+"""
+シングルテーブル（{PROJECT_NAME}-app-{STAGE}）データアクセス層
+
+ユーザー単位のデータを PK=USER#<user_id> に集約し、SK で種別を分ける。
+
+    PROFILE             プロフィール・プラン（users テーブル相当）
+    USAGE#<YYYYMM>      月別解析回数
+    IMG#<created_at>#<image_id>   解析履歴（images テーブル相当、一覧用の属性のみ）
+    PAY#<createdAt>#<paymentId>   決済記録（payment-history テーブル相当）
+    STATS               ユーザー統計（common.stats が書き込み時に加算）
+
+移行期間中は既存テーブルへの書き込みに合わせて二重書き込みする（SINGLE_TABLE_DUAL_WRITE=on）。
+二重書き込みの失敗はリクエストを失敗させない（移行ツールで再同期可能）。
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.conditions import Key
+
+from common.aws_clients import get_resource, get_table, table_name
+from common.jst import get_jst_now
+
+PROFILE_SK = 'PROFILE'
+USAGE_PREFIX = 'USAGE#'
+IMAGE_PREFIX = 'IMG#'
+PAYMENT_PREFIX = 'PAY#'
+
+DEFAULT_LATEST_ANALYSES = 5
+
+# IMG# 項目に保持する属性（一覧表示用）
+IMAGE_ATTRIBUTES = ('image_id', 'created_at', 'analysis_type', 'language', 'analysis_summary',
+                    'response_truncated', 's3_url', 'status', 'original_filename')
+
+# PROFILE 項目に保持しない属性（月別回数は USAGE# 項目で管理）
+PROFILE_EXCLUDED_PREFIXES = ('usage_',)
+
+_bootstrap_executor = ThreadPoolExecutor(max_workers=2)
+
+
+def dual_write_enabled():
+    """既存テーブルへの書き込み時にシングルテーブルへも書き込むか"""
+    return os.environ.get('SINGLE_TABLE_DUAL_WRITE', 'off') == 'on'
+
+
+def app_table():
+    """シングルテーブル取得"""
+    return get_table('app')
+
+
+def user_pk(user_id):
+    return f"USER#{user_id}"
+
+
+def usage_sk(month):
+    """month: YYYYMM"""
+    return f"{USAGE_PREFIX}{month}"
+
+
+def image_sk(created_at, image_id):
+    return f"{IMAGE_PREFIX}{created_at}#{image_id}"
+
+
+def payment_sk(created_at, payment_id):
+    return f"{PAYMENT_PREFIX}{created_at}#{payment_id}"
+
+
+def profile_item(user):
+    """users テーブルの項目から PROFILE 項目を作成"""
+    item = {k: v for k, v in user.items() if not k.startswith(PROFILE_EXCLUDED_PREFIXES)}
+    item.update({'PK': user_pk(user['user_id']), 'SK': PROFILE_SK})
+    return item
+
+
+def image_item(image):
+    """images テーブルの項目から IMG# 項目を作成"""
+    item = {k: image[k] for k in IMAGE_ATTRIBUTES if k in image}
+    item.update({
+        'PK': user_pk(image['user_id']),
+        'SK': image_sk(image.get('created_at', ''), image['image_id'])
+    })
+    return item
+
+
+def payment_item(payment):
+    """payment-history テーブルの項目から PAY# 項目を作成"""
+    item = dict(payment)
+    item.update({
+        'PK': user_pk(payment['userId']),
+        'SK': payment_sk(payment['createdAt'], payment.get('paymentId', ''))
+    })
+    return item
+
+
+def usage_items(user):
+    """users テーブルの usage_YYYYMM 属性から USAGE# 項目を作成"""
+    return [
+        {'PK': user_pk(user['user_id']), 'SK': usage_sk(name[len('usage_'):]), 'count': value}
+        for name, value in user.items() if name.startswith('usage_')
+    ]
+
+
+def _dual_write(description, func, *args, **kwargs):
+    if not dual_write_enabled():
+        return False
+    try:
+        func(*args, **kwargs)
+        return True
+    except Exception as e:
+        print(f"Single-table dual write failed ({description}): {str(e)}")
+        return False
+
+
+def put_profile(user):
+    """PROFILE 項目を保存（新規ユーザー作成時）"""
+    return _dual_write('profile', app_table().put_item, Item=profile_item(user))
+
+
+def update_profile(user_id, values, remove=()):
+    """
+    PROFILE 項目の属性を更新
+
+    Args:
+        values (dict): SET する属性
+        remove (iterable): REMOVE する属性
+    """
+    names = {}
+    expression_values = {}
+    set_parts = []
+    for i, (name, value) in enumerate(values.items()):
+        names[f'#a{i}'] = name
+        expression_values[f':v{i}'] = value
+        set_parts.append(f'#a{i} = :v{i}')
+    update_expression = 'SET ' + ', '.join(set_parts)
+    if remove:
+        remove_parts = []
+        for i, name in enumerate(remove):
+            names[f'#r{i}'] = name
+            remove_parts.append(f'#r{i}')
+        update_expression += ' REMOVE ' + ', '.join(remove_parts)
+
+    # 未移行ユーザーに不完全な PROFILE を作らない（移行ツールで全属性を作成）
+    return _dual_write(
+        'profile update', app_table().update_item,
+        Key={'PK': user_pk(user_id), 'SK': PROFILE_SK},
+        UpdateExpression=update_expression,
+        ConditionExpression='attribute_exists(PK)',
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=expression_values
+    )
+
+
+def add_usage(user_id, month, amount=1):
+    """USAGE#<month> の回数を加算"""
+    return _dual_write(
+        'usage', app_table().update_item,
+        Key={'PK': user_pk(user_id), 'SK': usage_sk(month)},
+        UpdateExpression='ADD #count :inc',
+        ExpressionAttributeNames={'#count': 'count'},
+        ExpressionAttributeValues={':inc': amount}
+    )
+
+
+def put_image(image):
+    """IMG# 項目を保存（images テーブルの全属性を渡してよい）"""
+    return _dual_write('image', app_table().put_item, Item=image_item(image))
+
+
+def put_payment(payment):
+    """PAY# 項目を保存"""
+    return _dual_write('payment', app_table().put_item, Item=payment_item(payment))
+
+
+def get_bootstrap(user_id, latest=DEFAULT_LATEST_ANALYSES, now=None):
+    """
+    アプリ起動時に必要なデータを取得
+
+    PROFILE と当月 USAGE# を1回の BatchGetItem、最新の解析履歴を1回の Query で
+    並行して取得する。
+
+    Returns:
+        dict: profile（未登録は None）, monthly_count, latest_analyses
+    """
+    pk = user_pk(user_id)
+    month = (now or get_jst_now()).strftime('%Y%m')
+
+    latest_future = None
+    if latest > 0:
+        latest_future = _bootstrap_executor.submit(
+            app_table().query,
+            KeyConditionExpression=Key('PK').eq(pk) & Key('SK').begins_with(IMAGE_PREFIX),
+            ScanIndexForward=False,
+            Limit=latest
+        )
+
+    app_table_name = table_name('app')
+    request = {app_table_name: {'Keys': [{'PK': pk, 'SK': PROFILE_SK}, {'PK': pk, 'SK': usage_sk(month)}]}}
+    items = []
+    while request:
+        response = get_resource('dynamodb').batch_get_item(RequestItems=request)
+        items.extend(response.get('Responses', {}).get(app_table_name, []))
+        request = response.get('UnprocessedKeys') or None
+
+    by_sk = {item['SK']: item for item in items}
+    profile = by_sk.get(PROFILE_SK)
+    usage = by_sk.get(usage_sk(month))
+
+    return {
+        'profile': profile,
+        'monthly_count': int(usage['count']) if usage else 0,
+        'latest_analyses': latest_future.result().get('Items', []) if latest_future else []
+    }
@@ -0,0 +1,152 @@
+"""
+ユーザー統計（シングルテーブルの STATS 項目）
+
+解析・決済の書き込み時に1回の UpdateItem（ADD）で集計値を更新し、
+統計の取得は GetItem 1回で済ませる（履歴・決済のクエリや件数集計は行わない）。
+
+解析種別・言語ごとの回数は入れ子のマップではなく 'analysis_type#<種別>' のような
+フラットな属性に ADD する（存在しないマップ配下への ADD はエラーになるため）。
+共有ID（emergency-user 等）はシャード項目に加算し、読み込み時に合計する。
+"""
+from decimal import Decimal
+
+from common import sharding, single_table
+from common.aws_clients import get_resource, table_name
+from common.jst import get_jst_isoformat
+
+STATS_SK = 'STATS'
+ANALYSIS_TYPE_PREFIX = 'analysis_type#'
+ANALYSIS_LANGUAGE_PREFIX = 'analysis_language#'
+
+# 集計対象の決済ステータス（Checkout は completed、PaymentIntent は succeeded）
+PAID_STATUSES = ('completed', 'succeeded')
+
+
+def stats_key(user_id):
+    return {'PK': single_table.user_pk(user_id), 'SK': STATS_SK}
+
+
+def _add_update(user_id, amounts):
+    """集計値を加算する UpdateItem 引数（共有IDはランダムな1シャード）"""
+    names = {}
+    values = {':updated': get_jst_isoformat()}
+    parts = []
+    for i, (attribute, amount) in enumerate(amounts.items()):
+        names[f'#a{i}'] = attribute
+        values[f':a{i}'] = amount
+        parts.append(f'#a{i} :a{i}')
+    return {
+        'Key': stats_key(sharding.write_key(user_id)),
+        'UpdateExpression': 'ADD ' + ', '.join(parts) + ' SET updated_at = :updated',
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values
+    }
+
+
+def _add(user_id, amounts):
+    single_table.app_table().update_item(**_add_update(user_id, amounts))
+
+
+def record_analysis(user_id, analysis_type=None, language=None):
+    """
+    解析1回分を加算（失敗しても解析結果の返却は妨げない）
+
+    Returns:
+        bool: 成功時 True
+    """
+    amounts = {'analysis_count': 1}
+    if analysis_type:
+        amounts[ANALYSIS_TYPE_PREFIX + analysis_type] = 1
+    if language:
+        amounts[ANALYSIS_LANGUAGE_PREFIX + language] = 1
+    try:
+        _add(user_id, amounts)
+        return True
+    except Exception as e:
+        print(f"Failed to record analysis stats for {user_id}: {str(e)}")
+        return False
+
+
+def _payment_amounts(amount):
+    return {'payment_count': 1, 'total_spent': Decimal(str(amount))}
+
+
+def record_payment(user_id, amount, status):
+    """
+    決済1件分を加算（支払い済みのみ）
+
+    Returns:
+        bool: 加算した場合 True
+    """
+    if status not in PAID_STATUSES:
+        return False
+    try:
+        _add(user_id, _payment_amounts(amount))
+        return True
+    except Exception as e:
+        print(f"Failed to record payment stats for {user_id}: {str(e)}")
+        return False
+
+
+def payment_transact_item(user_id, amount, status):
+    """
+    決済1件分の加算を TransactWriteItems の1要素として返す（支払い済み以外は None）
+
+    決済記録と同じトランザクションで加算するため、再送による二重加算が起きない。
+    """
+    if status not in PAID_STATUSES:
+        return None
+    update = _add_update(user_id, _payment_amounts(amount))
+    update['TableName'] = table_name('app')
+    return {'Update': update}
+
+
+def _load_items(user_id):
+    keys = [stats_key(user_id)]
+    if sharding.is_shared_identity(user_id):
+        keys += [stats_key(key) for key in sharding.shard_keys(user_id)]
+    if len(keys) == 1:
+        item = single_table.app_table().get_item(Key=keys[0]).get('Item')
+        return [item] if item else []
+
+    app_table_name = table_name('app')
+    items = []
+    request = {app_table_name: {'Keys': keys}}
+    while request:
+        response = get_resource('dynamodb').batch_get_item(RequestItems=request)
+        items.extend(response.get('Responses', {}).get(app_table_name, []))
+        request = response.get('UnprocessedKeys') or None
+    return items
+
+
+def get_stats(user_id):
+    """
+    ユーザー統計を取得
+
+    Returns:
+        dict: analysis_count, analysis_by_type, analysis_by_language, payment_count, total_spent, updated_at
+    """
+    stats = {
+        'analysis_count': 0,
+        'analysis_by_type': {},
+        'analysis_by_language': {},
+        'payment_count': 0,
+        'total_spent': 0,
+        'updated_at': None
+    }
+    for item in _load_items(user_id):
+        for name, value in item.items():
+            if name in ('analysis_count', 'payment_count'):
+                stats[name] += int(value)
+            elif name == 'total_spent':
+                stats[name] += value
+            elif name.startswith(ANALYSIS_TYPE_PREFIX):
+                key = name[len(ANALYSIS_TYPE_PREFIX):]
+                stats['analysis_by_type'][key] = stats['analysis_by_type'].get(key, 0) + int(value)
+            elif name.startswith(ANALYSIS_LANGUAGE_PREFIX):
+                key = name[len(ANALYSIS_LANGUAGE_PREFIX):]
+                stats['analysis_by_language'][key] = stats['analysis_by_language'].get(key, 0) + int(value)
+            elif name == 'updated_at':
+                stats['updated_at'] = max(stats['updated_at'] or value, value)
+    stats['total_spent'] = float(stats['total_spent'])
+    return stats
@@ -0,0 +1,364 @@
+"""
+解析使用回数の管理（無料プラン月間上限・プレミアム期限）
+
+auth / image-analysis の各関数はこのモジュールだけを使う。
+ユーザー項目は user_cache 経由で読み書きし（キャッシュ・DAX対応）、PlanState に詰めて判定する。
+
+月間使用回数はJSTの月ごとの属性（usage_YYYYMM）に記録するため、
+月替わりのリセット処理やテーブルスキャンは不要。
+共有ID（emergency-user 等）の回数はシャード項目に分散して記録し、読み込み時に合計する。
+"""
+import os
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from botocore.exceptions import ClientError
+
+from common import sharding, single_table, stats, user_cache
+from common.jst import get_jst_now, get_jst_isoformat
+
+MONTHLY_USAGE_PREFIX = 'usage_'
+
+# プレミアム期限の日付バケット（プレミアムユーザーのみ持つ属性 = スパースGSIのキー）
+PREMIUM_EXPIRY_BUCKET = 'premium_expiry_bucket'
+PREMIUM_EXPIRY_INDEX = 'premium-expiry-index'
+
+
+class PlanRules:
+    """プラン設定（コンテナ単位でキャッシュ）"""
+    __slots__ = ('free_monthly_limit', 'premium_types')
+
+    def __init__(self, free_monthly_limit, premium_types):
+        self.free_monthly_limit = free_monthly_limit
+        self.premium_types = premium_types
+
+
+@lru_cache(maxsize=1)
+def get_plan_rules():
+    """プラン設定取得（環境変数 FREE_MONTHLY_LIMIT で無料上限を変更可能）"""
+    return PlanRules(
+        free_monthly_limit=int(os.environ.get('FREE_MONTHLY_LIMIT', '5')),
+        premium_types=frozenset(('premium_7days', 'premium_20days'))
+    )
+
+
+def usage_month_attribute(now=None):
+    """当月（JST）の使用回数属性名 例: usage_202608"""
+    return MONTHLY_USAGE_PREFIX + (now or get_jst_now()).strftime('%Y%m')
+
+
+def monthly_usage_count(item, now=None):
+    """ユーザー項目から当月の使用回数を取得（当月の属性がなければ0）"""
+    return int((item or {}).get(usage_month_attribute(now), 0) or 0)
+
+
+class PlanState:
+    """
+    ユーザーのプラン状態（使用制限判定用の最小表現）
+
+    premium_expiry はJSTのnaive datetime（期限なしは None）
+    """
+    __slots__ = ('user_id', 'user_type', 'monthly_count', 'total_count', 'premium_expiry')
+
+    def __init__(self, user_id, user_type='free', monthly_count=0, total_count=0, premium_expiry=None):
+        self.user_id = user_id
+        self.user_type = user_type
+        self.monthly_count = monthly_count
+        self.total_count = total_count
+        self.premium_expiry = premium_expiry
+
+    @classmethod
+    def from_item(cls, user_id, item, now=None):
+        """DynamoDB項目から生成（項目なしは新規無料ユーザー扱い）"""
+        if not item:
+            return cls(user_id)
+        return cls(
+            user_id,
+            user_type=item.get('user_type') or 'free',
+            monthly_count=monthly_usage_count(item, now),
+            total_count=int(item.get('total_analysis_count', 0) or 0),
+            premium_expiry=parse_premium_expiry(item.get('premium_expiry'))
+        )
+
+    def is_premium(self, now=None):
+        """有効なプレミアムか（期限切れ・期限なしは False）"""
+        if self.user_type not in get_plan_rules().premium_types or self.premium_expiry is None:
+            return False
+        return (now or get_jst_now()) <= self.premium_expiry
+
+    def is_expired_premium(self, now=None):
+        """プレミアム種別のまま期限が過ぎているか"""
+        return (
+            self.user_type in get_plan_rules().premium_types
+            and self.premium_expiry is not None
+            and (now or get_jst_now()) > self.premium_expiry
+        )
+
+
+def parse_premium_expiry(value):
+    """
+    premium_expiry をJSTのnaive datetimeに正規化
+
+    grant_premium_access はJSTのnaive ISO文字列を書き込むが、
+    タイムゾーン付き（Z / +09:00）の値もJSTに揃えて比較する
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        expiry = value
+    else:
+        try:
+            expiry = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            print(f"Invalid premium_expiry: {value}")
+            return None
+    if expiry.tzinfo is not None:
+        expiry = (expiry - expiry.utcoffset()).replace(tzinfo=None) + timedelta(hours=9)
+    return expiry
+
+
+def premium_expiry_bucket(expiry):
+    """プレミアム期限（JST）の日付バケット 例: 2026-08-14"""
+    return parse_premium_expiry(expiry).strftime('%Y-%m-%d')
+
+
+def evaluate_usage(state, now=None):
+    """
+    プラン状態から使用可否を判定
+
+    Returns:
+        dict: allowed, remaining(-1は無制限), user_type, message など
+    """
+    now = now or get_jst_now()
+    rules = get_plan_rules()
+
+    if state.is_premium(now):
+        days_remaining = (state.premium_expiry - now).days
+        return {
+            'allowed': True,
+            'remaining': -1,  # -1 = unlimited
+            'user_type': state.user_type,
+            'message': f'プレミアムプラン利用中（残り{days_remaining}日）',
+            'days_remaining': days_remaining
+        }
+
+    limit = rules.free_monthly_limit
+    if state.monthly_count >= limit:
+        result = {
+            'allowed': False,
+            'remaining': 0,
+            'user_type': 'free',
+            'message': f'無料プランでは月{limit}回まで解析可能です。プレミアムプランにアップグレードしてください。',
+            'upgrade_required': True
+        }
+    else:
+        result = {
+            'allowed': True,
+            'remaining': limit - state.monthly_count,
+            'user_type': 'free',
+            'message': f'残り{limit - state.monthly_count}回利用可能です。'
+        }
+
+    if state.is_expired_premium(now):
+        result['premium_expired'] = True
+        result['message'] = 'プレミアムプランの期限が切れました。' + result['message']
+    return result
+
+
+def load_plan_state(user_id, create_if_missing=True):
+    """ユーザーのプラン状態を取得（キャッシュミス時は1回のGetItem、未登録なら作成）"""
+    now = get_jst_now()
+    item = user_cache.get_user(user_id)
+    if item is None and create_if_missing:
+        create_new_user(user_id)
+    state = PlanState.from_item(user_id, item, now)
+    if sharding.is_shared_identity(user_id):
+        add_shared_usage(state, now)
+    return state
+
+
+def shared_usage_counter(user_id):
+    """共有IDの使用回数カウンター（users テーブルの '<user_id>#<n>' 項目）"""
+    return sharding.ShardedCounter('users', 'user_id', user_id)
+
+
+def add_shared_usage(state, now):
+    """共有IDのシャード項目の回数を本体項目の回数に加算"""
+    month = usage_month_attribute(now)
+    totals = shared_usage_counter(state.user_id).read([month, 'total_analysis_count'])
+    state.monthly_count += totals[month]
+    state.total_count += totals['total_analysis_count']
+    return state
+
+
+def load_plan_states(user_ids):
+    """
+    複数ユーザーのプラン状態をまとめて取得（キャッシュミス分のみBatchGetItem）
+
+    Returns:
+        dict: user_id -> PlanState（未登録ユーザーは新規無料ユーザー扱い）
+    """
+    now = get_jst_now()
+    unique_ids = list(dict.fromkeys(user_ids))
+    items = user_cache.get_users(unique_ids)
+    states = {user_id: PlanState.from_item(user_id, items.get(user_id), now) for user_id in unique_ids}
+    for user_id, state in states.items():
+        if sharding.is_shared_identity(user_id):
+            add_shared_usage(state, now)
+    return states
+
+
+def check_usage_limit(user_id, user_type='free'):
+    """
+    ユーザーの解析使用制限をチェック
+
+    Args:
+        user_id (str): Cognito User ID
+        user_type (str): 互換用（判定は保存済みのuser_typeで行う）
+
+    Returns:
+        dict: 使用可否と残り回数
+    """
+    try:
+        # 期限切れプレミアムは無料として判定のみ行う（降格書き込みは premium-sweeper が実施）
+        return evaluate_usage(load_plan_state(user_id))
+    except Exception as e:
+        print(f"Usage check error: {str(e)}")
+        # エラー時は使用可能（安全側に倒す）
+        return {
+            'allowed': True,
+            'remaining': get_plan_rules().free_monthly_limit,
+            'user_type': 'free',
+            'message': 'システムエラー: 一時的に制限なしで利用可能'
+        }
+
+
+def increment_usage_count(user_id, analysis_type=None, language=None):
+    """解析使用回数を増加"""
+    return increment_and_check(user_id, analysis_type, language) is not None
+
+
+def increment_and_check(user_id, analysis_type=None, language=None):
+    """
+    解析使用回数を増加し、更新後の使用状況を返す（再読み込み不要）
+
+    ユーザー統計（STATS 項目）の解析回数も同時に加算する。
+
+    Args:
+        analysis_type (str): 解析種別（統計用、'store' / 'menu' など）
+        language (str): 解析言語（統計用）
+
+    Returns:
+        dict: check_usage_limit と同じ形式（失敗時は None）
+    """
+    try:
+        now = get_jst_now()
+        if sharding.is_shared_identity(user_id):
+            result = _increment_shared_usage(user_id, now)
+        else:
+            result = _increment_user_usage(user_id, now)
+        stats.record_analysis(user_id, analysis_type, language)
+        return result
+    except Exception as e:
+        print(f"Error incrementing usage for {user_id}: {e}")
+        return None
+
+
+def _increment_user_usage(user_id, now):
+    """ユーザー項目に加算し、更新後の値（ALL_NEW）で判定"""
+    response = user_cache.update_user(
+        user_id,
+        UpdateExpression='ADD #month :inc, total_analysis_count :inc SET updated_at = :updated',
+        ExpressionAttributeNames={'#month': usage_month_attribute(now)},
+        ExpressionAttributeValues={
+            ':inc': 1,
+            ':updated': get_jst_isoformat()
+        },
+        ReturnValues='ALL_NEW'
+    )
+    print(f"Usage count incremented for user: {user_id}")
+    single_table.add_usage(user_id, now.strftime('%Y%m'))
+    return evaluate_usage(PlanState.from_item(user_id, response.get('Attributes'), now), now)
+
+
+def _increment_shared_usage(user_id, now):
+    """共有IDはランダムな1シャードに加算し、全シャードの合計で判定"""
+    shard_key = shared_usage_counter(user_id).increment(
+        {usage_month_attribute(now): 1, 'total_analysis_count': 1},
+        extra_values={'updated_at': get_jst_isoformat()}
+    )
+    print(f"Usage count incremented for shared user: {shard_key}")
+    single_table.add_usage(shard_key, now.strftime('%Y%m'))
+    return evaluate_usage(load_plan_state(user_id), now)
+
+
+def create_new_user(user_id, email='', display_name='', auth_provider='cognito'):
+    """新規ユーザー作成"""
+    try:
+        timestamp = get_jst_isoformat()
+        item = {
+            'user_id': user_id,
+            'email': email,
+            'auth_provider': auth_provider,
+            'display_name': display_name,
+            'profile_picture': '',
+            'preferred_language': 'ja',
+            'user_type': 'free',
+            'premium_expiry': None,
+            'total_analysis_count': 0,
+            'last_login_at': timestamp,
+            'created_at': timestamp,
+            'updated_at': timestamp
+        }
+        user_cache.put_user(item)
+        single_table.put_profile(item)
+        print(f"New user created: {user_id}")
+        return item
+    except Exception as e:
+        print(f"Error creating new user: {e}")
+        return None
+
+
+def downgrade_to_free(user_id, expected_expiry=None):
+    """
+    期限切れプレミアムユーザーを無料ユーザーに降格
+
+    Args:
+        user_id (str): ユーザーID
+        expected_expiry (str): 指定時は premium_expiry が一致する場合のみ降格
+            （スイープ中に再購入・延長されたユーザーを降格しない）
+
+    Returns:
+        bool: 降格した場合 True
+    """
+    update_kwargs = {
+        'UpdateExpression': 'SET user_type = :type, premium_expiry = :expiry, updated_at = :updated REMOVE #bucket',
+        'ExpressionAttributeNames': {'#bucket': PREMIUM_EXPIRY_BUCKET},
+        'ExpressionAttributeValues': {
+            ':type': 'free',
+            ':expiry': None,
+            ':updated': get_jst_isoformat()
+        }
+    }
+    if expected_expiry is not None:
+        update_kwargs['ConditionExpression'] = 'premium_expiry = :expected'
+        update_kwargs['ExpressionAttributeValues'][':expected'] = expected_expiry
+
+    try:
+        user_cache.update_user(user_id, **update_kwargs)
+        single_table.update_profile(
+            user_id,
+            {'user_type': 'free', 'premium_expiry': None, 'updated_at': update_kwargs['ExpressionAttributeValues'][':updated']},
+            remove=(PREMIUM_EXPIRY_BUCKET,)
+        )
+        print(f"User downgraded to free: {user_id}")
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"Premium renewed, downgrade skipped: {user_id}")
+        else:
+            print(f"Error downgrading user: {e}")
+        return False
+    except Exception as e:
+        print(f"Error downgrading user: {e}")
+        return False
@@ -0,0 +1,331 @@
+"""
+users テーブルのリードスルー／ライトスルーキャッシュ
+
+ユーザー項目の読み込みは get_user / get_users、書き込みは put_user / update_user / delete_user を経由する。
+書き込み後は更新後の項目（ALL_NEW）でキャッシュを置き換え、失敗時は無効化する。
+
+USERS_CACHE_BACKEND:
+    off     キャッシュなし（既定）
+    memory  コンテナ内キャッシュ。他コンテナ・他関数の更新は TTL まで反映されない
+    redis   Redisプロトコル互換サーバー（USERS_CACHE_REDIS_URL、redis パッケージが必要）
+    dax     DAXクラスター（USERS_DAX_ENDPOINT、amazondax パッケージが必要）。
+            DAX自体がリードスルー／ライトスルーのため、テーブルハンドルを DAX に切り替える。
+            ヒット率は DAX の CloudWatch メトリクス（ItemCacheHits / ItemCacheMisses）で確認する
+"""
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from common.aws_clients import get_region, get_resource, get_table, table_name
+from common.metrics import emit_metrics
+
+USERS_TABLE = 'users'
+DEFAULT_TTL_SECONDS = 10
+DEFAULT_MAX_ITEMS = 1000
+BATCH_GET_LIMIT = 100
+
+_lock = threading.Lock()
+_backend = None
+_backend_loaded = False
+_dax = None
+_dax_loaded = False
+
+
+class MemoryBackend:
+    """コンテナ内 LRU キャッシュ（TTL付き）"""
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_items=DEFAULT_MAX_ITEMS):
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            expires_at, item = entry
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return copy.deepcopy(item)
+
+    def set(self, key, item):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(item))
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+
+def _encode(value):
+    if isinstance(value, Decimal):
+        return {'$decimal': str(value)}
+    raise TypeError(f"Object of type {type(value).__name__} is not cacheable")
+
+
+def _decode(value):
+    if set(value) == {'$decimal'}:
+        return Decimal(value['$decimal'])
+    return value
+
+
+class RedisBackend:
+    """Redisプロトコル互換サーバー（ElastiCache・ローカルRedis等、全コンテナで共有）"""
+
+    def __init__(self, url, ttl_seconds=DEFAULT_TTL_SECONDS, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key):
+        value = self.client.get(key)
+        return json.loads(value, object_hook=_decode) if value is not None else None
+
+    def set(self, key, item):
+        self.client.set(key, json.dumps(item, default=_encode), ex=self.ttl_seconds)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+
+def backend_name():
+    return os.environ.get('USERS_CACHE_BACKEND', 'off')
+
+
+def get_backend():
+    """キャッシュバックエンド取得（off / dax は None）"""
+    global _backend, _backend_loaded
+    if not _backend_loaded:
+        with _lock:
+            if not _backend_loaded:
+                _backend = _create_backend(backend_name())
+                _backend_loaded = True
+    return _backend
+
+
+def _create_backend(name):
+    ttl_seconds = int(os.environ.get('USERS_CACHE_TTL', DEFAULT_TTL_SECONDS))
+    if name == 'memory':
+        return MemoryBackend(ttl_seconds, int(os.environ.get('USERS_CACHE_MAX_ITEMS', DEFAULT_MAX_ITEMS)))
+    if name == 'redis':
+        try:
+            return RedisBackend(os.environ['USERS_CACHE_REDIS_URL'], ttl_seconds)
+        except (ImportError, KeyError) as e:
+            print(f"Redis user cache unavailable, falling back to memory: {str(e)}")
+            return MemoryBackend(ttl_seconds)
+    return None
+
+
+def set_backend(backend):
+    """バックエンドを差し替え（テスト・ローカル検証用）"""
+    global _backend, _backend_loaded
+    with _lock:
+        _backend = backend
+        _backend_loaded = True
+
+
+def reset_cache():
+    """キャッシュ・バックエンド設定を破棄（テスト用）"""
+    global _backend, _backend_loaded, _dax, _dax_loaded
+    with _lock:
+        _backend = None
+        _backend_loaded = False
+        _dax = None
+        _dax_loaded = False
+
+
+def _dax_resource():
+    """DAX リソース（未設定・パッケージ未導入時は None）"""
+    global _dax, _dax_loaded
+    if not _dax_loaded:
+        with _lock:
+            if not _dax_loaded:
+                try:
+                    from amazondax import AmazonDaxClient
+                    _dax = AmazonDaxClient.resource(
+                        endpoint_url=os.environ['USERS_DAX_ENDPOINT'], region_name=get_region()
+                    )
+                except (ImportError, KeyError) as e:
+                    print(f"DAX unavailable, reading users table directly: {str(e)}")
+                    _dax = None
+                _dax_loaded = True
+    return _dax
+
+
+def _dynamodb():
+    """読み書きに使う DynamoDB リソース（dax 設定時は DAX 経由）"""
+    if backend_name() == 'dax':
+        dax = _dax_resource()
+        if dax is not None:
+            return dax
+    return get_resource('dynamodb')
+
+
+def users_table():
+    """読み書きに使う users テーブルハンドル（dax 設定時は DAX 経由）"""
+    if backend_name() == 'dax' and _dax_resource() is not None:
+        return _dax_resource().Table(table_name(USERS_TABLE))
+    return get_table(USERS_TABLE)
+
+
+def _cache_key(user_id):
+    return f"{USERS_TABLE}:{user_id}"
+
+
+def _report(hits, misses):
+    emit_metrics({'CacheHit': hits, 'CacheMiss': misses}, {'Table': USERS_TABLE})
+
+
+def _cache_call(description, func, *args):
+    """キャッシュ障害はリクエストを失敗させない（DynamoDB を直接読む）"""
+    try:
+        return func(*args)
+    except Exception as e:
+        print(f"User cache {description} failed: {str(e)}")
+        return None
+
+
+def get_user(user_id):
+    """
+    ユーザー項目を取得（キャッシュ優先、ミス時は GetItem して保存）
+
+    Returns:
+        dict: ユーザー項目（未登録は None）
+    """
+    backend = get_backend()
+    if backend is not None:
+        item = _cache_call('get', backend.get, _cache_key(user_id))
+        if item is not None:
+            _report(1, 0)
+            return item
+        _report(0, 1)
+
+    item = users_table().get_item(Key={'user_id': user_id}).get('Item')
+    if item is not None and backend is not None:
+        _cache_call('set', backend.set, _cache_key(user_id), item)
+    return item
+
+
+def get_user_version(user_id, attributes):
+    """
+    バージョン判定用の属性だけを取得（キャッシュ優先、ミス時は ProjectionExpression 付き GetItem）
+
+    射影した項目はキャッシュに保存しない（get_user が部分項目を返さないように）。
+
+    Returns:
+        dict: 指定属性のみの項目（未登録は None）
+    """
+    backend = get_backend()
+    if backend is not None:
+        item = _cache_call('get', backend.get, _cache_key(user_id))
+        if item is not None:
+            _report(1, 0)
+            return {name: item[name] for name in attributes if name in item}
+        _report(0, 1)
+
+    names = {f"#a{index}": name for index, name in enumerate(attributes)}
+    return users_table().get_item(
+        Key={'user_id': user_id},
+        ProjectionExpression=', '.join(names),
+        ExpressionAttributeNames=names
+    ).get('Item')
+
+
+def get_users(user_ids):
+    """
+    複数ユーザーの項目を取得（キャッシュミス分のみ BatchGetItem）
+
+    Returns:
+        dict: user_id -> ユーザー項目（未登録ユーザーは含まない）
+    """
+    backend = get_backend()
+    unique_ids = list(dict.fromkeys(user_ids))
+    items = {}
+    if backend is not None and unique_ids:
+        for user_id in unique_ids:
+            item = _cache_call('get', backend.get, _cache_key(user_id))
+            if item is not None:
+                items[user_id] = item
+        _report(len(items), len(unique_ids) - len(items))
+
+    missing = [user_id for user_id in unique_ids if user_id not in items]
+    users_table_name = table_name(USERS_TABLE)
+    resource = _dynamodb()
+    for start in range(0, len(missing), BATCH_GET_LIMIT):
+        request = {
+            users_table_name: {'Keys': [{'user_id': user_id} for user_id in missing[start:start + BATCH_GET_LIMIT]]}
+        }
+        while request:
+            response = resource.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(users_table_name, []):
+                items[item['user_id']] = item
+                if backend is not None:
+                    _cache_call('set', backend.set, _cache_key(item['user_id']), item)
+            request = response.get('UnprocessedKeys') or None
+    return items
+
+
+def put_user(item):
+    """ユーザー項目を保存してキャッシュを置き換え"""
+    try:
+        users_table().put_item(Item=item)
+    except Exception:
+        invalidate_user(item['user_id'])
+        raise
+    backend = get_backend()
+    if backend is not None:
+        _cache_call('set', backend.set, _cache_key(item['user_id']), item)
+
+
+def update_user(user_id, **update_kwargs):
+    """
+    ユーザー項目を UpdateItem してキャッシュを更新後の項目で置き換え
+
+    update_kwargs は Key 以外の update_item 引数（ReturnValues の既定は ALL_NEW）。
+    失敗時（条件付き更新の不成立を含む）はキャッシュを無効化して例外をそのまま送出する。
+
+    Returns:
+        dict: update_item のレスポンス
+    """
+    update_kwargs.setdefault('ReturnValues', 'ALL_NEW')
+    try:
+        response = users_table().update_item(Key={'user_id': user_id}, **update_kwargs)
+    except Exception:
+        invalidate_user(user_id)
+        raise
+
+    backend = get_backend()
+    if backend is not None:
+        if update_kwargs['ReturnValues'] == 'ALL_NEW' and 'Attributes' in response:
+            _cache_call('set', backend.set, _cache_key(user_id), response['Attributes'])
+        else:
+            invalidate_user(user_id)
+    return response
+
+
+def delete_user(user_id):
+    """ユーザー項目を削除してキャッシュを無効化"""
+    try:
+        users_table().delete_item(Key={'user_id': user_id})
+    finally:
+        invalidate_user(user_id)
+
+
+def invalidate_user(user_id):
+    """キャッシュから削除"""
+    backend = get_backend()
+    if backend is not None:
+        _cache_call('delete', backend.delete, _cache_key(user_id))
@@ -0,0 +1,138 @@
+"""
+Webhookイベントの重複排除と後続処理の起動
+
+Stripe は応答が遅いと同じイベントを再送する。イベントIDを webhook-events テーブルへ
+条件付きPutItem（attribute_not_exists）で記録し、記録できた最初の1回だけ後続処理を起動する。
+Webhook 自体は記録後すぐに200を返し、決済記録・権限付与はワーカーで行う
+（再送が殺到しても各リクエストは条件付きPut 1回で終わる）。
+
+記録済みのイベントを重複として捨てるのは processed の場合のみ。received / failed、または
+ワーカーが止まったまま PROCESSING_TIMEOUT_SECONDS を過ぎた processing は、再送を機に
+後続処理を起動し直す（should_redispatch）。後続処理は同じ決済を二重に記録しない。
+
+項目: event_id, event_type, payload（イベント本文JSON）, status, created_at, updated_at, expires_at（TTL）
+status: received → processing → processed / failed
+
+後続処理の起動方法（WEBHOOK_DISPATCH）:
+    invoke  ワーカー関数（PAYMENT_WEBHOOK_FUNCTION）を非同期Invoke（既定）
+    inline  同じプロセスで即時実行（テスト・ローカル実行用）
+"""
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from botocore.exceptions import ClientError
+
+from common.aws_clients import get_client, get_table, table_name
+from common.jst import get_jst_isoformat, get_jst_now
+
+WEBHOOK_EVENTS_TABLE = 'webhook-events'
+# Stripe の再送期間（最大3日）より長く保持する
+EVENT_RETENTION_SECONDS = 7 * 24 * 3600
+# processing のまま更新がなければワーカーが止まったとみなす秒数（ワーカーのタイムアウト30秒より長く）
+PROCESSING_TIMEOUT_SECONDS = 120
+
+
+def dispatch_mode():
+    return os.environ.get('WEBHOOK_DISPATCH', 'invoke')
+
+
+def claim_event(event_id, event_type, payload):
+    """
+    イベントIDを記録（既に記録済みなら False）
+
+    Args:
+        payload (str): イベント本文（ワーカーはここから処理内容を読む）
+
+    Returns:
+        bool: 初回なら True
+    """
+    timestamp = get_jst_isoformat()
+    try:
+        get_table(WEBHOOK_EVENTS_TABLE).put_item(
+            Item={
+                'event_id': event_id,
+                'event_type': event_type,
+                'payload': payload,
+                'status': 'received',
+                'created_at': timestamp,
+                'updated_at': timestamp,
+                'expires_at': int(time.time()) + EVENT_RETENTION_SECONDS
+            },
+            ConditionExpression='attribute_not_exists(event_id)'
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def should_redispatch(record, now=None):
+    """
+    記録済みイベントの再送を受けたとき、後続処理を起動し直すか
+
+    Returns:
+        bool: received / failed、または processing のまま PROCESSING_TIMEOUT_SECONDS を過ぎていれば True
+    """
+    status = record.get('status')
+    if status in ('received', 'failed'):
+        return True
+    if status != 'processing':
+        return False
+    updated_at = datetime.fromisoformat(record['updated_at']).replace(tzinfo=None)
+    return (now or get_jst_now()) - updated_at > timedelta(seconds=PROCESSING_TIMEOUT_SECONDS)
+
+
+def release_event(event_id):
+    """記録を取り消す（後続処理を起動できなかった場合、Stripeの再送で再度受け付けるため）"""
+    get_table(WEBHOOK_EVENTS_TABLE).delete_item(Key={'event_id': event_id})
+
+
+def get_event(event_id):
+    return get_table(WEBHOOK_EVENTS_TABLE).get_item(Key={'event_id': event_id}).get('Item')
+
+
+def update_status(event_id, status, **values):
+    values.update({'status': status, 'updated_at': get_jst_isoformat()})
+    get_table(WEBHOOK_EVENTS_TABLE).update_item(
+        Key={'event_id': event_id},
+        UpdateExpression='SET ' + ', '.join(f'#a{i} = :v{i}' for i in range(len(values))),
+        ExpressionAttributeNames={f'#a{i}': name for i, name in enumerate(values)},
+        ExpressionAttributeValues={f':v{i}': value for i, value in enumerate(values.values())}
+    )
+
+
+def processed_transact_item(event_id):
+    """
+    processed への更新を TransactWriteItems の1要素として返す
+
+    後続処理の書き込みと同じトランザクションに含めると、処理済みのイベントを
+    再実行してもトランザクション全体が不成立になる。
+    """
+    return {'Update': {
+        'TableName': table_name(WEBHOOK_EVENTS_TABLE),
+        'Key': {'event_id': event_id},
+        'UpdateExpression': 'SET #status = :processed, updated_at = :updated',
+        'ConditionExpression': 'attribute_not_exists(#status) OR #status <> :processed',
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ExpressionAttributeValues': {':processed': 'processed', ':updated': get_jst_isoformat()}
+    }}
+
+
+def dispatch(event_id, process):
+    """
+    後続処理を起動
+
+    Args:
+        process (callable): inline のとき呼び出す処理（event_id を受け取る）
+    """
+    if dispatch_mode() == 'inline':
+        process(event_id)
+        return
+    get_client('lambda').invoke(
+        FunctionName=os.environ['PAYMENT_WEBHOOK_FUNCTION'],
+        InvocationType='Event',
+        Payload=json.dumps({'event_id': event_id}).encode('utf-8')
+    )
@@ -0,0 +1,78 @@
+"""
+premium_expiry_bucket の付与スクリプト（1回限り）
+
+premium-expiry-index 導入前にプレミアム権限を付与されたユーザーは
+premium_expiry_bucket を持たず、premium-sweeper の対象にならないため付与する。
+既に期限を過ぎているユーザーはバケットを付与せずその場で降格する
+（スイープは直近 PREMIUM_SWEEP_LOOKBACK_DAYS 日分のバケットしか確認しないため）。
+
+    python scripts/backfill_premium_expiry_bucket.py --stage dev [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/common/python'))
+
+from common.aws_clients import get_table
+from common.jst import get_jst_now
+from common.usage import PREMIUM_EXPIRY_BUCKET, downgrade_to_free, parse_premium_expiry, premium_expiry_bucket
+
+
+def backfill(dry_run=False, now=None):
+    """
+    premium_expiry があり premium_expiry_bucket がないユーザーに付与（期限切れは降格）
+
+    Returns:
+        dict: bucketed（付与件数）/ downgraded（降格件数）
+    """
+    now = now or get_jst_now()
+    table = get_table('users')
+    scan_kwargs = {
+        'ProjectionExpression': 'user_id, premium_expiry',
+        'FilterExpression': 'attribute_exists(premium_expiry) AND attribute_not_exists(#bucket)',
+        'ExpressionAttributeNames': {'#bucket': PREMIUM_EXPIRY_BUCKET}
+    }
+    result = {'bucketed': 0, 'downgraded': 0}
+    while True:
+        response = table.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            expiry = parse_premium_expiry(item.get('premium_expiry'))
+            if expiry is None:
+                continue
+            if expiry <= now:
+                if dry_run:
+                    print(f"[dry-run] {item['user_id']}: downgrade (expired {item['premium_expiry']})")
+                elif not downgrade_to_free(item['user_id'], item['premium_expiry']):
+                    continue
+                result['downgraded'] += 1
+                continue
+            bucket = premium_expiry_bucket(item['premium_expiry'])
+            if dry_run:
+                print(f"[dry-run] {item['user_id']}: {bucket}")
+            else:
+                table.update_item(
+                    Key={'user_id': item['user_id']},
+                    UpdateExpression='SET #bucket = :bucket',
+                    ConditionExpression='premium_expiry = :expiry',
+                    ExpressionAttributeNames={'#bucket': PREMIUM_EXPIRY_BUCKET},
+                    ExpressionAttributeValues={':bucket': bucket, ':expiry': item['premium_expiry']}
+                )
+            result['bucketed'] += 1
+        if 'LastEvaluatedKey' not in response:
+            return result
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--stage', default=os.environ.get('STAGE', 'dev'))
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+    os.environ['STAGE'] = args.stage
+
+    print(f"Backfill finished: {backfill(dry_run=args.dry_run)}")
+
+
+if __name__ == '__main__':
+    main()
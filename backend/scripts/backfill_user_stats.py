@@ -0,0 +1,107 @@
+"""
+ユーザー統計（STATS 項目）の再集計スクリプト
+
+images / payment-history テーブルを並列スキャンして集計し、STATS 項目を上書きする。
+STATS の書き込み時集計を導入する前のデータの取り込みと、ずれた集計値の修正に使う。
+集計元のテーブルから毎回計算し直すため、再実行すれば最新の状態に揃う。
+
+    python scripts/backfill_user_stats.py --stage dev [--segments 8] [--dry-run]
+"""
+import argparse
+import os
+import sys
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/common/python'))
+
+from common import single_table, stats
+from common.jst import get_jst_isoformat
+from common.scan import DEFAULT_SEGMENTS, parallel_scan
+
+
+def new_totals():
+    return defaultdict(int)
+
+
+def collect(segments=DEFAULT_SEGMENTS):
+    """
+    両テーブルを集計
+
+    Returns:
+        dict: パーティションキー（images の user_id はシャード化済みの値） -> 属性名 -> 合計
+    """
+    totals = defaultdict(new_totals)
+    lock = threading.Lock()
+
+    def handle_images(items, segment):
+        with lock:
+            for item in items:
+                if item.get('status') != 'analyzed' or not item.get('user_id'):
+                    continue
+                user = totals[item['user_id']]
+                user['analysis_count'] += 1
+                if item.get('analysis_type'):
+                    user[stats.ANALYSIS_TYPE_PREFIX + item['analysis_type']] += 1
+                if item.get('language'):
+                    user[stats.ANALYSIS_LANGUAGE_PREFIX + item['language']] += 1
+
+    def handle_payments(items, segment):
+        with lock:
+            for item in items:
+                if item.get('status') not in stats.PAID_STATUSES or not item.get('userId'):
+                    continue
+                user = totals[item['userId']]
+                user['payment_count'] += 1
+                user['total_spent'] += Decimal(str(item.get('amount', 0)))
+
+    parallel_scan(
+        'images', handle_images, total_segments=segments,
+        ProjectionExpression='user_id, #status, analysis_type, #lang',
+        ExpressionAttributeNames={'#status': 'status', '#lang': 'language'}
+    )
+    parallel_scan(
+        'payment-history', handle_payments, total_segments=segments,
+        ProjectionExpression='userId, #status, amount',
+        ExpressionAttributeNames={'#status': 'status'}
+    )
+    return totals
+
+
+def backfill(segments=DEFAULT_SEGMENTS, dry_run=False):
+    """
+    STATS 項目を上書き
+
+    Returns:
+        int: 書き込んだ項目数
+    """
+    totals = collect(segments)
+    timestamp = get_jst_isoformat()
+    if dry_run:
+        for key, values in totals.items():
+            print(f"[dry-run] {key}: {dict(values)}")
+        return len(totals)
+
+    with single_table.app_table().batch_writer(overwrite_by_pkeys=['PK', 'SK']) as batch:
+        for key, values in totals.items():
+            item = dict(stats.stats_key(key), updated_at=timestamp)
+            item.update(values)
+            batch.put_item(Item=item)
+    return len(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--stage', default=os.environ.get('STAGE', 'dev'))
+    parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+    os.environ['STAGE'] = args.stage
+
+    count = backfill(args.segments, args.dry_run)
+    print(f"STATS items written: {count}")
+
+
+if __name__ == '__main__':
+    main()
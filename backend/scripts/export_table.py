@@ -0,0 +1,169 @@
+"""
+DynamoDBテーブルの並列スキャン・エクスポート
+
+セグメントごとに gzip 圧縮JSONL（または Parquet、pyarrow が必要）へ書き出し、
+--output が s3://bucket/prefix の場合は完了後にS3へアップロードする。
+チェックポイント（<出力ディレクトリ>/_checkpoint.json）から中断位置を再開できる。
+再開時は中断直前の1ページが重複して出力されることがある（at-least-once）。
+
+    python scripts/export_table.py --stage dev --table users --output ./export \\
+        [--segments 16] [--workers 8] [--rcu-limit 50] [--format jsonl|parquet] [--resume]
+"""
+import argparse
+import base64
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/common/python'))
+
+from boto3.dynamodb.types import Binary
+
+from common.aws_clients import get_client
+from common.scan import DEFAULT_SEGMENTS, SEGMENT_DONE, parallel_scan
+
+TABLES = ('users', 'images', 'payment-history', 'app')
+CHECKPOINT_FILE = '_checkpoint.json'
+
+
+def to_json_value(value):
+    """DynamoDBの型をJSON互換に変換"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, Binary):
+        return base64.b64encode(value.value).decode()
+    if isinstance(value, set):
+        return sorted(to_json_value(v) for v in value)
+    if isinstance(value, dict):
+        return {k: to_json_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [to_json_value(v) for v in value]
+    return value
+
+
+class Checkpoint:
+    """セグメントごとの再開位置（ページ処理ごとにファイルへ保存）"""
+
+    def __init__(self, path, resume):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = {}
+        if resume and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.state = {int(k): v for k, v in json.load(f).items()}
+
+    def update(self, segment, last_key):
+        with self._lock:
+            self.state[segment] = to_json_value(last_key) if last_key != SEGMENT_DONE else SEGMENT_DONE
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f)
+            os.replace(temp_path, self.path)
+
+
+class JsonlWriter:
+    """セグメントごとの gzip JSONL（再開時は追記。gzipの複数メンバーとして読める）"""
+
+    def __init__(self, directory, table):
+        self.directory = directory
+        self.table = table
+
+    def write(self, items, segment):
+        path = os.path.join(self.directory, f"{self.table}-seg{segment:04d}.jsonl.gz")
+        with gzip.open(path, 'at', encoding='utf-8') as f:
+            for item in items:
+                f.write(json.dumps(to_json_value(item), ensure_ascii=False) + '\n')
+
+
+class ParquetWriter:
+    """ページごとの Parquet ファイル（pyarrow が必要）"""
+
+    def __init__(self, directory, table):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit('--format parquet requires pyarrow (pip install pyarrow)')
+        self.pyarrow = pyarrow
+        self.directory = directory
+        self.table = table
+        self._parts = {}
+        self._lock = threading.Lock()
+
+    def write(self, items, segment):
+        with self._lock:
+            part = self._parts.get(segment, 0)
+            self._parts[segment] = part + 1
+        rows = [to_json_value(item) for item in items]
+        # 属性が項目ごとに異なるため、ネストした値はJSON文字列として保存
+        rows = [{k: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v for k, v in row.items()}
+                for row in rows]
+        path = os.path.join(self.directory, f"{self.table}-seg{segment:04d}-part{part:05d}.parquet")
+        self.pyarrow.parquet.write_table(self.pyarrow.Table.from_pylist(rows), path, compression='zstd')
+
+
+def upload_directory(directory, s3_url):
+    """出力ファイルをS3へアップロード（マネージド転送でマルチパート）"""
+    bucket, _, prefix = s3_url[len('s3://'):].partition('/')
+    s3 = get_client('s3')
+    for name in sorted(os.listdir(directory)):
+        if name.startswith(CHECKPOINT_FILE):
+            continue
+        key = f"{prefix.rstrip('/')}/{name}" if prefix else name
+        s3.upload_file(os.path.join(directory, name), bucket, key)
+        print(f"Uploaded s3://{bucket}/{key}")
+
+
+def export(table, output, segments=DEFAULT_SEGMENTS, workers=None, rcu_limit=None, fmt='jsonl', resume=False):
+    """
+    テーブルをエクスポート
+
+    Returns:
+        int: 今回の実行で書き出した件数
+    """
+    to_s3 = output.startswith('s3://')
+    # S3出力時もローカルに書き出してからアップロード（再開用に固定ディレクトリを使う）
+    directory = os.path.join(tempfile.gettempdir(), f"export-{table}") if to_s3 else output
+    if not resume and os.path.isdir(directory) and to_s3:
+        shutil.rmtree(directory)
+    os.makedirs(directory, exist_ok=True)
+
+    checkpoint = Checkpoint(os.path.join(directory, CHECKPOINT_FILE), resume)
+    writer = ParquetWriter(directory, table) if fmt == 'parquet' else JsonlWriter(directory, table)
+
+    count = parallel_scan(
+        table, writer.write,
+        total_segments=segments, workers=workers,
+        checkpoint=checkpoint.state, on_checkpoint=checkpoint.update,
+        capacity_per_second=rcu_limit
+    )
+
+    if to_s3:
+        upload_directory(directory, output)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--stage', default=os.environ.get('STAGE', 'dev'))
+    parser.add_argument('--table', required=True, choices=TABLES)
+    parser.add_argument('--output', required=True, help='出力ディレクトリ または s3://bucket/prefix')
+    parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS)
+    parser.add_argument('--workers', type=int, help='ワーカー数（既定はセグメント数）')
+    parser.add_argument('--rcu-limit', type=float, default=50, help='全ワーカー合計の消費RCU/秒（0で無制限）')
+    parser.add_argument('--format', choices=('jsonl', 'parquet'), default='jsonl')
+    parser.add_argument('--resume', action='store_true', help='チェックポイントから再開')
+    args = parser.parse_args()
+    os.environ['STAGE'] = args.stage
+
+    count = export(args.table, args.output, args.segments, args.workers, args.rcu_limit or None, args.format, args.resume)
+    print(f"Exported {count} items from {args.table}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+月別使用回数（usage_YYYYMM）への移行スクリプト（1回限り）
+
+旧属性 monthly_analysis_count は月替わりでリセットされていなかったため、
+現在値を当月（JST）の usage_YYYYMM に引き継ぐ（当月の属性が既にあれば上書きしない）。
+--remove-legacy 指定時は移行済みユーザーの monthly_analysis_count を削除する。
+
+    python scripts/migrate_monthly_usage.py --stage dev [--dry-run] [--remove-legacy]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/common/python'))
+
+from botocore.exceptions import ClientError
+
+from common.aws_clients import get_table
+from common.jst import get_jst_isoformat
+from common.usage import usage_month_attribute
+
+LEGACY_ATTRIBUTE = 'monthly_analysis_count'
+
+
+def iter_legacy_users(table):
+    """旧属性を持つユーザーのみ取得（ページング）"""
+    scan_kwargs = {
+        'ProjectionExpression': 'user_id, #legacy',
+        'FilterExpression': 'attribute_exists(#legacy)',
+        'ExpressionAttributeNames': {'#legacy': LEGACY_ATTRIBUTE}
+    }
+    while True:
+        response = table.scan(**scan_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def migrate_user(table, item, month_attribute, remove_legacy):
+    """1ユーザー分を移行（当月の属性が未設定の場合のみ書き込み）"""
+    update_expression = 'SET #month = :count, updated_at = :updated'
+    if remove_legacy:
+        update_expression += ' REMOVE #legacy'
+    try:
+        table.update_item(
+            Key={'user_id': item['user_id']},
+            UpdateExpression=update_expression,
+            ConditionExpression='attribute_not_exists(#month)',
+            ExpressionAttributeNames={'#month': month_attribute, '#legacy': LEGACY_ATTRIBUTE} if remove_legacy
+            else {'#month': month_attribute},
+            ExpressionAttributeValues={
+                ':count': int(item.get(LEGACY_ATTRIBUTE, 0) or 0),
+                ':updated': get_jst_isoformat()
+            }
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        # 当月分は新方式で記録済み。旧属性の削除のみ行う
+        if remove_legacy:
+            table.update_item(
+                Key={'user_id': item['user_id']},
+                UpdateExpression='REMOVE #legacy',
+                ExpressionAttributeNames={'#legacy': LEGACY_ATTRIBUTE}
+            )
+        return False
+
+
+def migrate(remove_legacy=False, dry_run=False):
+    """
+    全ユーザーを移行
+
+    Returns:
+        dict: migrated, skipped 件数
+    """
+    table = get_table('users')
+    month_attribute = usage_month_attribute()
+    stats = {'migrated': 0, 'skipped': 0}
+
+    for item in iter_legacy_users(table):
+        if dry_run:
+            print(f"[dry-run] {item['user_id']}: {item.get(LEGACY_ATTRIBUTE)} -> {month_attribute}")
+            stats['migrated'] += 1
+            continue
+        if migrate_user(table, item, month_attribute, remove_legacy):
+            stats['migrated'] += 1
+        else:
+            stats['skipped'] += 1
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--stage', default=os.environ.get('STAGE', 'dev'))
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--remove-legacy', action='store_true', help='移行後に monthly_analysis_count を削除')
+    args = parser.parse_args()
+    os.environ['STAGE'] = args.stage
+
+    stats = migrate(remove_legacy=args.remove_legacy, dry_run=args.dry_run)
+    print(f"Migration finished: migrated={stats['migrated']} skipped={stats['skipped']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+既存テーブル（users / images / payment-history）からシングルテーブルへの移行スクリプト
+
+各テーブルを並列スキャンし、PROFILE / USAGE# / IMG# / PAY# 項目として書き込む。
+同じキーへの上書きになるため、再実行しても結果は変わらない（二重書き込み開始後に実行する）。
+
+    python scripts/migrate_to_single_table.py --stage dev [--segments 8] [--tables users images payment-history]
+"""
+import argparse
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/common/python'))
+
+from common import single_table
+from common.scan import DEFAULT_SEGMENTS, parallel_scan
+
+# 論理テーブル名 -> 項目変換
+CONVERTERS = {
+    'users': lambda item: [single_table.profile_item(item)] + single_table.usage_items(item),
+    'images': lambda item: [single_table.image_item(item)] if item.get('user_id') else [],
+    'payment-history': lambda item: [single_table.payment_item(item)] if item.get('createdAt') else [],
+}
+
+
+def migrate_table(name, segments=DEFAULT_SEGMENTS):
+    """
+    1テーブル分を移行
+
+    Returns:
+        dict: scanned, written 件数
+    """
+    convert = CONVERTERS[name]
+    written = [0]
+    lock = threading.Lock()
+
+    def handle_page(items, segment):
+        converted = [new_item for item in items for new_item in convert(item)]
+        # batch_writer はスレッド間で共有しない（ページごとに作成）
+        with single_table.app_table().batch_writer(overwrite_by_pkeys=['PK', 'SK']) as batch:
+            for new_item in converted:
+                batch.put_item(Item=new_item)
+        with lock:
+            written[0] += len(converted)
+
+    scanned = parallel_scan(name, handle_page, total_segments=segments)
+    return {'scanned': scanned, 'written': written[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--stage', default=os.environ.get('STAGE', 'dev'))
+    parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS)
+    parser.add_argument('--tables', nargs='+', default=list(CONVERTERS), choices=list(CONVERTERS))
+    args = parser.parse_args()
+    os.environ['STAGE'] = args.stage
+
+    for name in args.tables:
+        stats = migrate_table(name, args.segments)
+        print(f"{name}: scanned={stats['scanned']} written={stats['written']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+売上集計（REVENUE# 項目）の表示・再集計スクリプト
+
+既定では日次・月次のプラン別集計を表示する（決済履歴はスキャンしない）。
+--backfill は payment-history を並列スキャンして集計し直し、REVENUE# 項目を上書きする
+（書き込み時集計を導入する前のデータの取り込みと、ずれた集計値の修正用）。
+
+    python scripts/revenue_report.py --stage dev --monthly 2026-01 2026-10
+    python scripts/revenue_report.py --stage dev --daily 2026-10-01 2026-10-31
+    python scripts/revenue_report.py --stage dev --backfill [--segments 8] [--dry-run]
+"""
+import argparse
+import os
+import sys
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/common/python'))
+
+from common import revenue, single_table, stats
+from common.jst import get_jst_isoformat
+from common.scan import DEFAULT_SEGMENTS, parallel_scan
+
+
+def collect(segments=DEFAULT_SEGMENTS):
+    """
+    payment-history を集計
+
+    Returns:
+        dict: (PK, SK) -> period, plan_type, amount, count
+    """
+    totals = {}
+    lock = threading.Lock()
+
+    def add(pk, sk, period, plan_type, amount):
+        row = totals.setdefault((pk, sk), {'period': period, 'plan_type': plan_type, 'amount': Decimal(0), 'count': 0})
+        row['amount'] += amount
+        row['count'] += 1
+
+    def handle_payments(items, segment):
+        with lock:
+            for item in items:
+                if item.get('status') not in stats.PAID_STATUSES or not item.get('createdAt'):
+                    continue
+                day = item['createdAt'][:10]
+                plan_type = item.get('planType') or 'unknown'
+                amount = Decimal(str(item.get('amount', 0)))
+                add(revenue.revenue_pk(day[:7]), revenue.day_sk(day, plan_type), day, plan_type, amount)
+                add(revenue.revenue_pk(day[:7]), revenue.month_sk(plan_type), day[:7], plan_type, amount)
+
+    parallel_scan(
+        'payment-history', handle_payments, total_segments=segments,
+        ProjectionExpression='#status, amount, planType, createdAt',
+        ExpressionAttributeNames={'#status': 'status'}
+    )
+    return totals
+
+
+def backfill(segments=DEFAULT_SEGMENTS, dry_run=False):
+    """
+    REVENUE# 項目を上書き
+
+    Returns:
+        int: 書き込んだ項目数
+    """
+    totals = collect(segments)
+    timestamp = get_jst_isoformat()
+    if dry_run:
+        for (pk, sk), row in sorted(totals.items()):
+            print(f"[dry-run] {pk} {sk}: {row['count']} payments, {row['amount']}")
+        return len(totals)
+
+    with single_table.app_table().batch_writer(overwrite_by_pkeys=['PK', 'SK']) as batch:
+        for (pk, sk), row in totals.items():
+            batch.put_item(Item=dict(row, PK=pk, SK=sk, updated_at=timestamp))
+    return len(totals)
+
+
+def print_rows(rows):
+    by_period = defaultdict(list)
+    for row in rows:
+        by_period[row['period']].append(row)
+    for period, period_rows in sorted(by_period.items()):
+        total = sum(row['amount'] for row in period_rows)
+        count = sum(row['count'] for row in period_rows)
+        plans = ', '.join(f"{row['plan_type']}={row['amount']}({row['count']})" for row in period_rows)
+        print(f"{period}  {total:>10}  {count:>6}  {plans}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--stage', default=os.environ.get('STAGE', 'dev'))
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--daily', nargs=2, metavar=('FROM', 'TO'), help='YYYY-MM-DD YYYY-MM-DD')
+    group.add_argument('--monthly', nargs=2, metavar=('FROM', 'TO'), help='YYYY-MM YYYY-MM')
+    group.add_argument('--backfill', action='store_true')
+    parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+    os.environ['STAGE'] = args.stage
+
+    if args.backfill:
+        count = backfill(args.segments, args.dry_run)
+        print(f"REVENUE items written: {count}")
+    elif args.daily:
+        print_rows(revenue.get_daily_revenue(*args.daily))
+    else:
+        print_rows(revenue.get_monthly_revenue(*args.monthly))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,9 +4,16 @@ pytest設定・フィクスチャ定義
 import pytest
 import boto3
 import os
-from moto import mock_dynamodb
+import sys
+from moto import mock_dynamodb, mock_s3
 from unittest.mock import patch
 
+# Lambda共通レイヤー（本番では /opt/python）をインポート可能にする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/common/python'))
+
+from common.aws_clients import reset_clients
+from common.user_cache import reset_cache
+
 
 @pytest.fixture(scope="session")
 def aws_credentials():
@@ -16,6 +23,18 @@ def aws_credentials():
     os.environ["AWS_SECURITY_TOKEN"] = "testing"
     os.environ["AWS_SESSION_TOKEN"] = "testing"
     os.environ["AWS_DEFAULT_REGION"] = "ap-northeast-1"
+    # motoはaws-chunkedのチェックサム付きボディ（UploadPart等）を展開しないため必要時のみに限定
+    os.environ["AWS_REQUEST_CHECKSUM_CALCULATION"] = "when_required"
+
+
+@pytest.fixture(autouse=True)
+def reset_aws_client_pool():
+    """テスト間でAWSクライアントプール・ユーザーキャッシュを共有しない"""
+    reset_clients()
+    reset_cache()
+    yield
+    reset_clients()
+    reset_cache()
 
 
 @pytest.fixture(scope="function")
@@ -90,6 +109,92 @@ def create_test_tables(mock_dynamodb_fixture):
     }
 
 
+@pytest.fixture
+def mock_image_stack(aws_credentials, mock_environment):
+    """画像系テスト用: S3バケットとusers/images/app/payment-history/webhook-events/rate-limitsテーブル（STAGE=test）"""
+    with mock_dynamodb(), mock_s3(), patch.dict(os.environ, {"GOOGLE_GEMINI_API_KEY": "test"}):
+        s3 = boto3.client("s3", region_name="ap-northeast-1")
+        s3.create_bucket(
+            Bucket="ai-tourism-poc-images-test",
+            CreateBucketConfiguration={"LocationConstraint": "ap-northeast-1"}
+        )
+        dynamodb = boto3.resource("dynamodb", region_name="ap-northeast-1")
+        users_table = dynamodb.create_table(
+            TableName="ai-tourism-poc-users-test",
+            KeySchema=[{"AttributeName": "user_id", "KeyType": "HASH"}],
+            AttributeDefinitions=[
+                {"AttributeName": "user_id", "AttributeType": "S"},
+                {"AttributeName": "premium_expiry_bucket", "AttributeType": "S"}
+            ],
+            GlobalSecondaryIndexes=[{
+                "IndexName": "premium-expiry-index",
+                "KeySchema": [{"AttributeName": "premium_expiry_bucket", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "INCLUDE", "NonKeyAttributes": ["premium_expiry"]}
+            }],
+            BillingMode="PAY_PER_REQUEST"
+        )
+        images_table = dynamodb.create_table(
+            TableName="ai-tourism-poc-images-test",
+            KeySchema=[{"AttributeName": "image_id", "KeyType": "HASH"}],
+            AttributeDefinitions=[
+                {"AttributeName": "image_id", "AttributeType": "S"},
+                {"AttributeName": "user_id", "AttributeType": "S"},
+                {"AttributeName": "created_at", "AttributeType": "S"}
+            ],
+            GlobalSecondaryIndexes=[{
+                "IndexName": "user-created-index",
+                "KeySchema": [
+                    {"AttributeName": "user_id", "KeyType": "HASH"},
+                    {"AttributeName": "created_at", "KeyType": "RANGE"}
+                ],
+                "Projection": {
+                    "ProjectionType": "INCLUDE",
+                    "NonKeyAttributes": ["analysis_type", "language", "analysis_summary", "response_truncated",
+                                         "s3_url", "status", "original_filename"]
+                }
+            }],
+            BillingMode="PAY_PER_REQUEST"
+        )
+        app_table = dynamodb.create_table(
+            TableName="ai-tourism-poc-app-test",
+            KeySchema=[
+                {"AttributeName": "PK", "KeyType": "HASH"},
+                {"AttributeName": "SK", "KeyType": "RANGE"}
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "PK", "AttributeType": "S"},
+                {"AttributeName": "SK", "AttributeType": "S"}
+            ],
+            BillingMode="PAY_PER_REQUEST"
+        )
+        payments_table = dynamodb.create_table(
+            TableName="ai-tourism-poc-payment-history-test",
+            KeySchema=[
+                {"AttributeName": "userId", "KeyType": "HASH"},
+                {"AttributeName": "createdAt", "KeyType": "RANGE"}
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "userId", "AttributeType": "S"},
+                {"AttributeName": "createdAt", "AttributeType": "S"}
+            ],
+            BillingMode="PAY_PER_REQUEST"
+        )
+        webhook_events_table = dynamodb.create_table(
+            TableName="ai-tourism-poc-webhook-events-test",
+            KeySchema=[{"AttributeName": "event_id", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "event_id", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST"
+        )
+        rate_limits_table = dynamodb.create_table(
+            TableName="ai-tourism-poc-rate-limits-test",
+            KeySchema=[{"AttributeName": "limit_key", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "limit_key", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST"
+        )
+        yield {"s3": s3, "users": users_table, "images": images_table, "app": app_table, "payments": payments_table,
+               "webhook_events": webhook_events_table, "rate_limits": rate_limits_table}
+
+
 @pytest.fixture
 def sample_user_data():
     """サンプルユーザーデータ"""
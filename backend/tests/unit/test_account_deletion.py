@@ -0,0 +1,112 @@
+"""
+アカウント削除の単体テスト
+"""
+import os
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# テスト対象をインポート（handler.py は関数ごとに同名のためファイルパスから読み込む）
+import importlib.util
+
+spec = importlib.util.spec_from_file_location(
+    'user_management_handler_deletion',
+    os.path.join(os.path.dirname(__file__), '../../functions/user-management/handler.py')
+)
+user_management_handler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(user_management_handler)
+
+from common import account_deletion, image_store, single_table, stats
+
+BUCKET = 'ai-tourism-poc-images-test'
+
+
+def seed_user(stack, user_id='user-001', images=30, payments=40):
+    stack['users'].put_item(Item={'user_id': user_id, 'user_type': 'free'})
+    stack['users'].put_item(Item={'user_id': 'user-other', 'user_type': 'free'})
+    for i in range(images):
+        image_id = f'{user_id}-img-{i}'
+        stack['images'].put_item(Item={
+            'image_id': image_id, 'user_id': user_id, 'created_at': f'2025-08-01T00:00:{i:02d}+09:00'
+        })
+        stack['s3'].put_object(Bucket=BUCKET, Key=f'users/{user_id}/images/{i}.jpg', Body=b'x')
+        if i % 10 == 0:
+            stack['s3'].put_object(Bucket=BUCKET, Key=image_store.analysis_s3_key(image_id), Body=b'x')
+    # メタデータ保存に失敗した孤立オブジェクト
+    stack['s3'].put_object(Bucket=BUCKET, Key=f'users/{user_id}/images/orphan.jpg', Body=b'x')
+    stack['s3'].put_object(Bucket=BUCKET, Key='users/user-other/images/keep.jpg', Body=b'x')
+    for i in range(payments):
+        stack['payments'].put_item(Item={'userId': user_id, 'createdAt': f'2025-08-{i % 28 + 1:02d}T{i:02d}'})
+    stack['app'].put_item(Item={'PK': single_table.user_pk(user_id), 'SK': 'PROFILE'})
+    stats.record_analysis(user_id, 'store', 'ja')
+
+
+def s3_keys(stack):
+    return [obj['Key'] for obj in stack['s3'].list_objects_v2(Bucket=BUCKET).get('Contents', [])]
+
+
+class TestAccountDeletion:
+    """アカウント削除テストクラス"""
+
+    def test_deletes_everything(self, mock_image_stack):
+        """関連データ・S3オブジェクトを全て削除し、他ユーザーのデータは残す"""
+        seed_user(mock_image_stack)
+
+        result = account_deletion.delete_user_account('user-001')
+
+        assert result['complete'] is True
+        assert result['deleted']['images'] == 30
+        assert result['deleted']['payment-history'] == 40
+        assert s3_keys(mock_image_stack) == ['users/user-other/images/keep.jpg']
+        assert mock_image_stack['images'].scan()['Count'] == 0
+        assert mock_image_stack['payments'].scan()['Count'] == 0
+        assert mock_image_stack['app'].scan()['Count'] == 0
+        assert [item['user_id'] for item in mock_image_stack['users'].scan()['Items']] == ['user-other']
+
+    def test_resume_after_deadline(self, mock_image_stack):
+        """期限切れで中断しても users 項目は残り、再実行で完了する"""
+        seed_user(mock_image_stack)
+
+        paused = account_deletion.delete_user_account('user-001', deadline=time.time() - 1)
+
+        assert paused['complete'] is False
+        assert 'Item' in mock_image_stack['users'].get_item(Key={'user_id': 'user-001'})
+        assert account_deletion.delete_user_account('user-001')['complete'] is True
+        assert 'Item' not in mock_image_stack['users'].get_item(Key={'user_id': 'user-001'})
+
+    @patch('common.account_deletion.time.sleep')
+    def test_unprocessed_items_are_retried(self, mock_sleep):
+        """BatchWriteItem の未処理分は再送する"""
+        resource = MagicMock()
+        name = 'ai-tourism-poc-images-test'
+        leftover = [{'DeleteRequest': {'Key': {'image_id': 'b'}}}]
+        resource.batch_write_item.side_effect = [{'UnprocessedItems': {name: leftover}}, {'UnprocessedItems': {}}]
+
+        with patch.dict(os.environ, {'STAGE': 'test'}), \
+                patch.object(account_deletion, 'get_resource', return_value=resource):
+            account_deletion.batch_delete('images', [{'image_id': 'a'}, {'image_id': 'b'}])
+
+        assert resource.batch_write_item.call_args_list[1].kwargs['RequestItems'] == {name: leftover}
+        assert mock_sleep.call_count == 1
+
+    def test_shared_identity_is_rejected(self, mock_image_stack):
+        """共有IDは削除できない"""
+        with pytest.raises(ValueError):
+            account_deletion.delete_user_account('sapporo-guide')
+
+    def test_handler_returns_202_until_complete(self, mock_image_stack):
+        """Lambdaの残り時間が足りない場合は202を返す"""
+        seed_user(mock_image_stack, images=2, payments=2)
+        event = {'httpMethod': 'DELETE', 'pathParameters': {'proxy': 'user-001'}}
+        context = MagicMock()
+
+        context.get_remaining_time_in_millis.return_value = 1000
+        assert user_management_handler.main(event, context)['statusCode'] == 202
+
+        context.get_remaining_time_in_millis.return_value = 60000
+        response = user_management_handler.main(event, context)
+        assert response['statusCode'] == 200
+        assert json.loads(response['body'])['deleted']['users'] == 1
+        assert user_management_handler.main(event, context)['statusCode'] == 404
@@ -0,0 +1,107 @@
+"""
+アクティビティ記録（最終ログインの間引き・ライトビハインド）の単体テスト
+"""
+import os
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from common import activity, user_cache
+from common.jst import get_jst_now
+
+
+@pytest.fixture(autouse=True)
+def reset_activity():
+    activity.reset()
+    yield
+    activity.reset()
+
+
+def iso(value):
+    return value.isoformat() + '+09:00'
+
+
+def stored_login(stack, user_id):
+    return stack['users'].get_item(Key={'user_id': user_id})['Item'].get('last_login_at')
+
+
+@patch.dict(os.environ, {'ACTIVITY_GRANULARITY': '900'})
+class TestActivity:
+    """アクティビティ記録テストクラス"""
+
+    def test_coalesces_and_skips_recent_logins(self, mock_image_stack):
+        """同じユーザーの記録は1回の書き込みにまとめ、粒度内の再ログインはバッファに積まない"""
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'free'})
+        now = get_jst_now()
+
+        assert activity.touch('user-001', now=now - timedelta(seconds=5))
+        assert activity.touch('user-001', now=now)
+        assert activity.pending_count() == 1
+        assert activity.flush() == 1
+        assert stored_login(mock_image_stack, 'user-001') == iso(now)
+
+        assert activity.touch('user-001', now=now + timedelta(minutes=5)) is False
+        assert activity.touch('user-001', now=now + timedelta(minutes=20))
+
+    def test_skips_recent_stored_login(self, mock_image_stack):
+        """他のコンテナが粒度内に記録済みなら書き込まない"""
+        recent = iso(get_jst_now() - timedelta(minutes=1))
+        stale = iso(get_jst_now() - timedelta(hours=2))
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'last_login_at': recent})
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-002', 'last_login_at': stale})
+
+        for user_id in ('user-001', 'user-002', 'unknown-user'):
+            activity.touch(user_id)
+
+        assert activity.flush() == 1
+        assert stored_login(mock_image_stack, 'user-001') == recent
+        assert stored_login(mock_image_stack, 'user-002') > stale
+        assert 'Item' not in mock_image_stack['users'].get_item(Key={'user_id': 'unknown-user'})
+        # 記録済みと分かったユーザーは以降バッファに積まない
+        assert activity.touch('user-001') is False
+
+    def test_failed_write_is_requeued(self, mock_image_stack):
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001'})
+        activity.touch('user-001')
+
+        with patch.object(user_cache, 'update_user', side_effect=RuntimeError('throttled')):
+            assert activity.flush() == 0
+        assert activity.pending_count() == 1
+
+        assert activity.flush() == 1
+        assert activity.pending_count() == 0
+
+    def test_flush_is_bounded_by_timeout(self, mock_image_stack):
+        """待ち時間を超えた書き込みは待たずにバッファへ戻し、次の flush で書き込む"""
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001'})
+        activity.touch('user-001')
+        release = threading.Event()
+        update_user = user_cache.update_user
+
+        def slow_update(user_id, **kwargs):
+            release.wait(5)
+            return update_user(user_id, **kwargs)
+
+        with patch.dict(os.environ, {'ACTIVITY_FLUSH_TIMEOUT': '0.05'}), \
+                patch.object(user_cache, 'update_user', side_effect=slow_update):
+            started = time.monotonic()
+            assert activity.flush() == 0
+            assert time.monotonic() - started < 1
+            assert activity.pending_count() == 1
+            release.set()
+
+        assert activity.flush() in (0, 1)
+        assert activity.pending_count() == 0
+        assert stored_login(mock_image_stack, 'user-001')
+
+    def test_timeout_respects_remaining_time(self):
+        class Context:
+            def get_remaining_time_in_millis(self):
+                return 300
+
+        with patch.dict(os.environ, {'ACTIVITY_FLUSH_TIMEOUT': '0.5'}):
+            assert activity.flush_timeout() == 0.5
+            assert activity.flush_timeout(Context()) == pytest.approx(0.1)
@@ -0,0 +1,115 @@
+"""
+メール・パスワードログイン（IDトークンのクレーム利用・最終ログインの記録）の単体テスト
+"""
+import os
+import json
+import base64
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# テスト対象をインポート（handler.py は関数ごとに同名のためファイルパスから読み込む）
+import importlib.util
+
+spec = importlib.util.spec_from_file_location(
+    'auth_handler_login',
+    os.path.join(os.path.dirname(__file__), '../../functions/auth/handler.py')
+)
+auth_handler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(auth_handler)
+
+from common import activity, rate_limit
+from common.auth import decode_id_token
+
+CLIENT_ID = 'test-client-id'
+
+
+def make_id_token(**claims):
+    claims = dict({'token_use': 'id', 'aud': CLIENT_ID, 'sub': 'sub-001', 'cognito:username': 'user-001',
+                   'email': 'a@example.com', 'name': 'Taro'}, **claims)
+
+    def encode(value):
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+    return f"{encode({'alg': 'RS256'})}.{encode(claims)}.signature"
+
+
+def cognito_client():
+    client = MagicMock()
+    client.exceptions.NotAuthorizedException = type('NotAuthorizedException', (Exception,), {})
+    client.exceptions.UserNotConfirmedException = type('UserNotConfirmedException', (Exception,), {})
+    client.initiate_auth.return_value = {'AuthenticationResult': {
+        'AccessToken': 'access', 'IdToken': make_id_token(), 'RefreshToken': 'refresh'
+    }}
+    return client
+
+
+def login_request():
+    return {
+        'httpMethod': 'POST',
+        'pathParameters': {'proxy': 'login'},
+        'body': json.dumps({'email': 'A@example.com', 'password': 'secret'})
+    }
+
+
+@pytest.fixture(autouse=True)
+def reset_activity():
+    activity.reset()
+    rate_limit.reset()
+    yield
+    activity.reset()
+
+
+@patch.dict(os.environ, {'COGNITO_CLIENT_ID': CLIENT_ID})
+class TestLogin:
+    """ログインテストクラス"""
+
+    def test_login_uses_id_token_claims(self, mock_image_stack, sample_context):
+        """GetUser を呼ばずにIDトークンのクレームでユーザー情報を返す"""
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'free'})
+        client = cognito_client()
+
+        with patch.object(auth_handler, 'get_client', return_value=client):
+            response = auth_handler.main(login_request(), sample_context)
+
+        assert response['statusCode'] == 200
+        assert json.loads(response['body'])['user_info'] == {
+            'user_id': 'user-001', 'email': 'a@example.com', 'display_name': 'Taro'
+        }
+        assert client.initiate_auth.call_count == 1
+        client.get_user.assert_not_called()
+        user = mock_image_stack['users'].get_item(Key={'user_id': 'user-001'})['Item']
+        # 最終ログインは応答前に書き込み済み
+        assert 'last_login_at' in user
+
+    def test_last_login_failure_does_not_fail_login(self, mock_image_stack, sample_context):
+        """最終ログインの記録に失敗してもログインは成功"""
+        with patch.object(auth_handler, 'get_client', return_value=cognito_client()), \
+                patch.object(auth_handler.user_cache, 'update_user', side_effect=RuntimeError('throttled')):
+            response = auth_handler.main(login_request(), sample_context)
+
+        assert response['statusCode'] == 200
+
+    def test_invalid_credentials(self, mock_image_stack, sample_context):
+        client = cognito_client()
+        client.initiate_auth.side_effect = client.exceptions.NotAuthorizedException()
+
+        with patch.object(auth_handler, 'get_client', return_value=client):
+            response = auth_handler.main(login_request(), sample_context)
+
+        assert response['statusCode'] == 401
+
+
+class TestDecodeIdToken:
+    """IDトークンのクレーム取り出しテストクラス"""
+
+    def test_rejects_other_audience_and_access_token(self):
+        with pytest.raises(ValueError):
+            decode_id_token(make_id_token(aud='other-client'), CLIENT_ID)
+        with pytest.raises(ValueError):
+            decode_id_token(make_id_token(token_use='access'), CLIENT_ID)
+        with pytest.raises(ValueError):
+            decode_id_token('not-a-jwt', CLIENT_ID)
+
+    def test_falls_back_to_sub(self):
+        token = make_id_token(**{'cognito:username': None})
+        assert decode_id_token(token, CLIENT_ID)['user_id'] == 'sub-001'
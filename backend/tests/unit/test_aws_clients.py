@@ -0,0 +1,55 @@
+"""
+共通レイヤー AWSクライアントプールの単体テスト
+"""
+import threading
+import pytest
+from unittest.mock import patch
+
+from common import aws_clients
+
+
+class TestAwsClientPool:
+    """AWSクライアントプールテストクラス"""
+
+    def test_cold_get_client_returns(self, aws_credentials):
+        """初回get_clientがデッドロックせずに返る"""
+        result = {}
+        worker = threading.Thread(target=lambda: result.update(client=aws_clients.get_client('s3')))
+        worker.start()
+        worker.join(timeout=10)
+
+        assert not worker.is_alive()
+        assert result['client'].meta.service_model.service_name == 's3'
+
+    def test_clients_are_cached(self, aws_credentials):
+        """同じサービスのクライアント・リソースは再利用される"""
+        assert aws_clients.get_client('s3') is aws_clients.get_client('s3')
+        assert aws_clients.get_resource('dynamodb') is aws_clients.get_resource('dynamodb')
+        assert aws_clients.get_client('s3') is not aws_clients.get_client('dynamodb')
+
+    def test_get_table_uses_stage(self, aws_credentials, mock_environment):
+        """論理テーブル名からステージ付きの実テーブル名を解決する"""
+        table = aws_clients.get_table('users')
+
+        assert table.name == 'ai-tourism-poc-users-test'
+        assert aws_clients.get_table('users') is table
+
+    def test_reset_clients(self, aws_credentials):
+        """reset_clients後は新しいクライアントが生成される"""
+        client = aws_clients.get_client('s3')
+        aws_clients.reset_clients()
+
+        assert aws_clients.get_client('s3') is not client
+
+    def test_boto_config(self, aws_credentials):
+        """接続プール・タイムアウト・adaptiveリトライが設定されている"""
+        config = aws_clients.get_client('dynamodb').meta.config
+
+        assert config.max_pool_connections == aws_clients.BOTO_CONFIG.max_pool_connections
+        assert config.connect_timeout == aws_clients.BOTO_CONFIG.connect_timeout
+        assert config.retries['mode'] == 'adaptive'
+
+    def test_region_from_lambda_environment(self):
+        """Lambda実行環境のAWS_REGIONを優先する"""
+        with patch.dict('os.environ', {'AWS_REGION': 'us-west-2'}):
+            assert aws_clients.get_region() == 'us-west-2'
@@ -0,0 +1,89 @@
+"""
+シングルテーブル・/bootstrap の単体テスト
+"""
+import os
+import sys
+import json
+from unittest.mock import patch
+
+# テスト対象をインポート（handler.py は関数ごとに同名のためファイルパスから読み込む）
+import importlib.util
+
+spec = importlib.util.spec_from_file_location(
+    'bootstrap_handler',
+    os.path.join(os.path.dirname(__file__), '../../functions/bootstrap/handler.py')
+)
+bootstrap_handler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(bootstrap_handler)
+
+from common import image_store, single_table, usage
+
+
+def make_event(params=None):
+    return {
+        'httpMethod': 'GET',
+        'path': '/bootstrap',
+        'headers': {'Authorization': 'Bearer test-token'},
+        'queryStringParameters': params
+    }
+
+
+@patch.dict(os.environ, {'SINGLE_TABLE_DUAL_WRITE': 'on'})
+@patch.object(bootstrap_handler, 'get_user_from_token', return_value={'user_id': 'user-001'})
+class TestBootstrap:
+    """シングルテーブル・bootstrapテストクラス"""
+
+    def test_dual_write_and_bootstrap(self, mock_token, mock_image_stack, sample_context):
+        """既存処理の書き込みがシングルテーブルにも反映され、1リクエストで取得できる"""
+        usage.check_usage_limit('user-001')
+        for i in range(3):
+            metadata = image_store.save_image_metadata(
+                f'users/user-001/images/{i}.jpg', 'https://example.com', 'user-001', f'{i}.jpg', 'store', 'ja',
+                image_id=f'img-{i}'
+            )
+            image_store.update_image_with_analysis(metadata['image_id'], f'analysis {i}')
+            usage.increment_and_check('user-001')
+
+        body = json.loads(bootstrap_handler.main(make_event({'latest': '2'}), sample_context)['body'])
+
+        assert body['user']['user_id'] == 'user-001'
+        assert body['user']['monthly_analysis_count'] == 3
+        assert body['usage']['remaining'] == 2
+        assert body['premium']['active'] is False
+        assert len(body['latest_analyses']) == 2
+        assert body['latest_analyses'][0]['status'] == 'analyzed'
+        assert 'PK' not in body['latest_analyses'][0]
+
+    def test_falls_back_to_users_table(self, mock_token, mock_image_stack, sample_context):
+        """シングルテーブル未移行のユーザーは users テーブルから返す"""
+        mock_image_stack['users'].put_item(Item={
+            'user_id': 'user-001', 'user_type': 'free', usage.usage_month_attribute(): 4
+        })
+
+        body = json.loads(bootstrap_handler.main(make_event(), sample_context)['body'])
+
+        assert body['usage']['remaining'] == 1
+        assert body['latest_analyses'] == []
+
+    def test_migrate_to_single_table(self, mock_token, mock_image_stack, sample_context):
+        """並列スキャンで既存テーブルを移行する"""
+        sys.path.append(os.path.join(os.path.dirname(__file__), '../../scripts'))
+        import migrate_to_single_table
+
+        month = usage.usage_month_attribute()
+        for i in range(10):
+            mock_image_stack['users'].put_item(Item={'user_id': f'user-{i:03d}', 'user_type': 'free', month: i})
+            mock_image_stack['images'].put_item(Item={
+                'image_id': f'img-{i}', 'user_id': 'user-001', 'created_at': f'2025-08-{i + 1:02d}T00:00:00+09:00'
+            })
+
+        # motoはSegmentを無視して全件を返すため、件数の検証は1セグメントで行う
+        users = migrate_to_single_table.migrate_table('users', segments=1)
+        images = migrate_to_single_table.migrate_table('images', segments=1)
+
+        assert users == {'scanned': 10, 'written': 20}
+        assert images == {'scanned': 10, 'written': 10}
+        data = single_table.get_bootstrap('user-001', latest=20)
+        assert data['profile']['user_type'] == 'free'
+        assert data['monthly_count'] == 1
+        assert [item['image_id'] for item in data['latest_analyses']] == [f'img-{i}' for i in range(9, -1, -1)]
@@ -0,0 +1,115 @@
+"""
+個人データエクスポートの単体テスト
+"""
+import io
+import os
+import json
+import zipfile
+from unittest.mock import MagicMock, patch
+
+# テスト対象をインポート（handler.py は関数ごとに同名のためファイルパスから読み込む）
+import importlib.util
+
+spec = importlib.util.spec_from_file_location(
+    'data_export_handler',
+    os.path.join(os.path.dirname(__file__), '../../functions/data-export/handler.py')
+)
+data_export_handler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(data_export_handler)
+
+from common import account_export, image_store, stats
+
+BUCKET = 'ai-tourism-poc-images-test'
+
+
+def make_event(method, job_id=None):
+    return {
+        'httpMethod': method,
+        'headers': {'Authorization': 'Bearer test-token'},
+        'pathParameters': {'jobId': job_id} if job_id else None
+    }
+
+
+def seed_user(stack):
+    stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'free', 'email': 'a@example.com'})
+    for i in range(3):
+        image_id = f'img-{i}'
+        item = {'image_id': image_id, 'user_id': 'user-001', 'created_at': f'2025-08-0{i + 1}T00:00:00+09:00',
+                'analysis_type': 'store', 'language': 'ja'}
+        item.update(image_store.store_analysis_text(image_id, f'解析結果{i}' * 10, inline_limit=0 if i == 0 else None))
+        stack['images'].put_item(Item=item)
+    # 圧縮の効かない3MBの画像（合計がパートサイズ8MBを超え、複数パートになる）
+    for i in range(4):
+        stack['s3'].put_object(Bucket=BUCKET, Key=f'users/user-001/images/{i}.jpg', Body=os.urandom(3 * 1024 * 1024))
+    stack['payments'].put_item(Item={'userId': 'user-001', 'createdAt': '2025-08-01T00:00:00', 'amount': 500,
+                                     'status': 'completed'})
+    stats.record_payment('user-001', 500, 'completed')
+
+
+@patch.object(data_export_handler, 'get_user_from_token', return_value={'user_id': 'user-001'})
+class TestDataExport:
+    """データエクスポートテストクラス"""
+
+    def test_export_job(self, mock_token, mock_image_stack, sample_context):
+        """ジョブ開始 → ワーカー実行 → 署名付きURLを返す"""
+        seed_user(mock_image_stack)
+        lambda_client = MagicMock()
+
+        with patch.dict(os.environ, {'DATA_EXPORT_FUNCTION': 'export-worker'}), \
+                patch.object(data_export_handler, 'get_client', return_value=lambda_client):
+            started = data_export_handler.main(make_event('POST'), sample_context)
+            conflict = data_export_handler.main(make_event('POST'), sample_context)
+
+        assert started['statusCode'] == 202
+        assert conflict['statusCode'] == 409
+        payload = json.loads(lambda_client.invoke.call_args.kwargs['Payload'])
+        job_id = json.loads(started['body'])['job_id']
+        assert payload == {'user_id': 'user-001', 'job_id': job_id}
+
+        result = data_export_handler.worker(payload, sample_context)
+
+        assert result['status'] == 'ready'
+        assert result['size'] > account_export.EXPORT_PART_SIZE
+        body = json.loads(data_export_handler.main(make_event('GET', job_id), sample_context)['body'])
+        assert body['status'] == 'ready'
+        assert body['images'] == 4
+        assert BUCKET in body['download_url']
+
+        data = mock_image_stack['s3'].get_object(Bucket=BUCKET, Key=account_export.export_s3_key('user-001', job_id))['Body'].read()
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        assert archive.testzip() is None
+        assert sorted(archive.namelist()) == [
+            'analyses.jsonl', 'images/0.jpg', 'images/1.jpg', 'images/2.jpg', 'images/3.jpg',
+            'payments.jsonl', 'profile.json', 'stats.json'
+        ]
+        analyses = [json.loads(line) for line in archive.read('analyses.jsonl').decode().splitlines()]
+        assert sorted(a['analysis'] for a in analyses) == [f'解析結果{i}' * 10 for i in range(3)]
+        assert 'analysis_compressed' not in analyses[0]
+        assert json.loads(archive.read('stats.json'))['total_spent'] == 500.0
+        assert json.loads(archive.read('profile.json'))['email'] == 'a@example.com'
+
+    def test_previous_exports_are_not_included(self, mock_token, mock_image_stack, sample_context):
+        """過去のエクスポートファイルは画像として含めない"""
+        mock_image_stack['s3'].put_object(Bucket=BUCKET, Key='users/user-001/images/a.jpg', Body=b'jpg')
+        mock_image_stack['s3'].put_object(Bucket=BUCKET, Key=account_export.export_s3_key('user-001', 'old'), Body=b'zip')
+
+        assert list(account_export.iter_image_keys('user-001')) == [('users/user-001/images/a.jpg', 3)]
+
+    def test_failed_export_aborts_upload(self, mock_token, mock_image_stack, sample_context):
+        """失敗時はマルチパートアップロードを破棄してジョブを failed にする"""
+        data_export_handler.single_table.app_table().put_item(Item=dict(
+            data_export_handler.job_key('user-001', 'job-1'), job_id='job-1', status='pending', updated_at='x'
+        ))
+
+        with patch.object(account_export, 'iter_payments', side_effect=RuntimeError('boom')):
+            result = data_export_handler.worker({'user_id': 'user-001', 'job_id': 'job-1'}, sample_context)
+
+        assert result == {'status': 'failed'}
+        assert mock_image_stack['s3'].list_multipart_uploads(Bucket=BUCKET).get('Uploads', []) == []
+        body = json.loads(data_export_handler.main(make_event('GET', 'job-1'), sample_context)['body'])
+        assert body['status'] == 'failed'
+        assert body['error'] == 'boom'
+
+    def test_other_users_job_is_not_found(self, mock_token, mock_image_stack, sample_context):
+        """他ユーザーのジョブは参照できない"""
+        assert data_export_handler.main(make_event('GET', 'missing'), sample_context)['statusCode'] == 404
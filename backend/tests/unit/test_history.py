@@ -0,0 +1,124 @@
+"""
+解析履歴APIの単体テスト
+"""
+import json
+from unittest.mock import patch
+
+# テスト対象をインポート（handler.py は関数ごとに同名のためファイルパスから読み込む）
+import os
+import importlib.util
+
+spec = importlib.util.spec_from_file_location(
+    'history_handler',
+    os.path.join(os.path.dirname(__file__), '../../functions/history/handler.py')
+)
+history_handler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(history_handler)
+
+
+def make_event(params=None):
+    return {
+        'httpMethod': 'GET',
+        'path': '/history',
+        'headers': {'Authorization': 'Bearer test-token'},
+        'queryStringParameters': params
+    }
+
+
+def put_images(table, user_id, count):
+    for i in range(count):
+        table.put_item(Item={
+            'image_id': f'{user_id}-img-{i:02d}',
+            'user_id': user_id,
+            'created_at': f'2025-08-{i + 1:02d}T10:00:00+09:00',
+            's3_key': f'users/{user_id}/images/{i}.jpg',
+            'analysis_type': 'store',
+            'language': 'ja',
+            'status': 'analyzed',
+            'analysis_summary': f'summary {i}'
+        })
+
+
+@patch.object(history_handler, 'get_user_from_token', return_value={'user_id': 'user-001'})
+class TestHistory:
+    """解析履歴APIテストクラス"""
+
+    def test_newest_first(self, mock_token, mock_image_stack, sample_context):
+        """自分の履歴のみ新しい順に、一覧用の属性だけを返す"""
+        put_images(mock_image_stack['images'], 'user-001', 3)
+        put_images(mock_image_stack['images'], 'user-002', 3)
+
+        body = json.loads(history_handler.main(make_event(), sample_context)['body'])
+
+        assert [item['image_id'] for item in body['items']] == ['user-001-img-02', 'user-001-img-01', 'user-001-img-00']
+        assert 's3_key' not in body['items'][0]
+        assert body['next_cursor'] is None
+
+    def test_cursor_pagination(self, mock_token, mock_image_stack, sample_context):
+        """カーソルで全件を重複なくたどれる"""
+        put_images(mock_image_stack['images'], 'user-001', 5)
+
+        first = json.loads(history_handler.main(make_event({'limit': '3'}), sample_context)['body'])
+        second = json.loads(history_handler.main(
+            make_event({'limit': '3', 'cursor': first['next_cursor']}), sample_context
+        )['body'])
+
+        assert len(first['items']) == 3
+        assert len(second['items']) == 2
+        seen = {item['image_id'] for item in first['items'] + second['items']}
+        assert seen == {f'user-001-img-{i:02d}' for i in range(5)}
+        assert second['next_cursor'] is None
+
+    def test_rejects_foreign_cursor(self, mock_token, mock_image_stack, sample_context):
+        """他ユーザーのキーを含むカーソルは400"""
+        cursor = history_handler.encode_cursor({'user_id': 'user-002', 'created_at': 'x', 'image_id': 'y'})
+
+        response = history_handler.main(make_event({'cursor': cursor}), sample_context)
+
+        assert response['statusCode'] == 400
+
+    def test_invalid_cursor(self, mock_token, mock_image_stack, sample_context):
+        """デコードできないカーソルは400"""
+        response = history_handler.main(make_event({'cursor': '!!!'}), sample_context)
+
+        assert response['statusCode'] == 400
+
+    def test_detail_returns_full_text(self, mock_token, mock_image_stack, sample_context):
+        """保存済みの全文を復元して返す（項目内・S3の両方）"""
+        from common import image_store
+
+        long_text = '## 札幌時計台\n' + '歴史的建造物の解説。' * 400
+        for image_id, limit in (('inline-img', None), ('s3-img', 0)):
+            mock_image_stack['images'].put_item(Item={
+                'image_id': image_id, 'user_id': 'user-001', 'created_at': '2025-08-01T10:00:00+09:00'
+            })
+            with patch.object(image_store, 'ANALYSIS_INLINE_LIMIT', 100 * 1024 if limit is None else limit):
+                image_store.update_image_with_analysis(image_id, long_text)
+
+            response = history_handler.main(
+                dict(make_event(), pathParameters={'imageId': image_id}), sample_context
+            )
+            body = json.loads(response['body'])
+            assert body['analysis'] == long_text
+            assert body['full_text'] is True
+
+        inline_item = mock_image_stack['images'].get_item(Key={'image_id': 'inline-img'})['Item']
+        assert len(inline_item['analysis_compressed'].value) < len(long_text.encode('utf-8'))
+        s3_item = mock_image_stack['images'].get_item(Key={'image_id': 's3-img'})['Item']
+        assert s3_item['analysis_s3_key'] == 'analysis/s3-img.md.zlib'
+
+    def test_detail_legacy_and_foreign(self, mock_token, mock_image_stack, sample_context):
+        """全文未保存の旧データは要約を返し、他ユーザーの画像は404"""
+        mock_image_stack['images'].put_item(Item={
+            'image_id': 'legacy-img', 'user_id': 'user-001', 'analysis_summary': 'summary only'
+        })
+        mock_image_stack['images'].put_item(Item={'image_id': 'other-img', 'user_id': 'user-002'})
+
+        legacy = json.loads(history_handler.main(
+            dict(make_event(), pathParameters={'imageId': 'legacy-img'}), sample_context
+        )['body'])
+        foreign = history_handler.main(dict(make_event(), pathParameters={'imageId': 'other-img'}), sample_context)
+
+        assert legacy['analysis'] == 'summary only'
+        assert legacy['full_text'] is False
+        assert foreign['statusCode'] == 404
@@ -0,0 +1,123 @@
+"""
+user-info / check-usage の条件付きGET（ETag・If-None-Match → 304・Cache-Control）の単体テスト
+"""
+import os
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# テスト対象をインポート（handler.py は関数ごとに同名のためファイルパスから読み込む）
+import importlib.util
+
+spec = importlib.util.spec_from_file_location(
+    'auth_handler_http_cache',
+    os.path.join(os.path.dirname(__file__), '../../functions/auth/handler.py')
+)
+auth_handler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(auth_handler)
+
+from common import http_cache, user_cache
+
+
+def get_request(path, etag=None):
+    headers = {'Authorization': 'Bearer test-token'}
+    if etag:
+        headers['if-none-match'] = etag
+    return {'httpMethod': 'GET', 'pathParameters': {'proxy': path}, 'headers': headers}
+
+
+def seed_user(stack, updated_at='2026-10-01T09:00:00+09:00', **attributes):
+    stack['users'].put_item(Item=dict({
+        'user_id': 'user-001', 'email': 'a@example.com', 'user_type': 'free',
+        'total_analysis_count': 1, 'updated_at': updated_at
+    }, **attributes))
+
+
+@patch.object(auth_handler, 'get_user_from_token', return_value={'user_id': 'user-001'})
+class TestConditionalGet:
+    """条件付きGETテストクラス"""
+
+    def test_user_info_not_modified(self, mock_token, mock_image_stack, sample_context):
+        """同じ ETag なら本文なしの304、更新後は新しい ETag で200"""
+        seed_user(mock_image_stack)
+
+        first = auth_handler.main(get_request('user-info'), sample_context)
+        etag = first['headers']['ETag']
+        assert first['statusCode'] == 200
+        assert first['headers']['Cache-Control'] == f'private, max-age={auth_handler.USER_INFO_MAX_AGE}, must-revalidate'
+        assert first['headers']['Last-Modified'] == 'Thu, 01 Oct 2026 00:00:00 GMT'
+
+        with patch.object(user_cache, 'get_user') as mock_get_user:
+            second = auth_handler.main(get_request('user-info', etag), sample_context)
+        assert second['statusCode'] == 304
+        assert second['body'] == ''
+        assert second['headers']['ETag'] == etag
+        mock_get_user.assert_not_called()
+
+        seed_user(mock_image_stack, updated_at='2026-10-02T09:00:00+09:00')
+        third = auth_handler.main(get_request('user-info', etag), sample_context)
+        assert third['statusCode'] == 200
+        assert third['headers']['ETag'] != etag
+
+    def test_check_usage_not_modified(self, mock_token, mock_image_stack, sample_context):
+        """使用状況は判定処理を行わずに304"""
+        seed_user(mock_image_stack)
+        etag = auth_handler.main(get_request('check-usage'), sample_context)['headers']['ETag']
+
+        with patch.object(auth_handler, 'check_usage_limit') as mock_check:
+            response = auth_handler.main(get_request('check-usage', etag), sample_context)
+
+        assert response['statusCode'] == 304
+        mock_check.assert_not_called()
+        # 同じ項目でもエンドポイントごとに本文が違うため ETag は別
+        assert etag != auth_handler.main(get_request('user-info'), sample_context)['headers']['ETag']
+
+    def test_etag_changes_without_write(self, mock_token, mock_image_stack, sample_context):
+        """月替わり・プレミアム期限切れは書き込みなしで本文が変わるため ETag も変わる"""
+        seed_user(mock_image_stack, user_type='premium', premium_expiry='2026-10-20T00:00:00')
+
+        with patch.object(auth_handler, 'get_jst_now', return_value=datetime(2026, 10, 19, 12)):
+            before = auth_handler.user_version('usage', 'user-001')[0]
+        with patch.object(auth_handler, 'get_jst_now', return_value=datetime(2026, 10, 20, 12)):
+            expired = auth_handler.user_version('usage', 'user-001')[0]
+        with patch.object(auth_handler, 'get_jst_now', return_value=datetime(2026, 11, 1, 0)):
+            next_month = auth_handler.user_version('usage', 'user-001')[0]
+
+        assert len({before, expired, next_month}) == 3
+
+    def test_usage_etag_changes_with_days_remaining(self, mock_token, mock_image_stack, sample_context):
+        """プレミアムの「残りN日」は書き込みなしに毎日変わるため check-usage の ETag も変わる"""
+        seed_user(mock_image_stack, user_type='premium', premium_expiry='2026-10-30T00:00:00')
+
+        etags = {}
+        for hour in (1, 23, 24 + 1):
+            now = datetime(2026, 10, 19) + timedelta(hours=hour)
+            with patch.object(auth_handler, 'get_jst_now', return_value=now):
+                etags[hour] = auth_handler.user_version('usage', 'user-001')[0]
+
+        # 残り日数が同じ間は同じ ETag、日数が減ると変わる
+        assert etags[1] == etags[23]
+        assert etags[23] != etags[25]
+
+    def test_shared_identity_has_no_etag(self, mock_token, mock_image_stack, sample_context):
+        """共有IDは使用回数がシャード項目にあるため条件付きGETの対象外"""
+        with patch.dict(os.environ, {'SHARED_IDENTITIES': 'user-001'}):
+            seed_user(mock_image_stack)
+            assert auth_handler.user_version('usage', 'user-001') == (None, None)
+
+
+class TestHttpCache:
+    """ヘッダー処理テストクラス"""
+
+    def test_if_none_match_parsing(self):
+        etag = http_cache.make_etag('user-info', 'user-001', '2026-10-01')
+        assert etag.startswith('W/"')
+        for header in (etag, etag[2:], f'W/"other", {etag}', '*'):
+            assert http_cache.etag_matches({'headers': {'If-None-Match': header}}, etag)
+        assert not http_cache.etag_matches({'headers': {'If-None-Match': 'W/"other"'}}, etag)
+        assert not http_cache.etag_matches({'headers': None}, etag)
+
+    def test_version_read_is_projected(self, mock_image_stack):
+        """キャッシュなしのときは指定属性だけを読む"""
+        seed_user(mock_image_stack, preferred_language='en')
+        item = user_cache.get_user_version('user-001', auth_handler.VERSION_ATTRIBUTES)
+        assert set(item) == {'user_id', 'updated_at'}
@@ -0,0 +1,126 @@
+"""
+Checkout作成・価格カタログ・Stripe HTTPクライアントの単体テスト
+"""
+import os
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+import stripe
+
+# テスト対象をインポート（handler.py は関数ごとに同名のためファイルパスから読み込む）
+import importlib.util
+
+spec = importlib.util.spec_from_file_location(
+    'payment_handler_checkout',
+    os.path.join(os.path.dirname(__file__), '../../functions/payment/handler.py')
+)
+payment_handler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(payment_handler)
+
+from common.jst import get_jst_now
+from common.usage import parse_premium_expiry
+
+PRICE_ENV = {'STRIPE_PRICE_7DAYS': 'price_env_7', 'STRIPE_PRICE_20DAYS': 'price_env_20'}
+
+
+@pytest.fixture(autouse=True)
+def reset_price_catalog():
+    payment_handler.reset_price_catalog()
+    yield
+    payment_handler.reset_price_catalog()
+
+
+def stripe_prices():
+    return SimpleNamespace(data=[
+        SimpleNamespace(id='price_live_7', lookup_key='premium_7days', metadata={'premium_days': '8'},
+                        unit_amount=500, currency='jpy'),
+        SimpleNamespace(id='price_live_20', lookup_key='premium_20days', metadata={},
+                        unit_amount=1200, currency='jpy')
+    ])
+
+
+def checkout_request(plan_type='7days'):
+    return {
+        'httpMethod': 'POST',
+        'path': '/payment/create-checkout',
+        'body': json.dumps({'planType': plan_type, 'userId': 'user-001'})
+    }
+
+
+@patch.dict(os.environ, PRICE_ENV)
+class TestPriceCatalog:
+    """価格カタログテストクラス"""
+
+    def test_checkout_uses_cached_catalog(self, sample_context):
+        """2回目以降のCheckout作成ではStripeのPrice一覧を取得しない"""
+        session = SimpleNamespace(id='cs_test_001', url='https://checkout.stripe.com/cs_test_001')
+        with patch.object(stripe.Price, 'list', return_value=stripe_prices()) as mock_list, \
+                patch.object(stripe.checkout.Session, 'create', return_value=session) as mock_create:
+            responses = [payment_handler.main(checkout_request(), sample_context) for _ in range(3)]
+
+        assert [r['statusCode'] for r in responses] == [200] * 3
+        assert mock_list.call_count == 1
+        kwargs = mock_create.call_args.kwargs
+        assert kwargs['line_items'] == [{'price': 'price_live_7', 'quantity': 1}]
+        assert kwargs['metadata']['premium_days'] == '8'
+
+    def test_catalog_expires_after_ttl(self):
+        """TTL経過後は再取得する"""
+        with patch.object(stripe.Price, 'list', return_value=stripe_prices()) as mock_list:
+            payment_handler.get_price_catalog(now=0)
+            payment_handler.get_price_catalog(now=payment_handler.PRICE_CATALOG_TTL - 1)
+            catalog = payment_handler.get_price_catalog(now=payment_handler.PRICE_CATALOG_TTL)
+
+        assert mock_list.call_count == 2
+        assert catalog['20days'] == {'price_id': 'price_live_20', 'days': 20, 'amount': 1200, 'currency': 'jpy'}
+
+    def test_fallback_to_environment_prices(self):
+        """Stripeから取得できなければ環境変数のPrice IDを短期間キャッシュする"""
+        with patch.object(stripe.Price, 'list', side_effect=stripe.error.APIConnectionError('down')) as mock_list:
+            catalog = payment_handler.get_price_catalog(now=0)
+            payment_handler.get_price_catalog(now=payment_handler.PRICE_CATALOG_FALLBACK_TTL - 1)
+            payment_handler.get_price_catalog(now=payment_handler.PRICE_CATALOG_FALLBACK_TTL)
+
+        assert catalog == {'7days': {'price_id': 'price_env_7', 'days': 7},
+                           '20days': {'price_id': 'price_env_20', 'days': 20}}
+        assert mock_list.call_count == 2
+
+    def test_unknown_plan_is_rejected(self, sample_context):
+        """カタログにないプランは400"""
+        with patch.object(stripe.Price, 'list', return_value=stripe_prices()):
+            response = payment_handler.main(checkout_request('30days'), sample_context)
+
+        assert response['statusCode'] == 400
+
+    def test_grant_uses_purchase_days(self, mock_image_stack):
+        """Webhookでは購入時の日数（セッションのメタデータ）で付与する"""
+        with patch.object(stripe.Price, 'list', return_value=stripe_prices()):
+            payment_handler.record_payment_and_grant(
+                user_id='user-001', session_id='cs_test_001', payment_intent_id='pi_test_001',
+                plan_type='7days', amount=50000, status='completed', days='8'
+            )
+
+        user = mock_image_stack['users'].get_item(Key={'user_id': 'user-001'})['Item']
+        days = (parse_premium_expiry(user['premium_expiry']) - get_jst_now()).total_seconds() / 86400
+        assert 7.9 < days < 8.1
+
+
+class TestStripeHttpClient:
+    """Stripe HTTPクライアントテストクラス"""
+
+    def test_client_is_created_once_with_timeouts(self):
+        """HTTPクライアントはコンテナ単位で1回だけ作成し、タイムアウトとリトライを設定する"""
+        with patch.object(payment_handler, '_stripe', None), \
+                patch.object(payment_handler, 'create_stripe_http_client',
+                             wraps=payment_handler.create_stripe_http_client) as mock_create:
+            first = payment_handler.get_stripe()
+            second = payment_handler.get_stripe()
+
+        assert first is second
+        assert mock_create.call_count == 1
+        client = first.default_http_client
+        assert isinstance(client, stripe.RequestsClient)
+        assert client._timeout == (payment_handler.STRIPE_CONNECT_TIMEOUT, payment_handler.STRIPE_READ_TIMEOUT)
+        assert first.max_network_retries == payment_handler.STRIPE_MAX_NETWORK_RETRIES
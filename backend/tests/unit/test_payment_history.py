@@ -0,0 +1,148 @@
+"""
+決済履歴API・売上集計（REVENUE# 項目）の単体テスト
+"""
+import os
+import sys
+import json
+from unittest.mock import patch
+
+# テスト対象をインポート（handler.py は関数ごとに同名のためファイルパスから読み込む）
+import importlib.util
+
+spec = importlib.util.spec_from_file_location(
+    'payment_handler_history',
+    os.path.join(os.path.dirname(__file__), '../../functions/payment/handler.py')
+)
+payment_handler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(payment_handler)
+
+from common import revenue
+from common.jst import get_jst_now
+
+
+def history_request(**params):
+    return {
+        'httpMethod': 'GET',
+        'path': '/payment/history',
+        'headers': {'Authorization': 'Bearer test-token'},
+        'queryStringParameters': params or None
+    }
+
+
+def seed_payments(stack, user_id='user-001'):
+    for day in range(1, 8):
+        stack['payments'].put_item(Item={
+            'userId': user_id, 'createdAt': f'2026-10-{day:02d}T12:00:00+09:00',
+            'paymentId': f'cs_{day}', 'amount': 500, 'status': 'completed'
+        })
+
+
+def grant(user_id, session_id, plan_type='7days', amount=50000, status='completed'):
+    return payment_handler.record_payment_and_grant(
+        user_id=user_id, session_id=session_id, payment_intent_id='pi_test',
+        plan_type=plan_type, amount=amount, status=status, days=payment_handler.PLAN_DAYS[plan_type]
+    )
+
+
+@patch.object(payment_handler, 'get_user_from_token', return_value={'user_id': 'user-001'})
+class TestPaymentHistory:
+    """決済履歴APIテストクラス"""
+
+    def test_pages_with_cursor(self, mock_token, mock_image_stack, sample_context):
+        """新しい順にページ分割し、カーソルで続きを取得する"""
+        seed_payments(mock_image_stack)
+
+        first = json.loads(payment_handler.main(history_request(limit='4'), sample_context)['body'])
+        second = json.loads(payment_handler.main(
+            history_request(limit='4', cursor=first['next_cursor']), sample_context
+        )['body'])
+
+        # motoは ScanIndexForward=False のとき Limit を昇順で適用するため、ページ内の順序と全件の網羅を検証する
+        ids = [[item['paymentId'] for item in page['items']] for page in (first, second)]
+        assert [len(page) for page in ids] == [4, 3]
+        assert all(page == sorted(page, reverse=True) for page in ids)
+        assert sorted(ids[0] + ids[1]) == [f'cs_{day}' for day in range(1, 8)]
+        assert second['next_cursor'] is None
+        assert first['items'][0]['amount'] == 500
+
+    def test_date_range(self, mock_token, mock_image_stack, sample_context):
+        """from / to（日付のみの to はその日の終わりまで）で createdAt を絞り込む"""
+        seed_payments(mock_image_stack)
+
+        body = json.loads(payment_handler.main(
+            history_request(**{'from': '2026-10-03', 'to': '2026-10-05'}), sample_context
+        )['body'])
+
+        assert [item['paymentId'] for item in body['items']] == ['cs_5', 'cs_4', 'cs_3']
+
+    def test_invalid_parameters(self, mock_token, mock_image_stack, sample_context):
+        """他ユーザーのカーソル・不正な日付・逆転した範囲は400"""
+        other_cursor = payment_handler.encode_history_cursor({'userId': 'user-002', 'createdAt': '2026-10-01'})
+
+        for params in ({'cursor': other_cursor}, {'from': 'yesterday'}, {'from': '2026-10-05', 'to': '2026-10-01'}):
+            assert payment_handler.main(history_request(**params), sample_context)['statusCode'] == 400
+
+    def test_authentication_required(self, mock_token, mock_image_stack, sample_context):
+        mock_token.return_value = None
+        assert payment_handler.main(history_request(), sample_context)['statusCode'] == 401
+
+
+class TestRevenueRollup:
+    """売上集計テストクラス"""
+
+    def test_rollup_is_updated_with_payment(self, mock_image_stack):
+        """支払い済みの決済ごとに日次・月次のプラン別集計へ加算（再実行では加算しない）"""
+        grant('user-001', 'cs_1')
+        grant('user-002', 'cs_2')
+        grant('user-003', 'cs_3', plan_type='20days', amount=120000)
+        grant('user-001', 'cs_1')
+        grant('user-004', 'cs_4', status='pending')
+
+        today = get_jst_now().strftime('%Y-%m-%d')
+        daily = revenue.get_daily_revenue(today, today)
+        monthly = revenue.get_monthly_revenue(today[:7], today[:7])
+
+        assert daily == [
+            {'period': today, 'plan_type': '20days', 'amount': 1200, 'count': 1},
+            {'period': today, 'plan_type': '7days', 'amount': 1000, 'count': 2}
+        ]
+        assert [(row['period'], row['plan_type'], row['amount']) for row in monthly] == [
+            (today[:7], '20days', 1200), (today[:7], '7days', 1000)
+        ]
+
+    def test_daily_range_spans_months(self, mock_image_stack):
+        """日付範囲は月ごとのパーティションを順に読む"""
+        for created_at, plan_type in (('2026-09-30T10:00:00', '7days'), ('2026-10-01T10:00:00', '7days'),
+                                      ('2026-10-02T10:00:00', '20days'), ('2026-10-03T10:00:00', '7days')):
+            mock_image_stack['app'].meta.client.transact_write_items(
+                TransactItems=revenue.rollup_transact_items(plan_type, 500, 'completed', created_at)
+            )
+
+        rows = revenue.get_daily_revenue('2026-09-30', '2026-10-02')
+
+        assert [(row['period'], row['plan_type']) for row in rows] == [
+            ('2026-09-30', '7days'), ('2026-10-01', '7days'), ('2026-10-02', '20days')
+        ]
+        assert [row['count'] for row in revenue.get_monthly_revenue('2026-08', '2026-10')] == [1, 1, 2]
+
+    def test_backfill(self, mock_image_stack):
+        """既存の決済履歴から再集計する"""
+        sys.path.append(os.path.join(os.path.dirname(__file__), '../../scripts'))
+        import revenue_report
+
+        seed_payments(mock_image_stack)
+        mock_image_stack['payments'].put_item(Item={
+            'userId': 'user-002', 'createdAt': '2026-11-01T00:00:00+09:00', 'amount': 1200,
+            'planType': '20days', 'status': 'completed'
+        })
+        mock_image_stack['payments'].put_item(Item={
+            'userId': 'user-003', 'createdAt': '2026-11-01T00:00:00+09:00', 'amount': 500, 'status': 'pending'
+        })
+
+        # motoはSegmentを無視して全件を返すため、件数の検証は1セグメントで行う
+        assert revenue_report.backfill(segments=1) == 10
+
+        monthly = revenue.get_monthly_revenue('2026-10', '2026-11')
+        assert [(row['period'], row['plan_type'], row['amount'], row['count']) for row in monthly] == [
+            ('2026-10', 'unknown', 3500, 7), ('2026-11', '20days', 1200, 1)
+        ]
@@ -0,0 +1,231 @@
+"""
+Stripe Webhook（重複排除・後続処理）の単体テスト
+"""
+import os
+import json
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# テスト対象をインポート（handler.py は関数ごとに同名のためファイルパスから読み込む）
+import importlib.util
+
+spec = importlib.util.spec_from_file_location(
+    'payment_handler_webhook',
+    os.path.join(os.path.dirname(__file__), '../../functions/payment/handler.py')
+)
+payment_handler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(payment_handler)
+
+from common import stats, webhook_events
+from common.jst import get_jst_now
+from common.usage import parse_premium_expiry
+
+
+def webhook_request(event_id='evt_001', event_type='checkout.session.completed'):
+    body = {
+        'id': event_id,
+        'type': event_type,
+        'data': {'object': {
+            'id': 'cs_test_001',
+            'payment_intent': 'pi_test_001',
+            'amount_total': 50000,
+            'metadata': {'user_id': 'user-001', 'plan_type': '7days', 'premium_days': '7'}
+        }}
+    }
+    return {'httpMethod': 'POST', 'path': '/payment/webhook', 'headers': {}, 'body': json.dumps(body)}
+
+
+class TestPaymentWebhook:
+    """Webhookテストクラス"""
+
+    def test_replayed_event_is_processed_once(self, mock_image_stack, sample_context):
+        """同じイベントの再送は重複として受け付け、決済記録・権限付与は1回だけ"""
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'free'})
+
+        with patch.dict(os.environ, {'WEBHOOK_DISPATCH': 'inline'}):
+            responses = [payment_handler.main(webhook_request(), sample_context) for _ in range(5)]
+
+        assert [json.loads(r['body'])['status'] for r in responses] == ['accepted'] + ['duplicate'] * 4
+        assert mock_image_stack['payments'].scan()['Count'] == 1
+        user = mock_image_stack['users'].get_item(Key={'user_id': 'user-001'})['Item']
+        assert user['user_type'] == 'premium_7days'
+        assert webhook_events.get_event('evt_001')['status'] == 'processed'
+
+    def test_ack_before_processing(self, mock_image_stack, sample_context):
+        """invoke モードでは記録後にワーカーを非同期Invokeして即座に200を返す"""
+        lambda_client = MagicMock()
+
+        with patch.dict(os.environ, {'WEBHOOK_DISPATCH': 'invoke', 'PAYMENT_WEBHOOK_FUNCTION': 'webhook-worker'}), \
+                patch.object(webhook_events, 'get_client', return_value=lambda_client):
+            response = payment_handler.main(webhook_request(), sample_context)
+
+            assert response['statusCode'] == 200
+            assert lambda_client.invoke.call_count == 1
+            assert lambda_client.invoke.call_args.kwargs['InvocationType'] == 'Event'
+            assert mock_image_stack['payments'].scan()['Count'] == 0
+            assert webhook_events.get_event('evt_001')['status'] == 'received'
+
+            # ワーカー実行（Lambdaの非同期リトライで再実行されても処理済みなら何もしない）
+            payload = json.loads(lambda_client.invoke.call_args.kwargs['Payload'])
+            assert payment_handler.worker(payload, sample_context) == {'status': 'processed'}
+            assert payment_handler.worker(payload, sample_context) == {'status': 'processed'}
+            assert mock_image_stack['payments'].scan()['Count'] == 1
+
+            duplicate = payment_handler.main(webhook_request(), sample_context)
+        assert json.loads(duplicate['body'])['status'] == 'duplicate'
+        assert lambda_client.invoke.call_count == 1
+
+    @pytest.mark.parametrize('status', ['received', 'failed'])
+    def test_unprocessed_event_is_redispatched(self, status, mock_image_stack, sample_context):
+        """ワーカーが失敗・リトライ切れのイベントは再送を機に処理し直す"""
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'free'})
+        webhook_events.claim_event('evt_001', 'checkout.session.completed', webhook_request()['body'])
+        webhook_events.update_status('evt_001', status)
+
+        with patch.dict(os.environ, {'WEBHOOK_DISPATCH': 'inline'}):
+            response = payment_handler.main(webhook_request(), sample_context)
+
+        assert json.loads(response['body'])['status'] == 'redispatched'
+        assert webhook_events.get_event('evt_001')['status'] == 'processed'
+        assert mock_image_stack['users'].get_item(Key={'user_id': 'user-001'})['Item']['user_type'] == 'premium_7days'
+
+    def test_event_in_progress_is_retried_later(self, mock_image_stack, sample_context):
+        """ワーカーの処理中は503（Stripeの再送で確認）、処理中のまま止まっていれば処理し直す"""
+        webhook_events.claim_event('evt_001', 'checkout.session.completed', webhook_request()['body'])
+        webhook_events.update_status('evt_001', 'processing')
+        record = webhook_events.get_event('evt_001')
+
+        with patch.dict(os.environ, {'WEBHOOK_DISPATCH': 'inline'}):
+            response = payment_handler.main(webhook_request(), sample_context)
+
+        assert response['statusCode'] == 503
+        assert webhook_events.get_event('evt_001')['status'] == 'processing'
+        stalled_at = get_jst_now() + timedelta(seconds=webhook_events.PROCESSING_TIMEOUT_SECONDS + 1)
+        assert webhook_events.should_redispatch(record, now=stalled_at) is True
+
+    def test_dispatch_failure_releases_event(self, mock_image_stack, sample_context):
+        """ワーカーを起動できなければ記録を取り消して500（Stripeの再送で再受付）"""
+        lambda_client = MagicMock()
+        lambda_client.invoke.side_effect = RuntimeError('throttled')
+
+        with patch.dict(os.environ, {'WEBHOOK_DISPATCH': 'invoke', 'PAYMENT_WEBHOOK_FUNCTION': 'webhook-worker'}), \
+                patch.object(webhook_events, 'get_client', return_value=lambda_client):
+            response = payment_handler.main(webhook_request(), sample_context)
+
+        assert response['statusCode'] == 500
+        assert webhook_events.get_event('evt_001') is None
+
+    def test_worker_failure_is_recorded(self, mock_image_stack, sample_context):
+        """後続処理の失敗は failed として記録し、非同期リトライのため例外を送出"""
+        webhook_events.claim_event('evt_002', 'checkout.session.completed', webhook_request('evt_002')['body'])
+
+        with patch.object(payment_handler, 'record_payment_and_grant', side_effect=RuntimeError('boom')):
+            with pytest.raises(RuntimeError):
+                payment_handler.worker({'event_id': 'evt_002'}, sample_context)
+
+        record = webhook_events.get_event('evt_002')
+        assert record['status'] == 'failed'
+        assert record['error'] == 'boom'
+
+    def test_unhandled_event_type_is_ignored(self, mock_image_stack, sample_context):
+        """後続処理のないイベントは記録しない"""
+        response = payment_handler.main(webhook_request('evt_003', 'charge.refunded'), sample_context)
+
+        assert json.loads(response['body'])['status'] == 'ignored'
+        assert mock_image_stack['webhook_events'].scan()['Count'] == 0
+
+
+def grant(session_id='cs_test_001', plan_type='20days', event_id=None):
+    return payment_handler.record_payment_and_grant(
+        user_id='user-001', session_id=session_id, payment_intent_id='pi_test_001',
+        plan_type=plan_type, amount=50000, status='completed', days=payment_handler.PLAN_DAYS[plan_type],
+        event_id=event_id
+    )
+
+
+def expiry_days_from_now(stack):
+    user = stack['users'].get_item(Key={'user_id': 'user-001'})['Item']
+    return (parse_premium_expiry(user['premium_expiry']) - get_jst_now()).total_seconds() / 86400
+
+
+class TestPaymentTransaction:
+    """決済記録・権限付与トランザクションのテストクラス"""
+
+    def test_extends_active_premium(self, mock_image_stack):
+        """有効なプレミアムの残り期間に加算する"""
+        mock_image_stack['users'].put_item(Item={
+            'user_id': 'user-001', 'user_type': 'premium_7days',
+            'premium_expiry': (get_jst_now() + timedelta(days=3)).isoformat()
+        })
+
+        assert grant() is True
+
+        assert 22.9 < expiry_days_from_now(mock_image_stack) < 23.1
+        user = mock_image_stack['users'].get_item(Key={'user_id': 'user-001'})['Item']
+        assert user['user_type'] == 'premium_20days'
+        assert user['last_payment_id'] == 'cs_test_001'
+
+    def test_expired_premium_starts_from_now(self, mock_image_stack):
+        """期限切れのプレミアムは現在時刻から数える"""
+        mock_image_stack['users'].put_item(Item={
+            'user_id': 'user-001', 'user_type': 'premium_7days',
+            'premium_expiry': (get_jst_now() - timedelta(days=3)).isoformat()
+        })
+
+        grant(plan_type='7days')
+
+        assert 6.9 < expiry_days_from_now(mock_image_stack) < 7.1
+
+    def test_replay_is_not_applied_twice(self, mock_image_stack):
+        """同じ決済の再実行は記録・延長・統計の加算を行わない"""
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'free'})
+
+        assert grant() is True
+        assert grant() is False
+
+        assert mock_image_stack['payments'].scan()['Count'] == 1
+        assert 19.9 < expiry_days_from_now(mock_image_stack) < 20.1
+        assert stats.get_stats('user-001')['payment_count'] == 1
+
+    def test_older_session_replay_after_newer_purchase(self, mock_image_stack):
+        """新しい購入の後に古い決済が再実行されても二重に延長しない"""
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'free'})
+
+        assert grant('cs_old', '7days') is True
+        assert grant('cs_new', '7days') is True
+        assert grant('cs_old', '7days') is False
+
+        assert mock_image_stack['payments'].scan()['Count'] == 2
+        assert 13.9 < expiry_days_from_now(mock_image_stack) < 14.1
+        assert stats.get_stats('user-001')['payment_count'] == 2
+
+    def test_processed_event_cancels_transaction(self, mock_image_stack):
+        """Webhookイベントが処理済みならトランザクション全体が不成立"""
+        webhook_events.claim_event('evt_001', 'checkout.session.completed', '{}')
+        webhook_events.update_status('evt_001', 'processed')
+
+        with pytest.raises(RuntimeError):
+            grant(event_id='evt_001')
+
+        assert mock_image_stack['payments'].scan()['Count'] == 0
+        assert 'Item' not in mock_image_stack['users'].get_item(Key={'user_id': 'user-001'})
+
+    def test_concurrent_update_is_retried(self, mock_image_stack):
+        """読み込み後に期限が変わっていれば何も書かずに再読み込みしてやり直す"""
+        expiry = (get_jst_now() + timedelta(days=3)).isoformat()
+        mock_image_stack['users'].put_item(Item={
+            'user_id': 'user-001', 'user_type': 'premium_7days', 'premium_expiry': expiry
+        })
+        stale = {'Item': {'user_id': 'user-001', 'user_type': 'free'}}
+        current = mock_image_stack['users'].get_item(Key={'user_id': 'user-001'})
+        users = MagicMock()
+        users.get_item.side_effect = [stale, current]
+
+        with patch.object(payment_handler, 'get_table', return_value=users):
+            assert grant() is True
+
+        assert users.get_item.call_count == 2
+        assert mock_image_stack['payments'].scan()['Count'] == 1
+        assert 22.9 < expiry_days_from_now(mock_image_stack) < 23.1
@@ -0,0 +1,94 @@
+"""
+期限切れプレミアム一括降格（premium-sweeper）の単体テスト
+"""
+import sys
+from datetime import timedelta
+
+# テスト対象をインポート（handler.py は関数ごとに同名のためファイルパスから読み込む）
+import os
+import importlib.util
+
+spec = importlib.util.spec_from_file_location(
+    'premium_sweeper_handler',
+    os.path.join(os.path.dirname(__file__), '../../functions/premium-sweeper/handler.py')
+)
+premium_sweeper_handler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(premium_sweeper_handler)
+
+from common import usage
+from common.jst import get_jst_now
+
+
+def put_premium_user(table, user_id, expiry):
+    expiry_iso = expiry.isoformat()
+    table.put_item(Item={
+        'user_id': user_id,
+        'user_type': 'premium_7days',
+        'premium_expiry': expiry_iso,
+        'premium_expiry_bucket': usage.premium_expiry_bucket(expiry_iso)
+    })
+
+
+class TestPremiumSweeper:
+    """プレミアム期限スイープテストクラス"""
+
+    def test_sweeps_only_due_users(self, mock_image_stack):
+        """期限を過ぎたユーザーのみ降格し、インデックスから外す"""
+        now = get_jst_now()
+        users = mock_image_stack['users']
+        put_premium_user(users, 'expired-yesterday', now - timedelta(days=1))
+        put_premium_user(users, 'expired-today', now - timedelta(minutes=1))
+        put_premium_user(users, 'active', now + timedelta(days=3))
+        users.put_item(Item={'user_id': 'free-user', 'user_type': 'free'})
+
+        result = premium_sweeper_handler.sweep_expired_premium(now)
+
+        assert result == {'downgraded': 2, 'skipped': 0, 'incomplete': False}
+        expired = users.get_item(Key={'user_id': 'expired-yesterday'})['Item']
+        assert expired['user_type'] == 'free'
+        assert 'premium_expiry_bucket' not in expired
+        assert users.get_item(Key={'user_id': 'active'})['Item']['user_type'] == 'premium_7days'
+
+    def test_renewed_user_is_not_downgraded(self, mock_image_stack):
+        """スイープ対象取得後に期限が延長されたユーザーは降格しない"""
+        now = get_jst_now()
+        users = mock_image_stack['users']
+        old_expiry = (now - timedelta(hours=1)).isoformat()
+        put_premium_user(users, 'renewed', now - timedelta(hours=1))
+        users.update_item(
+            Key={'user_id': 'renewed'},
+            UpdateExpression='SET premium_expiry = :expiry',
+            ExpressionAttributeValues={':expiry': (now + timedelta(days=20)).isoformat()}
+        )
+
+        assert usage.downgrade_to_free('renewed', expected_expiry=old_expiry) is False
+        assert users.get_item(Key={'user_id': 'renewed'})['Item']['user_type'] == 'premium_7days'
+
+    def test_usage_check_does_not_write(self, mock_image_stack):
+        """使用制限チェックは期限切れを無料扱いするだけで降格書き込みはしない"""
+        now = get_jst_now()
+        put_premium_user(mock_image_stack['users'], 'expired', now - timedelta(days=1))
+
+        result = usage.check_usage_limit('expired')
+
+        assert result['user_type'] == 'free'
+        assert result['premium_expired'] is True
+        assert mock_image_stack['users'].get_item(Key={'user_id': 'expired'})['Item']['user_type'] == 'premium_7days'
+
+    def test_backfill_downgrades_long_expired_users(self, mock_image_stack):
+        """バケット未付与のうち期限切れはその場で降格し、有効なユーザーにのみバケットを付与"""
+        sys.path.append(os.path.join(os.path.dirname(__file__), '../../scripts'))
+        import backfill_premium_expiry_bucket
+
+        now = get_jst_now()
+        users = mock_image_stack['users']
+        for user_id, expiry in (('expired-long-ago', now - timedelta(days=60)), ('active', now + timedelta(days=3))):
+            users.put_item(Item={'user_id': user_id, 'user_type': 'premium_7days', 'premium_expiry': expiry.isoformat()})
+
+        assert backfill_premium_expiry_bucket.backfill(now=now) == {'bucketed': 1, 'downgraded': 1}
+
+        expired = users.get_item(Key={'user_id': 'expired-long-ago'})['Item']
+        assert expired['user_type'] == 'free'
+        assert 'premium_expiry_bucket' not in expired
+        active = users.get_item(Key={'user_id': 'active'})['Item']
+        assert active['premium_expiry_bucket'] == usage.premium_expiry_bucket(active['premium_expiry'])
@@ -0,0 +1,110 @@
+"""
+認証系エンドポイントのレート制限（メモリ層トークンバケット・DynamoDB共有層）の単体テスト
+"""
+import os
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# テスト対象をインポート（handler.py は関数ごとに同名のためファイルパスから読み込む）
+import importlib.util
+
+spec = importlib.util.spec_from_file_location(
+    'auth_handler_rate_limit',
+    os.path.join(os.path.dirname(__file__), '../../functions/auth/handler.py')
+)
+auth_handler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(auth_handler)
+
+from common import rate_limit
+
+NOW = 1_800_000_000.0
+
+
+@pytest.fixture(autouse=True)
+def reset_limits():
+    rate_limit.reset()
+    yield
+    rate_limit.reset()
+
+
+def auth_request(path, email='a@example.com', ip='203.0.113.1'):
+    return {
+        'httpMethod': 'POST',
+        'pathParameters': {'proxy': path},
+        'requestContext': {'identity': {'sourceIp': ip}},
+        'body': json.dumps({'email': email, 'password': 'secret'})
+    }
+
+
+@patch.dict(os.environ, {'RATE_LIMIT_BACKEND': 'memory'})
+class TestRateLimitedEndpoints:
+    """エンドポイントのレート制限テストクラス"""
+
+    def test_returns_429_before_cognito(self, sample_context):
+        """上限を超えたら Cognito を呼ばずに Retry-After 付きの429を返す"""
+        client = MagicMock()
+        client.resend_confirmation_code.return_value = {}
+
+        with patch.object(auth_handler, 'get_client', return_value=client):
+            responses = [auth_handler.main(auth_request('resend-code'), sample_context) for _ in range(4)]
+
+        assert [response['statusCode'] for response in responses] == [200, 200, 200, 429]
+        assert int(responses[-1]['headers']['Retry-After']) > 0
+        assert client.resend_confirmation_code.call_count == 3
+
+    def test_ip_limit_spans_emails(self, sample_context):
+        """同じIPからのメールアドレスを変えた試行もまとめて制限"""
+        client = MagicMock()
+        with patch.object(auth_handler, 'get_client', return_value=client):
+            codes = [auth_handler.main(auth_request('signup', email=f'u{index}@example.com'), sample_context)['statusCode']
+                     for index in range(11)]
+
+        assert codes[-1] == 429
+        assert 429 not in codes[:10]
+
+    def test_other_endpoints_are_not_limited(self):
+        assert rate_limit.check('user-info', {'ip': '203.0.113.1'}) is None
+
+
+class TestSharedTier:
+    """DynamoDB共有層テストクラス"""
+
+    def test_limit_is_shared_between_containers(self, mock_image_stack):
+        """コンテナ内の状態がなくても共有層のカウントで制限（超過後は同じコンテナ内で即拒否）"""
+        identities = {'email': 'a@example.com'}
+        for _ in range(3):
+            rate_limit.reset()  # 別コンテナからのリクエストを想定
+            assert rate_limit.check('signup', identities, now=NOW) is None
+
+        rate_limit.reset()
+        assert rate_limit.check('signup', identities, now=NOW) > 0
+
+        with patch.object(rate_limit, 'get_table') as mock_get_table:
+            assert rate_limit.check('signup', identities, now=NOW + 1) > 0
+        mock_get_table.assert_not_called()
+
+        # メールアドレスはハッシュで保存
+        items = mock_image_stack['rate_limits'].scan()['Items']
+        assert len(items) == 1 and 'a@example.com' not in items[0]['limit_key']
+        assert items[0]['expires_at'] > NOW
+
+    def test_sliding_window_weights_previous_window(self, mock_image_stack):
+        """直前のウィンドウの件数は経過割合で減衰する"""
+        window_start = (NOW // 3600 + 1) * 3600
+        identities = {'ip': '203.0.113.9'}
+        for _ in range(10):
+            rate_limit.reset()
+            assert rate_limit.check('signup', identities, now=window_start - 10) is None
+
+        # 次のウィンドウの序盤は直前の10件がほぼ残っている
+        rate_limit.reset()
+        assert rate_limit.check('signup', identities, now=window_start + 60) is not None
+        # 終盤には直前の件数の重みが下がって通る
+        rate_limit.reset()
+        assert rate_limit.check('signup', identities, now=window_start + 3300) is None
+
+    def test_fails_open_when_table_is_unavailable(self):
+        with patch.object(rate_limit, 'get_table', side_effect=RuntimeError('unavailable')):
+            assert rate_limit.check('login', {'email': 'a@example.com'}, now=NOW) is None
@@ -0,0 +1,133 @@
+"""
+共通ルーター・ミドルウェア（common.router）の単体テスト
+"""
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from common.router import ANY, HttpError, Router, last_path_segment, path_parameter
+
+
+def ok(event, headers):
+    return {'statusCode': 200, 'headers': headers, 'body': json.dumps({'params': event.params})}
+
+
+def request(method='GET', proxy='', **extra):
+    return dict({'httpMethod': method, 'pathParameters': {'proxy': proxy}}, **extra)
+
+
+class TestRouting:
+    """振り分けテストクラス"""
+
+    def test_static_and_parameter_routes(self):
+        router = Router('test')
+        router.add('GET', 'users', ok)
+        router.add('GET', 'users/{user_id}/images/{image_id}', ok)
+        router.add(ANY, 'login', ok)
+
+        assert router.dispatch(request('GET', 'users'))['statusCode'] == 200
+        response = router.dispatch(request('GET', 'users/u1/images/i.2'))
+        assert json.loads(response['body'])['params'] == {'user_id': 'u1', 'image_id': 'i.2'}
+        assert router.dispatch(request('PUT', 'login'))['statusCode'] == 200
+
+        assert router.dispatch(request('POST', 'users'))['statusCode'] == 404
+        assert router.dispatch(request('GET', 'users/u1/images'))['statusCode'] == 404
+
+    def test_options_and_cors_headers(self):
+        """OPTIONS はルート関数を呼ばずに200、独自ヘッダーの応答にも CORS ヘッダーを付与"""
+        handler = MagicMock(return_value={'statusCode': 200, 'headers': {'Retry-After': '3'}, 'body': ''})
+        router = Router('test', allow_methods='POST,OPTIONS', expose_headers='ETag', path=last_path_segment)
+        router.add('POST', 'checkout', handler)
+
+        preflight = router.dispatch({'httpMethod': 'OPTIONS', 'path': '/payment/checkout'})
+        assert preflight == {'statusCode': 200, 'headers': router.headers, 'body': ''}
+        handler.assert_not_called()
+
+        headers = router.dispatch({'httpMethod': 'POST', 'path': '/payment/checkout'})['headers']
+        assert headers['Retry-After'] == '3'
+        assert headers['Access-Control-Allow-Methods'] == 'POST,OPTIONS'
+        assert headers['Access-Control-Expose-Headers'] == 'ETag'
+
+    def test_error_mapping(self):
+        """HttpError はそのステータス、その他の例外は接頭辞付きの500"""
+        def conflict(event, headers):
+            raise HttpError(409, 'Conflict', id='x')
+
+        router = Router('test', error_prefix='Authentication error')
+        router.add('GET', 'conflict', conflict)
+        router.add('GET', 'boom', lambda event, headers: 1 / 0)
+        router.add('POST', 'echo', lambda event, headers: ok(event, headers) if event.json else None)
+
+        response = router.dispatch(request('GET', 'conflict'))
+        assert (response['statusCode'], json.loads(response['body'])) == (409, {'error': 'Conflict', 'id': 'x'})
+        boom = router.dispatch(request('GET', 'boom'))
+        assert boom['statusCode'] == 500
+        assert json.loads(boom['body'])['error'].startswith('Authentication error: ')
+        assert router.dispatch(request('POST', 'echo', body='{not json'))['statusCode'] == 400
+
+    def test_path_parameter_and_hidden_errors(self):
+        """パスパラメーターの有無で一覧・詳細に振り分け、hide_errors の500は例外の内容を返さない"""
+        router = Router('test', path=path_parameter('imageId'), hide_errors=True)
+        router.add('GET', '', ok)
+        router.add('GET', '{image_id}', ok)
+        router.add('POST', '', lambda event, headers: 1 / 0)
+
+        assert json.loads(router.dispatch({'httpMethod': 'GET', 'pathParameters': None})['body'])['params'] == {}
+        detail = router.dispatch({'httpMethod': 'GET', 'pathParameters': {'imageId': 'img-1'}})
+        assert json.loads(detail['body'])['params'] == {'image_id': 'img-1'}
+        boom = router.dispatch({'httpMethod': 'POST'})
+        assert (boom['statusCode'], json.loads(boom['body'])) == (500, {'error': 'Internal server error'})
+
+
+class TestRequestState:
+    """リクエスト単位の値テストクラス"""
+
+    def test_auth_and_body_resolved_once(self):
+        """認証・本文の解析はルート関数やミドルウェアから何度参照しても1回"""
+        resolver = MagicMock(return_value={'user_id': 'user-001'})
+        seen = []
+
+        def audit(request, call_next):
+            seen.append(request.user['user_id'])
+            return call_next(request)
+
+        def handler(event, headers):
+            assert event.user is event.user
+            assert event.json is event.json
+            return ok(event, headers)
+
+        router = Router('test', auth=resolver)
+        router.middleware += (audit,)
+        router.add('POST', 'items', handler, auth=True)
+
+        assert router.dispatch(request('POST', 'items', body='{"a": 1}'))['statusCode'] == 200
+        assert resolver.call_count == 1
+        assert seen == ['user-001']
+
+    def test_unauthorized(self):
+        router = Router('test', auth=lambda event: None, unauthorized_body={'error': 'Authentication required'})
+        handler = MagicMock()
+        router.add('GET', 'private', handler, auth=True)
+        router.add('GET', 'public', ok)
+
+        response = router.dispatch(request('GET', 'private'))
+        assert (response['statusCode'], json.loads(response['body'])) == (401, {'error': 'Authentication required'})
+        handler.assert_not_called()
+        assert router.dispatch(request('GET', 'public'))['statusCode'] == 200
+
+    @pytest.mark.parametrize('enabled', ['on', 'off'])
+    def test_timing_metric(self, enabled, monkeypatch, capsys):
+        monkeypatch.setenv('METRICS_ENABLED', enabled)
+        router = Router('test')
+        router.add('GET', 'users/{user_id}', ok)
+
+        router.dispatch(request('GET', 'users/u1'))
+
+        output = capsys.readouterr().out
+        if enabled == 'on':
+            record = json.loads(output.strip().splitlines()[-1])
+            assert (record['Function'], record['Route']) == ('test', 'users/{user_id}')
+            assert record['Latency'] >= 0
+        else:
+            assert output == ''
@@ -0,0 +1,51 @@
+"""
+ホットキーシャーディングの単体テスト
+"""
+import os
+from unittest.mock import patch
+
+from common import image_store, sharding, usage
+
+
+class TestSharding:
+    """シャーディングテストクラス"""
+
+    def test_keys(self):
+        """共有IDのみシャード化し、元のキーに戻せる"""
+        with patch.dict(os.environ, {'HOT_KEY_SHARDS': '4'}):
+            assert sharding.shard_keys('sapporo-guide') == [f'sapporo-guide#{i}' for i in range(4)]
+            assert sharding.write_key('sapporo-guide') in sharding.shard_keys('sapporo-guide')
+        assert sharding.write_key('user-001') == 'user-001'
+        assert sharding.logical_key('sapporo-guide#3') == 'sapporo-guide'
+        assert sharding.logical_key('user#1') == 'user#1'
+
+    def test_counter_spreads_writes_and_aggregates(self, mock_image_stack):
+        """加算は複数シャードに分散し、読み込みは合計を返す"""
+        counter = sharding.ShardedCounter('users', 'user_id', 'global-analyses')
+        keys = {counter.increment({'count': 1}) for _ in range(50)}
+
+        assert len(keys) > 1
+        assert counter.read(['count', 'missing']) == {'count': 50, 'missing': 0}
+        assert 'Item' not in mock_image_stack['users'].get_item(Key={'user_id': 'global-analyses'})
+
+    def test_shared_identity_usage(self, mock_image_stack):
+        """共有IDの使用回数は本体項目とシャード項目の合計で判定する"""
+        month = usage.usage_month_attribute()
+        mock_image_stack['users'].put_item(Item={'user_id': 'emergency-user', 'user_type': 'free', month: 1})
+
+        for _ in range(3):
+            result = usage.increment_and_check('emergency-user')
+
+        assert result['remaining'] == 1
+        assert usage.check_usage_limit('emergency-user')['remaining'] == 1
+        assert usage.load_plan_states(['emergency-user'])['emergency-user'].total_count == 3
+        base = mock_image_stack['users'].get_item(Key={'user_id': 'emergency-user'})['Item']
+        assert base[month] == 1
+
+    def test_shared_identity_images_are_sharded(self, mock_image_stack):
+        """匿名アップロードの画像はGSIキーをシャード化する"""
+        result = image_store.save_image_metadata('k', 'u', 'sapporo-guide', 'a.jpg', 'store', 'ja', image_id='img-1')
+
+        item = mock_image_stack['images'].get_item(Key={'image_id': result['image_id']})['Item']
+        assert item['user_id'] in sharding.shard_keys('sapporo-guide')
+        assert sharding.logical_key(item['user_id']) == 'sapporo-guide'
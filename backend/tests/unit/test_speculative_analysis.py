@@ -0,0 +1,147 @@
+"""
+アップロード時の先行解析の単体テスト
+"""
+import json
+import base64
+import importlib.util
+import pytest
+from unittest.mock import patch
+
+# テスト対象をインポート
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../functions/image-analysis'))
+import handler_gemini
+
+_upload_spec = importlib.util.spec_from_file_location(
+    'image_upload_handler',
+    os.path.join(os.path.dirname(__file__), '../../functions/image-upload/handler.py')
+)
+image_upload_handler = importlib.util.module_from_spec(_upload_spec)
+_upload_spec.loader.exec_module(image_upload_handler)
+
+
+@pytest.fixture
+def speculative_mode():
+    with patch.object(handler_gemini, 'SPECULATIVE_ANALYSIS_MODE', 's3'), \
+         patch.object(handler_gemini, 'SPECULATIVE_POLL_INTERVAL', 0.01):
+        yield
+
+
+def upload_image(sample_context):
+    response = image_upload_handler.main({
+        'httpMethod': 'POST',
+        'body': json.dumps({
+            'image': base64.b64encode(b'fake-jpeg-bytes').decode(),
+            'filename': 'photo.jpg',
+            'userId': 'user-001',
+            'analysisType': 'menu',
+            'language': 'en'
+        })
+    }, sample_context)
+    return json.loads(response['body'])
+
+
+def s3_event(s3_key):
+    return {'Records': [{
+        's3': {
+            'bucket': {'name': 'ai-tourism-poc-images-test'},
+            'object': {'key': s3_key}
+        }
+    }]}
+
+
+def analyze_event(image_id, language='en', analysis_type='menu'):
+    return {
+        'httpMethod': 'POST',
+        'path': '/analyze',
+        'headers': {'Authorization': 'Bearer test-token'},
+        'body': json.dumps({'imageId': image_id, 'language': language, 'type': analysis_type})
+    }
+
+
+class TestSpeculativeAnalysis:
+    """先行解析テストクラス"""
+
+    def test_upload_records_image_id_in_object_metadata(self, mock_image_stack, sample_context):
+        """S3オブジェクトにimage-idメタデータが付与される"""
+        uploaded = upload_image(sample_context)
+        head = mock_image_stack['s3'].head_object(Bucket='ai-tourism-poc-images-test', Key=uploaded['s3_key'])
+        assert head['Metadata']['image-id'] == uploaded['image_id']
+
+    def test_pre_analyze_stores_result_without_charging(self, mock_image_stack, speculative_mode, sample_context):
+        """S3イベントで解析結果が保存され、使用回数は加算されない"""
+        uploaded = upload_image(sample_context)
+
+        result = handler_gemini.pre_analyze(s3_event(uploaded['s3_key']), sample_context)
+
+        assert result['processed'] == 1
+        item = mock_image_stack['images'].get_item(Key={'image_id': uploaded['image_id']})['Item']
+        assert item['prefetch_status'] == 'ready'
+        assert json.loads(item['prefetch_result'])['language'] == 'en'
+        assert 'Item' not in mock_image_stack['users'].get_item(Key={'user_id': 'user-001'})
+
+    @patch.object(handler_gemini, 'get_user_from_token', return_value={'user_id': 'user-001'})
+    def test_analyze_returns_prefetched_result_and_charges(self, mock_token, mock_image_stack, speculative_mode, sample_context):
+        """/analyzeは先行解析結果を返し、その時点で課金する"""
+        uploaded = upload_image(sample_context)
+        handler_gemini.pre_analyze(s3_event(uploaded['s3_key']), sample_context)
+
+        with patch.object(handler_gemini, 'analyze_image_with_gemini_rest') as mock_analyze:
+            response = handler_gemini.main(analyze_event(uploaded['image_id']), sample_context)
+            mock_analyze.assert_not_called()
+
+        assert response['statusCode'] == 200
+        assert json.loads(response['body'])['usage_info']['remaining'] == 4
+
+    @patch.object(handler_gemini, 'get_user_from_token', return_value={'user_id': 'user-001'})
+    def test_analyze_first_suppresses_late_pre_analysis(self, mock_token, mock_image_stack, speculative_mode, sample_context):
+        """先行解析より先に/analyzeが来た場合、遅れて届いたイベントは解析しない"""
+        uploaded = upload_image(sample_context)
+        event = analyze_event(uploaded['image_id'])
+        event['body'] = json.dumps({**json.loads(event['body']), 'image': 'ZmFrZQ=='})
+        handler_gemini.main(event, sample_context)
+
+        with patch.object(handler_gemini, 'analyze_image_with_gemini_rest') as mock_analyze:
+            result = handler_gemini.pre_analyze(s3_event(uploaded['s3_key']), sample_context)
+            mock_analyze.assert_not_called()
+        assert result['processed'] == 0
+
+    def test_disabled_mode_is_noop(self, mock_image_stack, sample_context):
+        """先行解析が無効なら何もしない"""
+        uploaded = upload_image(sample_context)
+        assert handler_gemini.pre_analyze(s3_event(uploaded['s3_key']), sample_context) == {'processed': 0}
+
+    @patch.object(handler_gemini, 'get_user_from_token', return_value={'user_id': 'someone-else'})
+    def test_analyze_ignores_other_users_result(self, mock_token, mock_image_stack, speculative_mode, sample_context):
+        """他ユーザーの画像の先行解析結果は返さない"""
+        uploaded = upload_image(sample_context)
+        handler_gemini.pre_analyze(s3_event(uploaded['s3_key']), sample_context)
+
+        assert handler_gemini.get_speculative_analysis(
+            uploaded['image_id'], 'someone-else', 'en', 'menu', sample_context
+        ) is None
+        response = handler_gemini.main(analyze_event(uploaded['image_id']), sample_context)
+        assert response['statusCode'] == 400
+
+    def test_object_without_image_id_is_skipped_with_head(self, mock_image_stack, speculative_mode, sample_context):
+        """image-idメタデータのないオブジェクトは本体を取得せずにスキップ"""
+        mock_image_stack['s3'].put_object(
+            Bucket='ai-tourism-poc-images-test', Key='users/user-001/images/combined.jpg', Body=b'x'
+        )
+        with patch.object(handler_gemini, 'get_client') as mock_get_client:
+            mock_get_client.return_value.head_object.return_value = {'Metadata': {}}
+            result = handler_gemini.pre_analyze(s3_event('users/user-001/images/combined.jpg'), sample_context)
+            mock_get_client.return_value.get_object.assert_not_called()
+        assert result['processed'] == 0
+
+    def test_join_budget_respects_remaining_time(self):
+        """待機時間はLambdaの残り時間からフォールバック分を差し引いた範囲"""
+        class Context:
+            def get_remaining_time_in_millis(self):
+                return 12000
+
+        with patch.object(handler_gemini, 'SPECULATIVE_JOIN_TIMEOUT', 10), \
+             patch.object(handler_gemini, 'SPECULATIVE_FALLBACK_RESERVE', 8):
+            assert handler_gemini.get_join_budget(Context()) == 4
+            assert handler_gemini.get_join_budget(None) == 10
@@ -0,0 +1,81 @@
+"""
+ユーザー統計（STATS 項目）の単体テスト
+"""
+import os
+import sys
+from unittest.mock import patch
+
+# テスト対象をインポート（handler.py は関数ごとに同名のためファイルパスから読み込む）
+import importlib.util
+
+spec = importlib.util.spec_from_file_location(
+    'user_management_handler',
+    os.path.join(os.path.dirname(__file__), '../../functions/user-management/handler.py')
+)
+user_management_handler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(user_management_handler)
+
+from common import image_store, single_table, stats, usage
+
+
+class TestStats:
+    """ユーザー統計テストクラス"""
+
+    def test_analysis_and_payment_are_aggregated(self, mock_image_stack):
+        """解析・決済の書き込み時に集計され、統計はGetItem1回で返す"""
+        usage.increment_and_check('user-001', 'store', 'ja')
+        usage.increment_and_check('user-001', 'menu', 'ja')
+        usage.increment_and_check('user-001', 'store', 'en')
+        stats.record_payment('user-001', 500, 'completed')
+        stats.record_payment('user-001', 1000, 'succeeded')
+        stats.record_payment('user-001', 300, 'pending')
+
+        with patch.object(single_table, 'app_table', wraps=single_table.app_table) as app_table:
+            result = user_management_handler.get_user_statistics('user-001')
+
+        assert app_table.call_count == 1
+        assert result['analysisCount'] == 3
+        assert result['analysisByType'] == {'store': 2, 'menu': 1}
+        assert result['analysisByLanguage'] == {'ja': 2, 'en': 1}
+        assert result['paymentCount'] == 2
+        assert result['totalSpent'] == 1500.0
+
+    def test_unknown_user(self, mock_image_stack):
+        """統計がないユーザーは0件"""
+        result = stats.get_stats('user-x')
+
+        assert result['analysis_count'] == 0
+        assert result['total_spent'] == 0.0
+
+    def test_shared_identity_is_sharded(self, mock_image_stack):
+        """共有IDはシャード項目に加算し、合計を返す"""
+        for _ in range(5):
+            stats.record_analysis('emergency-user', 'store', 'ja')
+
+        assert stats.get_stats('emergency-user')['analysis_count'] == 5
+        assert 'Item' not in mock_image_stack['app'].get_item(Key=stats.stats_key('emergency-user'))
+
+    def test_backfill(self, mock_image_stack):
+        """既存の履歴・決済から再集計する"""
+        sys.path.append(os.path.join(os.path.dirname(__file__), '../../scripts'))
+        import backfill_user_stats
+
+        for i, analysis_type in enumerate(['store', 'menu', 'store']):
+            mock_image_stack['images'].put_item(Item={
+                'image_id': f'img-{i}', 'user_id': 'user-001', 'status': 'analyzed',
+                'analysis_type': analysis_type, 'language': 'ja'
+            })
+        mock_image_stack['images'].put_item(Item={'image_id': 'img-x', 'user_id': 'user-001', 'status': 'uploaded'})
+        mock_image_stack['payments'].put_item(Item={
+            'userId': 'user-001', 'createdAt': '2025-08-01T00:00:00', 'amount': 980, 'status': 'completed'
+        })
+        stats.record_analysis('user-001', 'store', 'ja')
+
+        # motoはSegmentを無視して全件を返すため、件数の検証は1セグメントで行う
+        assert backfill_user_stats.backfill(segments=1) == 1
+
+        result = stats.get_stats('user-001')
+        assert result['analysis_count'] == 3
+        assert result['analysis_by_type'] == {'store': 2, 'menu': 1}
+        assert result['payment_count'] == 1
+        assert result['total_spent'] == 980.0
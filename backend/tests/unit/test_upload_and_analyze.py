@@ -0,0 +1,63 @@
+"""
+アップロード＋解析一括エンドポイントの単体テスト
+"""
+import json
+import base64
+import pytest
+from unittest.mock import patch
+
+# テスト対象をインポート
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../functions/image-analysis'))
+import handler_gemini
+
+
+def make_event(body):
+    return {
+        'httpMethod': 'POST',
+        'path': '/upload-and-analyze',
+        'headers': {'Authorization': 'Bearer test-token'},
+        'body': json.dumps(body)
+    }
+
+
+class TestUploadAndAnalyze:
+    """アップロード＋解析一括処理テストクラス"""
+
+    @patch.object(handler_gemini, 'get_user_from_token', return_value={'user_id': 'user-001'})
+    def test_stores_image_and_analysis(self, mock_token, mock_image_stack, sample_context):
+        """S3保存・メタデータ保存・解析結果書き戻しが1リクエストで完了する"""
+        image_b64 = base64.b64encode(b'fake-jpeg-bytes').decode()
+        response = handler_gemini.main(make_event({
+            'image': f'data:image/jpeg;base64,{image_b64}',
+            'filename': 'photo.jpg',
+            'language': 'en',
+            'type': 'store'
+        }), sample_context)
+
+        assert response['statusCode'] == 200
+        body = json.loads(response['body'])
+        assert body['status'] == 'success'
+        assert body['s3_key'].startswith('users/user-001/images/')
+
+        stored = mock_image_stack['s3'].get_object(Bucket='ai-tourism-poc-images-test', Key=body['s3_key'])
+        assert stored['Body'].read() == b'fake-jpeg-bytes'
+
+        item = mock_image_stack['images'].get_item(Key={'image_id': body['image_id']})['Item']
+        assert item['status'] == 'analyzed'
+        assert item['user_id'] == 'user-001'
+        assert item['analysis_summary'] == body['analysis'][:200]
+        assert body['usage_info']['remaining'] == 4
+
+    @patch.object(handler_gemini, 'get_user_from_token', return_value={'user_id': 'user-001'})
+    def test_invalid_base64(self, mock_token, mock_image_stack, sample_context):
+        """不正なbase64は400"""
+        response = handler_gemini.main(make_event({'image': '***'}), sample_context)
+        assert response['statusCode'] == 400
+
+    @patch.object(handler_gemini, 'get_user_from_token', return_value={'user_id': 'user-001'})
+    def test_missing_image(self, mock_token, mock_image_stack, sample_context):
+        """画像データ未提供は400"""
+        response = handler_gemini.main(make_event({'language': 'ja'}), sample_context)
+        assert response['statusCode'] == 400
@@ -0,0 +1,108 @@
+"""
+共通レイヤー 使用回数管理の単体テスト
+"""
+import os
+import sys
+from datetime import timedelta
+
+from common import usage
+from common.jst import get_jst_now
+
+
+class TestUsage:
+    """使用回数管理テストクラス"""
+
+    def test_new_user_is_created(self, mock_image_stack):
+        """未登録ユーザーは作成され、無料プランの残り回数を返す"""
+        result = usage.check_usage_limit('user-new')
+
+        assert result['allowed'] is True
+        assert result['remaining'] == 5
+        assert mock_image_stack['users'].get_item(Key={'user_id': 'user-new'})['Item']['user_type'] == 'free'
+
+    def test_free_limit_reached(self, mock_image_stack):
+        """無料プランの月間上限に達すると不可"""
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'free', usage.usage_month_attribute(): 5})
+
+        result = usage.check_usage_limit('user-001')
+
+        assert result['allowed'] is False
+        assert result['upgrade_required'] is True
+
+    def test_active_premium(self, mock_image_stack):
+        """有効なプレミアムは無制限"""
+        expiry = (get_jst_now() + timedelta(days=3, hours=1)).isoformat()
+        mock_image_stack['users'].put_item(Item={
+            'user_id': 'user-001', 'user_type': 'premium_7days',
+            usage.usage_month_attribute(): 50, 'premium_expiry': expiry
+        })
+
+        result = usage.check_usage_limit('user-001')
+
+        assert result['remaining'] == -1
+        assert result['days_remaining'] == 3
+
+    def test_expired_premium_is_treated_as_free(self, mock_image_stack):
+        """期限切れプレミアムは無料プランとして判定する"""
+        expiry = (get_jst_now() - timedelta(days=1)).isoformat() + '+09:00'
+        mock_image_stack['users'].put_item(Item={
+            'user_id': 'user-001', 'user_type': 'premium_20days',
+            usage.usage_month_attribute(): 7, 'premium_expiry': expiry
+        })
+
+        result = usage.check_usage_limit('user-001')
+
+        assert result['allowed'] is False
+        assert result['premium_expired'] is True
+
+    def test_increment_and_check(self, mock_image_stack):
+        """増加後の値で残り回数を返す"""
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'free', usage.usage_month_attribute(): 3})
+
+        result = usage.increment_and_check('user-001')
+
+        assert result['remaining'] == 1
+        item = mock_image_stack['users'].get_item(Key={'user_id': 'user-001'})['Item']
+        assert item[usage.usage_month_attribute()] == 4
+        assert item['total_analysis_count'] == 1
+
+    def test_load_plan_states(self, mock_image_stack):
+        """BatchGetItemで複数ユーザーを取得（未登録は無料扱い）"""
+        for i in range(3):
+            mock_image_stack['users'].put_item(Item={'user_id': f'user-{i}', 'user_type': 'free', usage.usage_month_attribute(): i})
+
+        states = usage.load_plan_states(['user-0', 'user-1', 'user-2', 'user-x', 'user-1'])
+
+        assert len(states) == 4
+        assert states['user-2'].monthly_count == 2
+        assert states['user-x'].user_type == 'free'
+
+    def test_new_month_starts_from_zero(self, mock_image_stack):
+        """前月の使用回数は当月の判定に影響しない"""
+        last_month = get_jst_now().replace(day=1) - timedelta(days=1)
+        mock_image_stack['users'].put_item(Item={
+            'user_id': 'user-001', 'user_type': 'free',
+            usage.usage_month_attribute(last_month): 5
+        })
+
+        result = usage.check_usage_limit('user-001')
+
+        assert result['allowed'] is True
+        assert result['remaining'] == 5
+
+    def test_migrate_monthly_usage(self, mock_image_stack):
+        """旧属性を当月の属性に引き継ぐ（当月分が既にあれば上書きしない）"""
+        sys.path.append(os.path.join(os.path.dirname(__file__), '../../scripts'))
+        import migrate_monthly_usage
+
+        month = usage.usage_month_attribute()
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'monthly_analysis_count': 4})
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-002', 'monthly_analysis_count': 4, month: 1})
+
+        stats = migrate_monthly_usage.migrate(remove_legacy=True)
+
+        assert stats == {'migrated': 1, 'skipped': 1}
+        migrated = mock_image_stack['users'].get_item(Key={'user_id': 'user-001'})['Item']
+        assert migrated[month] == 4
+        assert 'monthly_analysis_count' not in migrated
+        assert mock_image_stack['users'].get_item(Key={'user_id': 'user-002'})['Item'][month] == 1
@@ -0,0 +1,116 @@
+"""
+users テーブルキャッシュの単体テスト
+"""
+import os
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from botocore.exceptions import ClientError
+
+from common import usage, user_cache
+
+
+class FakeRedis:
+    """Redisクライアントの代替（get / set / delete のみ）"""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode()
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+@pytest.fixture
+def memory_cache():
+    with patch.dict(os.environ, {'USERS_CACHE_BACKEND': 'memory'}):
+        yield
+
+
+class TestUserCache:
+    """ユーザーキャッシュテストクラス"""
+
+    def test_read_through(self, mock_image_stack, memory_cache):
+        """2回目以降はDynamoDBを読まない"""
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'free'})
+
+        assert user_cache.get_user('user-001')['user_type'] == 'free'
+        with patch.object(user_cache, 'users_table', side_effect=AssertionError('cache miss')):
+            assert user_cache.get_user('user-001')['user_type'] == 'free'
+            assert usage.check_usage_limit('user-001')['remaining'] == 5
+
+    def test_write_through_on_increment(self, mock_image_stack, memory_cache):
+        """自分の書き込み後は更新後の項目を返す"""
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'free', usage.usage_month_attribute(): 3})
+        assert usage.check_usage_limit('user-001')['remaining'] == 2
+
+        usage.increment_and_check('user-001')
+
+        assert usage.check_usage_limit('user-001')['remaining'] == 1
+
+    def test_failed_conditional_write_invalidates(self, mock_image_stack, memory_cache):
+        """条件付き更新が不成立の場合はキャッシュを破棄する"""
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'premium_7days', 'premium_expiry': 'a'})
+        user_cache.get_user('user-001')
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'premium_20days', 'premium_expiry': 'b'})
+
+        assert usage.downgrade_to_free('user-001', expected_expiry='a') is False
+        assert user_cache.get_user('user-001')['user_type'] == 'premium_20days'
+
+    def test_get_users_batches_misses_only(self, mock_image_stack, memory_cache):
+        """キャッシュ済みのユーザーはBatchGetItemしない"""
+        for i in range(3):
+            mock_image_stack['users'].put_item(Item={'user_id': f'user-{i}', 'user_type': 'free'})
+        user_cache.get_user('user-0')
+
+        with patch.object(user_cache, '_report') as report:
+            items = user_cache.get_users(['user-0', 'user-1', 'user-2', 'user-x'])
+
+        assert sorted(items) == ['user-0', 'user-1', 'user-2']
+        report.assert_called_once_with(1, 3)
+
+    def test_metrics_are_emitted(self, mock_image_stack, memory_cache, capsys):
+        """ヒット・ミスをEMF形式で出力する"""
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001'})
+        user_cache.get_user('user-001')
+        user_cache.get_user('user-001')
+
+        records = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{')]
+        assert [(r['CacheHit'], r['CacheMiss'], r['Table']) for r in records] == [(0, 1, 'users'), (1, 0, 'users')]
+        assert records[0]['_aws']['CloudWatchMetrics'][0]['Dimensions'] == [['Table']]
+
+    def test_redis_backend_round_trip(self, mock_image_stack):
+        """Redisプロトコルのバックエンドは Decimal を保持する"""
+        user_cache.set_backend(user_cache.RedisBackend('redis://unused', client=FakeRedis()))
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'total_analysis_count': 3, 'premium_expiry': None})
+
+        user_cache.get_user('user-001')
+        with patch.object(user_cache, 'users_table', side_effect=AssertionError('cache miss')):
+            item = user_cache.get_user('user-001')
+
+        assert item['total_analysis_count'] == Decimal(3)
+        assert item['premium_expiry'] is None
+
+    def test_cache_failure_falls_back_to_table(self, mock_image_stack):
+        """キャッシュ障害時はDynamoDBから読む"""
+        broken = FakeRedis()
+        broken.get = lambda key: (_ for _ in ()).throw(ConnectionError('down'))
+        user_cache.set_backend(user_cache.RedisBackend('redis://unused', client=broken))
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'free'})
+
+        assert user_cache.get_user('user-001')['user_type'] == 'free'
+
+    def test_dax_without_package_uses_table(self, mock_image_stack):
+        """amazondax 未導入時はテーブルを直接読む"""
+        mock_image_stack['users'].put_item(Item={'user_id': 'user-001', 'user_type': 'free'})
+        with patch.dict(os.environ, {'USERS_CACHE_BACKEND': 'dax', 'USERS_DAX_ENDPOINT': 'dax://example'}), \
+                patch.dict('sys.modules', {'amazondax': None}):
+            assert user_cache.get_backend() is None
+            assert user_cache.get_user('user-001')['user_type'] == 'free'
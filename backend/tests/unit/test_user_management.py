@@ -426,6 +426,6 @@ class TestUserManagementHandler:
         
         response = main(event, sample_context)
         
-        assert response["statusCode"] == 500
+        assert response["statusCode"] == 400
         body = json.loads(response["body"])
         assert "error" in body
\ No newline at end of file
@@ -0,0 +1,68 @@
+#!/bin/bash
+
+# imagesテーブルに (user_id, created_at) GSI を追加するスクリプト
+# imagesテーブルは serverless.yml 管理外のため aws-cli で作成する
+# 使用方法: ./create-images-user-index.sh <stage>
+
+set -e
+
+STAGE=${1:-"dev"}
+REGION=${2:-"ap-northeast-1"}
+PROFILE=${3:-"ai-tourism-poc"}
+TABLE_NAME="ai-tourism-poc-images-${STAGE}"
+INDEX_NAME="user-created-index"
+
+echo "🚀 GSI作成開始..."
+echo "Table: $TABLE_NAME"
+echo "Index: $INDEX_NAME"
+
+EXISTING=$(aws dynamodb describe-table \
+    --table-name "$TABLE_NAME" \
+    --region "$REGION" \
+    --profile "$PROFILE" \
+    --query "Table.GlobalSecondaryIndexes[?IndexName=='${INDEX_NAME}'].IndexName" \
+    --output text)
+
+if [ -n "$EXISTING" ] && [ "$EXISTING" != "None" ]; then
+    echo "✅ $INDEX_NAME は作成済みです"
+    exit 0
+fi
+
+# 履歴一覧で返す属性のみ射影（functions/history/handler.py の HISTORY_PROJECTION と一致させる）
+aws dynamodb update-table \
+    --table-name "$TABLE_NAME" \
+    --region "$REGION" \
+    --profile "$PROFILE" \
+    --attribute-definitions \
+        AttributeName=user_id,AttributeType=S \
+        AttributeName=created_at,AttributeType=S \
+    --global-secondary-index-updates "[{
+        \"Create\": {
+            \"IndexName\": \"${INDEX_NAME}\",
+            \"KeySchema\": [
+                {\"AttributeName\": \"user_id\", \"KeyType\": \"HASH\"},
+                {\"AttributeName\": \"created_at\", \"KeyType\": \"RANGE\"}
+            ],
+            \"Projection\": {
+                \"ProjectionType\": \"INCLUDE\",
+                \"NonKeyAttributes\": [\"analysis_type\", \"language\", \"analysis_summary\", \"response_truncated\", \"s3_url\", \"status\", \"original_filename\"]
+            }
+        }
+    }]" > /dev/null
+
+echo "⏳ バックフィル完了待ち..."
+while true; do
+    STATUS=$(aws dynamodb describe-table \
+        --table-name "$TABLE_NAME" \
+        --region "$REGION" \
+        --profile "$PROFILE" \
+        --query "Table.GlobalSecondaryIndexes[?IndexName=='${INDEX_NAME}'].IndexStatus" \
+        --output text)
+    echo "IndexStatus: $STATUS"
+    if [ "$STATUS" == "ACTIVE" ]; then
+        break
+    fi
+    sleep 15
+done
+
+echo "✅ $INDEX_NAME 作成完了"